@@ -1,5 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+import os
 import time
 import threading
 from dotenv import load_dotenv
@@ -15,6 +17,10 @@ from .routes import (
 
 app = FastAPI(title="AI Exam Oracle API")
 
+# 413 for oversized uploads before Starlette spools the body (inside CORS, so the error keeps its headers)
+from .services.upload_service import UploadSizeLimitMiddleware
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # Enable CORS for frontend
 app.add_middleware(
     CORSMiddleware,
@@ -24,6 +30,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request load feeds the background indexing throttle (services/indexing_throttle.py)
+@app.middleware("http")
+async def track_request_load(request, call_next):
+    from .services.indexing_throttle import load_monitor
+    with load_monitor.track():
+        return await call_next(request)
+
 # Include Routers
 app.include_router(subjects.router, prefix="/api/subjects", tags=["Subjects"])
 app.include_router(topics.router, prefix="/api", tags=["Topics"])
@@ -98,12 +111,35 @@ def startup_event():
         except Exception as e:
             print(f"[LLM] Init failed (non-fatal): {e}")
         
+        service = None
         try:
             _time.sleep(1)  # Extra buffer before RAG
             from .services.rag_service import get_rag_service
             print("[SERVER] Initializing RAG (Background Standby Mode)...")
+            # Before resuming jobs: threads inherit their creator's niceness, so the warm-up
+            # thread (with the EmbeddingBatcher serving live queries) must be started from
+            # here, not by a reniced ingestion worker
             service = get_rag_service()
+        except Exception as e:
+            print(f"[SERVER] ❌ RAG Initialization Failed in background: {e}")
+        
+        try:
+            from .services.ingestion_service import ingestion_queue
+            ingestion_queue.resume_pending()
+        except Exception as e:
+            print(f"[INGEST] Could not resume pending jobs (non-fatal): {e}")
+        
+        if service is None:
+            print("[SERVER] Background indexing will be skipped. Core API is still functional.")
+            return
+        try:
+            from .services.indexing_throttle import lower_thread_priority
+            lower_thread_priority()  # KB indexing must not slow down user requests
             service.auto_index_kb()
+            # With a sidecar, the sidecar owns the index and runs the watcher itself
+            if service.is_ready and not os.getenv("RAG_SIDECAR_ADDRESS"):
+                from .services.kb_watcher import start_kb_watcher
+                start_kb_watcher(service)
         except Exception as e:
             print(f"[SERVER] ❌ RAG Initialization Failed in background: {e}")
             print("[SERVER] Background indexing will be skipped. Core API is still functional.")
@@ -133,6 +169,19 @@ async def health_check():
         "timestamp": time.time()
     }
 
+@app.get("/ready")
+async def readiness():
+    """
+    Per-component warm-up progress, with 503 until RAG is ready so readiness probes can use
+    it. Generation works (without local retrieval) before then. READY_ALLOW_DEGRADED=true
+    reports ready once warm-up has finished even with RAG disabled or failed to load, for
+    deployments that run without local retrieval.
+    """
+    from .services.rag_service import get_rag_service
+    status = get_rag_service().readiness()
+    degraded_ok = status["mode"] == "degraded" and os.getenv("READY_ALLOW_DEGRADED", "false").lower() == "true"
+    return JSONResponse(status, status_code=200 if status["ready"] or degraded_ok else 503)
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to AI Exam Oracle API"}
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, JSON, Index
 from sqlalchemy.orm import DeclarativeBase, relationship
 from datetime import datetime
 
@@ -30,7 +30,7 @@ class Topic(Base):
     __tablename__ = "topics"
 
     id = Column(Integer, primary_key=True, index=True)
-    subject_id = Column(Integer, ForeignKey("subjects.id"))
+    subject_id = Column(Integer, ForeignKey("subjects.id"), index=True)
     name = Column(String(255))
     description = Column(String(1000), nullable=True)
     has_syllabus = Column(Boolean, default=False)
@@ -63,16 +63,74 @@ class Question(Base):
     topic = relationship("Topic", back_populates="questions")
     rubric = relationship("Rubric", back_populates="questions")
 
+    # Hot filters: vetting queue and dashboard counts (status, LO, Bloom), LO/Bloom
+    # coverage, created_at ranges, per-topic and per-rubric lookups. Existing databases
+    # get these through schema_sync migrations; keep both lists in step.
+    __table_args__ = (
+        Index("ix_questions_status_lo_bloom", "status", "learning_outcome", "bloom_level"),
+        Index("ix_questions_lo_bloom", "learning_outcome", "bloom_level"),
+        Index("ix_questions_created_at", "created_at"),
+        Index("ix_questions_topic_status", "topic_id", "status"),
+        Index("ix_questions_rubric_lo", "rubric_id", "learning_outcome"),
+    )
+
 class Document(Base):
+    """One row per indexed file; see services/document_registry.py."""
     __tablename__ = "documents"
 
     id = Column(Integer, primary_key=True, index=True)
-    subject_id = Column(Integer, ForeignKey("subjects.id"))
+    subject_id = Column(Integer, ForeignKey("subjects.id"), index=True)
     topic_id = Column(Integer, ForeignKey("topics.id"), nullable=True)
     filename = Column(String(255))
-    content = Column(String(5000))
+    content = Column(String(5000))  # preview of the first chunk
+    embedding_id = Column(String(255))  # chunk id prefix in the vector store
+    created_at = Column(DateTime, default=datetime.utcnow)
+    subject_key = Column(String(50), index=True)  # subject as keyed in the vector store (id or KB code)
+    origin = Column(String(20), default="upload")  # upload, kb
+    content_hash = Column(String(64), nullable=True)
+    size_bytes = Column(Integer, nullable=True)
+    char_count = Column(Integer, default=0)
+    chunk_count = Column(Integer, default=0)
+    embedding_model = Column(String(100), nullable=True)
+    embedding_version = Column(Integer, default=1)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    chunks = relationship("DocumentChunk", back_populates="document", cascade="all, delete-orphan")
+
+class DocumentChunk(Base):
+    __tablename__ = "document_chunks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), index=True)
+    chunk_index = Column(Integer)
     embedding_id = Column(String(255))
+    content_hash = Column(String(40))  # SHA-1 of the chunk text
+    char_count = Column(Integer)
+
+    document = relationship("Document", back_populates="chunks")
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    subject_id = Column(String(50))  # subject id (uploads) or knowledge base subject code
+    topic_id = Column(Integer, nullable=True)
+    filename = Column(String(255))
+    file_path = Column(String(1000))  # spooled upload, removed once the job finishes
+    content_hash = Column(String(64), nullable=True)
+    size_bytes = Column(Integer, nullable=True)
+    status = Column(String(20), default="queued", index=True)  # queued, running, complete, failed
+    stage = Column(String(20), nullable=True)  # parsing, embedding
+    pages_total = Column(Integer, nullable=True)
+    pages_parsed = Column(Integer, default=0)
+    chunks_total = Column(Integer, nullable=True)
+    chunks_embedded = Column(Integer, default=0)
+    eta_seconds = Column(Integer, nullable=True)
+    error = Column(String(1000), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
 
 class Notification(Base):
     __tablename__ = "notifications"
@@ -150,15 +208,15 @@ class Rubric(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     subject = relationship("Subject")
-    question_distributions = relationship("RubricQuestionDistribution", back_populates="rubric", cascade="all, delete-orphan")
-    lo_distributions = relationship("RubricLODistribution", back_populates="rubric", cascade="all, delete-orphan")
+    question_distributions = relationship("RubricQuestionDistribution", back_populates="rubric", cascade="all, delete-orphan", order_by="RubricQuestionDistribution.id")
+    lo_distributions = relationship("RubricLODistribution", back_populates="rubric", cascade="all, delete-orphan", order_by="RubricLODistribution.id")
     questions = relationship("Question", back_populates="rubric")
 
 class RubricQuestionDistribution(Base):
     __tablename__ = "rubric_question_distributions"
     
     id = Column(Integer, primary_key=True, index=True)
-    rubric_id = Column(Integer, ForeignKey("rubrics.id"))
+    rubric_id = Column(Integer, ForeignKey("rubrics.id"), index=True)
     question_type = Column(String(50))  # MCQ, Short, Essay
     count = Column(Integer)
     marks_each = Column(Integer)
@@ -169,7 +227,7 @@ class RubricLODistribution(Base):
     __tablename__ = "rubric_lo_distributions"
     
     id = Column(Integer, primary_key=True, index=True)
-    rubric_id = Column(Integer, ForeignKey("rubrics.id"))
+    rubric_id = Column(Integer, ForeignKey("rubrics.id"), index=True)
     learning_outcome = Column(String(10))  # LO1, LO2, LO3, LO4, LO5
     percentage = Column(Integer)  # 0-100
     
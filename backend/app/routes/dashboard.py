@@ -8,6 +8,33 @@ from datetime import datetime, timedelta
 
 router = APIRouter()
 
+def _question_breakdown(db: Session) -> dict:
+    """
+    Question counts by status, learning outcome and Bloom level from a single GROUP BY
+    over the three columns (an index-only scan of ix_questions_status_lo_bloom).
+    """
+    rows = db.query(
+        Question.status, Question.learning_outcome, Question.bloom_level, func.count(Question.id)
+    ).group_by(Question.status, Question.learning_outcome, Question.bloom_level).all()
+    
+    breakdown = {"total": 0, "status": {}, "learning_outcome": {}, "bloom_level": {}}
+    for status, learning_outcome, bloom_level, count in rows:
+        breakdown["total"] += count
+        for key, value in (("status", status), ("learning_outcome", learning_outcome), ("bloom_level", bloom_level)):
+            breakdown[key][value] = breakdown[key].get(value, 0) + count
+    return breakdown
+
+def _daily_counts(db: Session, first_day, last_day) -> dict:
+    """Questions created per day between two dates (inclusive), keyed by ISO date."""
+    start = datetime.combine(first_day, datetime.min.time())
+    end = datetime.combine(last_day + timedelta(days=1), datetime.min.time())
+    day = func.date(Question.created_at)
+    rows = db.query(day, func.count(Question.id)).filter(
+        Question.created_at >= start, Question.created_at < end
+    ).group_by(day).all()
+    # SQLite returns the date as text, MySQL/Postgres as a date
+    return {str(value): count for value, count in rows}
+
 @router.get("/stats")
 def get_dashboard_stats(db: Session = Depends(get_db)):
     # 1. Get User Stats (mocking user_id=1)
@@ -17,23 +44,29 @@ def get_dashboard_stats(db: Session = Depends(get_db)):
     subject_count = db.query(Subject).count()
     
     # 3. Counts by status
-    pending_count = db.query(Question).filter(Question.status == "draft").count()
-    approved_count = db.query(Question).filter(Question.status == "approved").count()
-    rejected_count = db.query(Question).filter(Question.status == "rejected").count()
-    total_q = db.query(Question).count()
+    breakdown = _question_breakdown(db)
+    pending_count = breakdown["status"].get("draft", 0)
+    approved_count = breakdown["status"].get("approved", 0)
+    rejected_count = breakdown["status"].get("rejected", 0)
+    total_q = breakdown["total"]
     
     # 4. Activity this week (last 7 days)
-    activity_week = []
     days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-    today_idx = datetime.utcnow().weekday() # 0 is Monday
+    today = datetime.utcnow().date()
+    today_idx = today.weekday() # 0 is Monday
     
+    target_dates = []
     for i in range(7):
-        target_date = datetime.utcnow().date() - timedelta(days=(today_idx - i) % 7)
+        target_date = today - timedelta(days=(today_idx - i) % 7)
         if (today_idx - i) % 7 > today_idx: # Date is from previous week
-             target_date = datetime.utcnow().date() - timedelta(days=(today_idx - i) % 7 + 7)
-        
-        # Count questions created on this specific day
-        count = db.query(Question).filter(func.date(Question.created_at) == target_date).count()
+             target_date = today - timedelta(days=(today_idx - i) % 7 + 7)
+        target_dates.append(target_date)
+    
+    # Questions created on each of those days, from one grouped query
+    daily = _daily_counts(db, min(target_dates), today)
+    activity_week = []
+    for i, target_date in enumerate(target_dates):
+        count = daily.get(target_date.isoformat(), 0)
         activity_week.append({
             "day": days[i],
             "active": count > 0,
@@ -64,15 +97,16 @@ def get_dashboard_stats(db: Session = Depends(get_db)):
 @router.get("/reports")
 def get_report_data(db: Session = Depends(get_db)):
     # Total counts
-    total_q = db.query(Question).count()
-    approved_q = db.query(Question).filter(Question.status == "approved").count()
-    rejected_q = db.query(Question).filter(Question.status == "rejected").count()
-    pending_q = db.query(Question).filter(Question.status == "draft").count()
+    breakdown = _question_breakdown(db)
+    total_q = breakdown["total"]
+    approved_q = breakdown["status"].get("approved", 0)
+    rejected_q = breakdown["status"].get("rejected", 0)
+    pending_q = breakdown["status"].get("draft", 0)
     
     # LO Distribution
     lo_stats = []
     for lo in ["LO1", "LO2", "LO3", "LO4", "LO5"]:
-        count = db.query(Question).filter(Question.learning_outcome == lo).count()
+        count = breakdown["learning_outcome"].get(lo, 0)
         target = 50 # Adjusted target for demo
         lo_stats.append({
             "code": lo,
@@ -85,7 +119,7 @@ def get_report_data(db: Session = Depends(get_db)):
     bloom_levels = ["Knowledge", "Comprehension", "Application", "Analysis", "Synthesis", "Evaluation"]
     bloom_stats = []
     for level in bloom_levels:
-        count = db.query(Question).filter(Question.bloom_level == level).count()
+        count = breakdown["bloom_level"].get(level, 0)
         bloom_stats.append({
             "level": level,
             "count": count,
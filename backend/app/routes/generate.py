@@ -58,8 +58,13 @@ def generate_questions(request: GenerateRequest, db: Session = Depends(get_db)):
 
 
 from fastapi import UploadFile, File, Form
-import shutil
 import os
+from ..services.upload_service import receive_upload
+from ..services.document_extractor import extract_text
+from starlette.concurrency import run_in_threadpool
+
+# Upper bound on text extracted from an upload (~100 textbook pages, ~500 chunks to embed).
+FILE_CONTEXT_MAX_CHARS = int(os.getenv("FILE_CONTEXT_MAX_CHARS", "500000"))
 
 @router.post("/rubric/{rubric_id}")
 async def generate_from_rubric(
@@ -77,51 +82,33 @@ async def generate_from_rubric(
     from ..services.generation_service import generation_service
     
     context_text = None
+    context_key = None
     if file:
+        upload = await receive_upload(file)  # 413 for oversized files
         try:
-            os.makedirs("temp", exist_ok=True)
-            file_path = f"temp/rubric_{file.filename}"
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            # Extract text
-            text = ""
-            MAX_CHARS = 50000 
-            _, ext = os.path.splitext(file_path)
+            context_key = upload.sha256
             
-            if ext.lower() == '.pdf':
-                from PyPDF2 import PdfReader
-                reader = PdfReader(file_path)
-                for page in reader.pages:
-                    text += page.extract_text() or ""
-                    if len(text) > MAX_CHARS:
-                        text = text[:MAX_CHARS]
-                        break
-            elif ext.lower() == '.docx':
-                from docx import Document
-                doc = Document(file_path)
-                for para in doc.paragraphs:
-                    text += para.text + "\n"
-                    if len(text) > MAX_CHARS:
-                        text = text[:MAX_CHARS]
-                        break
-            else:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    text = f.read(MAX_CHARS)
-                    
-            os.remove(file_path)
+            # Extract text (the whole document; relevant parts are selected per task later)
+            text, _, _ = await run_in_threadpool(
+                extract_text, upload.source(), max_chars=FILE_CONTEXT_MAX_CHARS, content_hash=context_key, name=upload.filename
+            )
             if text.strip():
-                context_text = text[:MAX_CHARS]
+                context_text = text
         except Exception as e:
             print(f"File extraction error in rubric gen: {e}")
+        finally:
+            upload.close()
 
     try:
-        result = generation_service.generate_from_rubric(
+        # Context selection (embedding the file) and the LLM calls block: keep them off the event loop
+        result = await run_in_threadpool(
+            generation_service.generate_from_rubric,
             rubric_id, 
             db, 
             engine=engine,
             context_text=context_text,
-            custom_prompt=custom_prompt
+            custom_prompt=custom_prompt,
+            context_key=context_key
         )
         
         return {
@@ -157,42 +144,22 @@ async def generate_from_file(
     Generate questions directly from an uploaded file context, linked to a specific subject/topic.
     Includes memory-safe streaming extraction for massive PDFs.
     """
+    # Stream the upload (in memory when small, a private temp dir otherwise); 413 when oversized
+    upload = await receive_upload(file)
     try:
-        # Save file temporarily
-        os.makedirs("temp", exist_ok=True)
-        file_path = f"temp/adhoc_{file.filename}"
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        file_hash = upload.sha256
         
-        # Extract text (Memory Safe & Token Capped)
-        text = ""
-        MAX_CHARS = 50000 # ~10k words, roughly 12-15k tokens. Safe for Ram & Gemini.
-        
-        _, ext = os.path.splitext(file_path)
-        if ext.lower() == '.pdf':
-            from PyPDF2 import PdfReader
-            reader = PdfReader(file_path)
-            for page in reader.pages:
-                extracted = page.extract_text() or ""
-                text += extracted
-                if len(text) > MAX_CHARS:
-                    print(f"[File] Truncating PDF text at {MAX_CHARS} characters to prevent OOM/Token limits.")
-                    text = text[:MAX_CHARS]
-                    break
-        elif ext.lower() == '.docx':
-            from docx import Document
-            doc = Document(file_path)
-            for para in doc.paragraphs:
-                text += para.text + "\n"
-                if len(text) > MAX_CHARS:
-                    text = text[:MAX_CHARS]
-                    break
-        else:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                text = f.read(MAX_CHARS) # Read only up to max chars
-        
-        # Cleanup temp file
-        os.remove(file_path)
+        # Extract text (Memory Safe & Capped). Only the chunks relevant to the request reach the
+        # prompt, so the cap is about RAM, not tokens. Repeat uploads skip parsing entirely.
+        # Parsing is CPU-bound: keep it off the event loop (large PDFs also fan out to a process pool).
+        try:
+            text, _, complete = await run_in_threadpool(
+                extract_text, upload.source(), max_chars=FILE_CONTEXT_MAX_CHARS, content_hash=file_hash, name=upload.filename
+            )
+        finally:
+            upload.close()
+        if not complete:
+            print(f"[File] Truncated {file.filename} at {FILE_CONTEXT_MAX_CHARS} characters to prevent OOM.")
         
         if not text.strip():
             return {"error": "Could not extract text from file"}
@@ -235,15 +202,23 @@ async def generate_from_file(
                 db.commit()
                 db.refresh(topic)
 
+        # Pick the parts of the document relevant to the topic / instruction. Without either,
+        # chunks are spread evenly over the document.
+        query = custom_prompt or (topic.name if topic_id else None)
+        # Embedding the document and the LLM call block: keep them off the event loop.
+        selected = await run_in_threadpool(generation_service.select_file_context, file_hash, text, [query])
+
         # Use Unified Generation Service
-        generated_data = generation_service.generate_questions_from_text(
-            context_text=text[:MAX_CHARS],  # Increased context significantly for Cloud/Gemini
+        generated_data = await run_in_threadpool(
+            generation_service.generate_questions_from_text,
+            context_text=text,
             subject_name=subject.name,
             topic_name=topic.name,
             count=count,
             complexity=complexity,
             engine=engine,
-            custom_prompt=custom_prompt
+            custom_prompt=custom_prompt,
+            context_list=selected[0] if selected else None
         )
         
         # Add temporary IDs for frontend pairing
@@ -4,10 +4,11 @@ Rubric routes for creating, managing, and using exam rubrics
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
+from datetime import datetime
 from pydantic import BaseModel, Field
 from ..database import get_db
 from ..models import Rubric, RubricQuestionDistribution, RubricLODistribution, Subject
-from ..services.rubric_service import validate_rubric, duplicate_rubric_logic
+from ..services.rubric_service import validate_rubric, duplicate_rubric_logic, rubric_query, forget_rubric_plan
 
 router = APIRouter(prefix="/api/rubrics", tags=["rubrics"])
 
@@ -100,34 +101,26 @@ def create_rubric(rubric: RubricCreate, db: Session = Depends(get_db)):
     db.refresh(db_rubric)
     
     # Build response
-    return build_rubric_response(db_rubric, subject.name, db)
+    return build_rubric_response(db_rubric)
 
 @router.get("/", response_model=List[RubricResponse])
 def list_rubrics(db: Session = Depends(get_db)):
     """
     Get all saved rubrics
     """
-    rubrics = db.query(Rubric).all()
-    return [
-        build_rubric_response(
-            rubric,
-            db.query(Subject).filter(Subject.id == rubric.subject_id).first().name,
-            db
-        )
-        for rubric in rubrics
-    ]
+    rubrics = rubric_query(db).order_by(Rubric.id).all()
+    return [build_rubric_response(rubric) for rubric in rubrics]
 
 @router.get("/{rubric_id}", response_model=RubricResponse)
 def get_rubric(rubric_id: int, db: Session = Depends(get_db)):
     """
     Get a specific rubric by ID
     """
-    rubric = db.query(Rubric).filter(Rubric.id == rubric_id).first()
+    rubric = rubric_query(db).filter(Rubric.id == rubric_id).first()
     if not rubric:
         raise HTTPException(status_code=404, detail="Rubric not found")
     
-    subject = db.query(Subject).filter(Subject.id == rubric.subject_id).first()
-    return build_rubric_response(rubric, subject.name if subject else None, db)
+    return build_rubric_response(rubric)
 
 @router.post("/{rubric_id}/duplicate", response_model=RubricResponse)
 def duplicate_rubric(rubric_id: int, db: Session = Depends(get_db)):
@@ -139,9 +132,8 @@ def duplicate_rubric(rubric_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Rubric not found")
     
     new_rubric = duplicate_rubric_logic(original, db)
-    subject = db.query(Subject).filter(Subject.id == new_rubric.subject_id).first()
     
-    return build_rubric_response(new_rubric, subject.name if subject else None, db)
+    return build_rubric_response(new_rubric)
 
 @router.delete("/{rubric_id}")
 def delete_rubric(rubric_id: int, db: Session = Depends(get_db)):
@@ -154,6 +146,7 @@ def delete_rubric(rubric_id: int, db: Session = Depends(get_db)):
     
     db.delete(rubric)
     db.commit()
+    forget_rubric_plan(rubric_id)
     
     return {"message": "Rubric deleted successfully", "id": rubric_id}
 
@@ -183,6 +176,8 @@ def update_rubric(rubric_id: int, rubric: RubricCreate, db: Session = Depends(ge
     db_rubric.duration_minutes = rubric.duration_minutes
     db_rubric.total_marks = total_marks
     db_rubric.ai_instructions = rubric.ai_instructions
+    # Distribution-only edits leave the row unchanged; bump it so cached plans go stale
+    db_rubric.updated_at = datetime.utcnow()
     
     # Delete old distributions
     db.query(RubricQuestionDistribution).filter(
@@ -211,26 +206,21 @@ def update_rubric(rubric_id: int, rubric: RubricCreate, db: Session = Depends(ge
         db.add(db_lo)
     
     db.commit()
+    forget_rubric_plan(rubric_id)
     db.refresh(db_rubric)
     
-    subject = db.query(Subject).filter(Subject.id == db_rubric.subject_id).first()
-    return build_rubric_response(db_rubric, subject.name if subject else None, db)
+    return build_rubric_response(db_rubric)
 
-def build_rubric_response(rubric: Rubric, subject_name: str | None, db: Session) -> dict:
-    """Helper to build rubric response with distributions"""
-    question_dists = db.query(RubricQuestionDistribution).filter(
-        RubricQuestionDistribution.rubric_id == rubric.id
-    ).all()
-    
-    lo_dists = db.query(RubricLODistribution).filter(
-        RubricLODistribution.rubric_id == rubric.id
-    ).all()
-    
+def build_rubric_response(rubric: Rubric) -> dict:
+    """
+    Helper to build rubric response with distributions. Reads the subject and
+    distribution relationships, so load lists through rubric_query() to avoid N+1.
+    """
     return {
         "id": rubric.id,
         "name": rubric.name,
         "subject_id": rubric.subject_id,
-        "subject_name": subject_name,
+        "subject_name": rubric.subject.name if rubric.subject else None,
         "exam_type": rubric.exam_type,
         "duration_minutes": rubric.duration_minutes,
         "total_marks": rubric.total_marks,
@@ -241,13 +231,13 @@ def build_rubric_response(rubric: Rubric, subject_name: str | None, db: Session)
                 "count": qd.count,
                 "marks_each": qd.marks_each
             }
-            for qd in question_dists
+            for qd in rubric.question_distributions
         ],
         "lo_distributions": [
             {
                 "learning_outcome": lo.learning_outcome,
                 "percentage": lo.percentage
             }
-            for lo in lo_dists
+            for lo in rubric.lo_distributions
         ]
     }
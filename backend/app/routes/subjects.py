@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from ..database import get_db
-from ..models import Subject
+from ..models import Subject, Topic, Question
 from pydantic import BaseModel
 from typing import List
 from datetime import datetime
@@ -29,27 +30,48 @@ class SubjectResponse(SubjectBase):
     class Config:
         from_attributes = True
 
+def _subjects_with_counts(db: Session, subject_id: int = None):
+    """Subjects with their topic and question counts, in one statement (no topic/question rows loaded)."""
+    chapter_counts = (
+        db.query(Topic.subject_id, func.count(Topic.id).label("chapters"))
+        .group_by(Topic.subject_id)
+        .subquery()
+    )
+    question_counts = (
+        db.query(Topic.subject_id, func.count(Question.id).label("questions"))
+        .join(Question, Question.topic_id == Topic.id)
+        .group_by(Topic.subject_id)
+        .subquery()
+    )
+    query = (
+        db.query(
+            Subject,
+            func.coalesce(chapter_counts.c.chapters, 0),
+            func.coalesce(question_counts.c.questions, 0)
+        )
+        .outerjoin(chapter_counts, chapter_counts.c.subject_id == Subject.id)
+        .outerjoin(question_counts, question_counts.c.subject_id == Subject.id)
+    )
+    if subject_id is not None:
+        query = query.filter(Subject.id == subject_id)
+    return query.order_by(Subject.id).all()
+
+def _to_response(s: Subject, chapter_count: int, question_count: int) -> SubjectResponse:
+    return SubjectResponse(
+        id=s.id,
+        name=s.name,
+        code=s.code,
+        color=s.color,
+        gradient=s.gradient,
+        introduction=s.introduction,
+        chapters=chapter_count,
+        questions=question_count,
+        created_at=s.created_at
+    )
+
 @router.get("/", response_model=List[SubjectResponse])
 def get_subjects(db: Session = Depends(get_db)):
-    subjects = db.query(Subject).all()
-    # Calculate counts dynamically
-    response = []
-    for s in subjects:
-        chapter_count = len(s.topics)
-        question_count = sum(len(t.questions) for t in s.topics)
-        resp = SubjectResponse(
-            id=s.id,
-            name=s.name,
-            code=s.code,
-            color=s.color,
-            gradient=s.gradient,
-            introduction=s.introduction,
-            chapters=chapter_count,
-            questions=question_count,
-            created_at=s.created_at
-        )
-        response.append(resp)
-    return response
+    return [_to_response(s, chapters, questions) for s, chapters, questions in _subjects_with_counts(db)]
 
 @router.post("/", response_model=SubjectResponse)
 def create_subject(subject: SubjectCreate, db: Session = Depends(get_db)):
@@ -61,29 +83,14 @@ def create_subject(subject: SubjectCreate, db: Session = Depends(get_db)):
     from ..services.logging_service import logging_service
     logging_service.log_activity(db, "Subject Created", details={"name": db_subject.name, "code": db_subject.code})
     
-    return db_subject # chapters=0, questions=0 by default
+    return _to_response(db_subject, 0, 0)
 
 @router.get("/{subject_id}", response_model=SubjectResponse)
 def get_subject(subject_id: int, db: Session = Depends(get_db)):
-    db_subject = db.query(Subject).filter(Subject.id == subject_id).first()
-    if not db_subject:
+    rows = _subjects_with_counts(db, subject_id)
+    if not rows:
         raise HTTPException(status_code=404, detail="Subject not found")
-    
-    chapter_count = len(db_subject.topics)
-    question_count = sum(len(t.questions) for t in db_subject.topics)
-    
-    # Manually construct response to ensure counts are included
-    return SubjectResponse(
-        id=db_subject.id,
-        name=db_subject.name,
-        code=db_subject.code,
-        color=db_subject.color,
-        gradient=db_subject.gradient,
-        introduction=db_subject.introduction,
-        chapters=chapter_count,
-        questions=question_count,
-        created_at=db_subject.created_at
-    )
+    return _to_response(*rows[0])
 
 @router.put("/{subject_id}", response_model=SubjectResponse)
 def update_subject(subject_id: int, subject: SubjectUpdate, db: Session = Depends(get_db)):
@@ -93,28 +100,15 @@ def update_subject(subject_id: int, subject: SubjectUpdate, db: Session = Depend
     for var, value in subject.dict().items():
         setattr(db_subject, var, value)
     db.commit()
-    db.refresh(db_subject)
-    
-    chapter_count = len(db_subject.topics)
-    question_count = sum(len(t.questions) for t in db_subject.topics)
-    
-    return SubjectResponse(
-        id=db_subject.id,
-        name=db_subject.name,
-        code=db_subject.code,
-        color=db_subject.color,
-        gradient=db_subject.gradient,
-        introduction=db_subject.introduction,
-        chapters=chapter_count,
-        questions=question_count,
-        created_at=db_subject.created_at
-    )
+    return _to_response(*_subjects_with_counts(db, subject_id)[0])
 
 @router.delete("/{subject_id}")
 def delete_subject(subject_id: int, db: Session = Depends(get_db)):
     db_subject = db.query(Subject).filter(Subject.id == subject_id).first()
     if not db_subject:
         raise HTTPException(status_code=404, detail="Subject not found")
+    from ..services.document_registry import release_subject
+    release_subject(db, subject_id)
     db.delete(db_subject)
     db.commit()
     return {"message": "Subject deleted"}
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from ..database import get_db
-from ..models import Topic
+from ..models import Topic, Question
 from pydantic import BaseModel
 from typing import List
 from datetime import datetime
@@ -28,10 +29,25 @@ class TopicResponse(TopicBase):
 
 @router.get("/subjects/{subject_id}/topics", response_model=List[TopicResponse])
 def get_topics(subject_id: int, db: Session = Depends(get_db)):
-    topics = db.query(Topic).filter(Topic.subject_id == subject_id).all()
-    # Populate question_count
-    for t in topics:
-        t.question_count = len(t.questions)
+    # Question counts come from one grouped subquery instead of loading every question
+    question_counts = (
+        db.query(Question.topic_id, func.count(Question.id).label("questions"))
+        .join(Topic, Topic.id == Question.topic_id)
+        .filter(Topic.subject_id == subject_id)
+        .group_by(Question.topic_id)
+        .subquery()
+    )
+    rows = (
+        db.query(Topic, func.coalesce(question_counts.c.questions, 0))
+        .outerjoin(question_counts, question_counts.c.topic_id == Topic.id)
+        .filter(Topic.subject_id == subject_id)
+        .order_by(Topic.id)
+        .all()
+    )
+    topics = []
+    for t, question_count in rows:
+        t.question_count = question_count
+        topics.append(t)
     return topics
 
 @router.post("/subjects/{subject_id}/topics", response_model=TopicResponse)
@@ -57,6 +73,8 @@ def delete_topic(topic_id: int, db: Session = Depends(get_db)):
     db_topic = db.query(Topic).filter(Topic.id == topic_id).first()
     if not db_topic:
         raise HTTPException(status_code=404, detail="Topic not found")
+    from ..services.document_registry import release_topic
+    release_topic(db, topic_id)
     db.delete(db_topic)
     db.commit()
     return {"message": "Topic deleted"}
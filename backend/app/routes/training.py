@@ -1,7 +1,10 @@
-from fastapi import APIRouter, UploadFile, File, Form
-from ..services.training_service import training_service
-import shutil
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from starlette.concurrency import run_in_threadpool
+from ..services.ingestion_service import ingestion_queue
+from ..services.upload_service import receive_upload
+from ..services import document_registry
 import os
+import shutil
 
 router = APIRouter()
 
@@ -11,55 +14,95 @@ async def upload_document(
     topic_id: int = Form(None),
     file: UploadFile = File(...)
 ):
-    # Save file temporarily
-    os.makedirs("temp", exist_ok=True)
-    file_path = f"temp/{file.filename}"
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    
-    # Process with Training Service
-    result = await training_service.train_on_document(file_path, subject_id, topic_id)
-    
-    # Cleanup
-    os.remove(file_path)
-    
-    return {"message": "Document processed", "details": result}
+    # Stream to a private temp dir (keeps the original name for chunk ids); 413 when oversized
+    upload = await receive_upload(file)
+    try:
+        # The ingestion job takes over the file; parsing and embedding happen in the background
+        file_path = upload.detach()
+    finally:
+        upload.close()
+
+    try:
+        job_id = await run_in_threadpool(
+            ingestion_queue.submit, file_path, subject_id, topic_id, content_hash=upload.sha256, size=upload.size
+        )
+    except Exception:
+        shutil.rmtree(os.path.dirname(file_path), ignore_errors=True)
+        raise
+    return {
+        "message": "Document queued for processing",
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/api/training/jobs/{job_id}"
+    }
+
+@router.get("/jobs")
+async def list_jobs(limit: int = 20):
+    return await run_in_threadpool(ingestion_queue.recent, limit)
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: int):
+    job = await run_in_threadpool(ingestion_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/jobs/{job_id}/retry")
+async def retry_job(job_id: int):
+    try:
+        job = await run_in_threadpool(ingestion_queue.retry, job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 @router.get("/files/{subject_code}")
 async def list_files(subject_code: str):
-    # Knowledge base root is 4 levels up from this file's grandparent's parent? 
-    # Let's use a simpler way to find the KB path.
+    # Served from the document registry (see services/document_registry.py), merged with the KB folder
+    return await run_in_threadpool(document_registry.list_files, subject_code, _kb_subject_dir(subject_code))
+
+def _kb_subject_dir(subject_code):
     kb_path = os.path.abspath(os.path.join(os.getcwd(), "..", "knowledge_base", "subjects", subject_code))
-    # If not found at root, try relative to backend
     if not os.path.exists(kb_path):
         kb_path = os.path.abspath(os.path.join(os.getcwd(), "knowledge_base", "subjects", subject_code))
-    
-    if not os.path.exists(kb_path):
-        return []
-    
-    files = []
-    for f in os.listdir(kb_path):
-        f_path = os.path.join(kb_path, f)
-        if os.path.isfile(f_path):
-            files.append({
-                "id": f,
-                "name": f,
-                "size": f"{os.path.getsize(f_path) / (1024 * 1024):.1f} MB",
-                "status": "ready"
-            })
-    return files
+    return kb_path
 
 @router.delete("/files/{subject_code}/{filename}")
 async def delete_file(subject_code: str, filename: str):
-    kb_path = os.path.abspath(os.path.join(os.getcwd(), "..", "knowledge_base", "subjects", subject_code))
-    if not os.path.exists(kb_path):
-        kb_path = os.path.abspath(os.path.join(os.getcwd(), "knowledge_base", "subjects", subject_code))
-    
-    file_path = os.path.join(kb_path, filename)
-    if os.path.exists(file_path):
+    from ..services.rag_service import get_rag_service
+    rag = get_rag_service()
+    entries = await run_in_threadpool(document_registry.find, subject_code, filename)
+    # Files indexed before the registry existed are only known to the vector store by code
+    keys = {key for key, _ in entries} or {subject_code}
+    removed_chunks = 0
+    for key in keys:
+        removed_chunks += await run_in_threadpool(rag.delete_file, key, filename)
+
+    file_path = os.path.join(_kb_subject_dir(subject_code), os.path.basename(filename))
+    on_disk = os.path.exists(file_path)
+    if on_disk:
         os.remove(file_path)
-        # Note: In a production system, we'd also remove from ChromaDB collection
-        # But for this prototype, we'll rely on the next 'sync_external_knowledge' run
-        return {"message": "File deleted"}
-    return {"message": "File not found"}
+    if entries or on_disk or removed_chunks:
+        return {"message": "File deleted", "chunks_removed": removed_chunks}
+    return {"message": "File not found", "chunks_removed": removed_chunks}
+
+# Plain `def` handlers below: FastAPI runs them in the threadpool, so the filesystem scan,
+# store compaction and sidecar round-trips never block the event loop.
+@router.post("/compact")
+def compact_index():
+    from ..services.rag_service import get_rag_service
+    service = get_rag_service()
+    if not service.wait_until_ready(timeout=float(os.getenv("RAG_ADMIN_READY_TIMEOUT", "10"))):
+        raise HTTPException(status_code=503, detail="RAG service is not ready (disabled or still warming up)")
+    return service.compact_index()
+
+@router.get("/cache-stats")
+def cache_stats():
+    from ..services.rag_service import get_rag_service
+    from ..services import context_assembler
+    from ..services.document_extractor import extraction_stats
+    stats = get_rag_service().cache_stats()
+    stats["context_assembly"] = context_assembler.stats()
+    stats["extraction"] = extraction_stats()
+    return stats
@@ -1,39 +1,205 @@
-from sqlalchemy import inspect, text
-from .models import Question
+"""
+Lightweight schema migrations, an alternative to Alembic for the columns and indexes
+create_all() cannot add to existing tables.
+
+MIGRATIONS is an ordered, append-only list of (version, description, function).
+ensure_schema_sync() runs the ones not yet recorded in the schema_migrations table and
+records each one that succeeds. The first failure stops the run, so a later migration
+never sees a half-migrated schema; it is retried on the next start. Every operation
+checks the live schema first, so migrations are no-ops on a fresh database and safe when
+several workers start at once. Never edit a migration that has shipped; add a new one.
+
+add_column() and create_index() change the schema online where the database can:
+- PostgreSQL: ADD COLUMN IF NOT EXISTS (catalog-only for nullable columns) and
+  CREATE INDEX CONCURRENTLY outside a transaction; an invalid index left by an
+  interrupted build is dropped and rebuilt.
+- MySQL: ALGORITHM=INPLACE, LOCK=NONE, falling back to a plain statement where the
+  server refuses it.
+- SQLite: plain statements. ADD COLUMN only rewrites the schema; CREATE INDEX holds the
+  write lock while it builds.
+"""
+from datetime import datetime
+from sqlalchemy import inspect, text, select, MetaData, Table, Column, String, DateTime
+from sqlalchemy.exc import IntegrityError
+
+_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations", _metadata,
+    Column("version", String(50), primary_key=True),
+    Column("description", String(255)),
+    Column("applied_at", DateTime)
+)
+
+
+def _has_table(engine, table):
+    return inspect(engine).has_table(table)
+
+
+def _columns(engine, table):
+    return {c['name'] for c in inspect(engine).get_columns(table)}
+
+
+def _indexes(engine, table):
+    return {index['name'] for index in inspect(engine).get_indexes(table)}
+
+
+def _execute_first(engine, statements):
+    """Runs the first statement the database accepts (online variant, then plain)."""
+    for i, statement in enumerate(statements):
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(statement))
+            return
+        except Exception:
+            if i == len(statements) - 1:
+                raise
+
+
+def add_column(engine, table, name, sql_type):
+    """Adds a nullable column if it is missing. Returns True if it was added."""
+    if name in _columns(engine, table):
+        return False
+    print(f"[DB] 🔄 Column '{name}' missing in '{table}'. Patching...")
+    dialect = engine.dialect.name
+    if dialect == "postgresql":
+        statements = [f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {name} {sql_type}"]
+    elif dialect == "mysql":
+        statements = [
+            f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}, ALGORITHM=INPLACE, LOCK=NONE",
+            f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}"
+        ]
+    else:
+        statements = [f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}"]
+    try:
+        _execute_first(engine, statements)
+    except Exception:
+        if name not in _columns(engine, table):  # not just added by another worker
+            raise
+    print(f"[DB] ✅ Successfully added '{name}' column.")
+    return True
+
+
+def _pg_index_valid(engine, name):
+    with engine.connect() as conn:
+        row = conn.execute(text(
+            "SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid WHERE c.relname = :name"
+        ), {"name": name}).first()
+    return row is None or row[0]
+
+
+def create_index(engine, table, name, columns):
+    """Creates an index if it is missing. Returns True if it was created."""
+    dialect = engine.dialect.name
+    existing = _indexes(engine, table)
+    if dialect == "postgresql" and name in existing and not _pg_index_valid(engine, name):
+        print(f"[DB] 🔄 Index '{name}' is invalid (interrupted build). Rebuilding...")
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        existing.discard(name)
+    if name in existing:
+        return False
+
+    print(f"[DB] 🔄 Index '{name}' missing on '{table}'. Creating...")
+    column_list = ", ".join(columns)
+    try:
+        if dialect == "postgresql":
+            # CONCURRENTLY cannot run inside a transaction block
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({column_list})"))
+        elif dialect == "mysql":
+            _execute_first(engine, [
+                f"CREATE INDEX {name} ON {table} ({column_list}) ALGORITHM=INPLACE LOCK=NONE",
+                f"CREATE INDEX {name} ON {table} ({column_list})"
+            ])
+        else:
+            _execute_first(engine, [f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column_list})"])
+    except Exception:
+        if name not in _indexes(engine, table):  # not just created by another worker
+            raise
+    print(f"[DB] ✅ Successfully created '{name}'.")
+    return True
+
+
+def _question_outcome_columns(engine):
+    if _has_table(engine, "questions"):
+        # JSON exists on MySQL and PostgreSQL; SQLite stores it as text
+        add_column(engine, "questions", "course_outcomes", "JSON")
+        # Singular column kept for compatibility
+        add_column(engine, "questions", "course_outcome", "VARCHAR(50)")
+
+
+def _document_registry_columns(engine):
+    # 'documents' became the chunk registry; older databases have the bare table
+    if not _has_table(engine, "documents"):
+        return
+    registry_columns = [
+        ("subject_key", "VARCHAR(50)"),
+        ("origin", "VARCHAR(20)"),
+        ("content_hash", "VARCHAR(64)"),
+        ("size_bytes", "INTEGER"),
+        ("char_count", "INTEGER"),
+        ("chunk_count", "INTEGER"),
+        ("embedding_model", "VARCHAR(100)"),
+        ("embedding_version", "INTEGER"),
+        ("updated_at", "DATETIME" if engine.dialect.name == "mysql" else "TIMESTAMP"),
+    ]
+    for name, sql_type in registry_columns:
+        add_column(engine, "documents", name, sql_type)
+    create_index(engine, "documents", "ix_documents_subject_id", ["subject_id"])
+    create_index(engine, "documents", "ix_documents_subject_key", ["subject_key"])
+
+
+def _hot_filter_indexes(engine):
+    indexes = [
+        ("questions", "ix_questions_status_lo_bloom", ["status", "learning_outcome", "bloom_level"]),
+        ("questions", "ix_questions_lo_bloom", ["learning_outcome", "bloom_level"]),
+        ("questions", "ix_questions_created_at", ["created_at"]),
+        ("questions", "ix_questions_topic_status", ["topic_id", "status"]),
+        ("questions", "ix_questions_rubric_lo", ["rubric_id", "learning_outcome"]),
+        ("topics", "ix_topics_subject_id", ["subject_id"]),
+        ("rubric_question_distributions", "ix_rubric_question_distributions_rubric_id", ["rubric_id"]),
+        ("rubric_lo_distributions", "ix_rubric_lo_distributions_rubric_id", ["rubric_id"]),
+    ]
+    for table, name, columns in indexes:
+        if _has_table(engine, table):
+            create_index(engine, table, name, columns)
+
+
+MIGRATIONS = [
+    ("001", "questions: course_outcomes and course_outcome columns", _question_outcome_columns),
+    ("002", "documents: chunk registry columns and indexes", _document_registry_columns),
+    ("003", "indexes for the hot Question, Topic and rubric filters", _hot_filter_indexes),
+]
+
+
+def applied_migrations(engine):
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(select(schema_migrations.c.version))}
+
 
 def ensure_schema_sync(engine):
     """
-    Safely adds missing columns to the database.
-    This is a lightweight alternative to Alembic for critical columns.
+    Applies pending migrations in order. Returns the versions applied by this call.
     """
-    inspector = inspect(engine)
-    
-    # Check 'questions' table
-    if 'questions' in inspector.get_table_names():
-        columns = [c['name'] for c in inspector.get_columns('questions')]
-        
-        # Add 'course_outcomes' if missing
-        if 'course_outcomes' not in columns:
-            print("[DB] 🔄 Column 'course_outcomes' missing in 'questions'. Patching...")
-            try:
-                # Use JSON for SQLite/MySQL/Postgres
-                # SQLite: JSON is just text but and sqlite3 >= 3.38 supports -> operators
-                # PostgreSQL: JSON type exists
-                # MySQL: JSON type exists
-                with engine.begin() as conn:
-                    conn.execute(text("ALTER TABLE questions ADD COLUMN course_outcomes JSON"))
-                print("[DB] ✅ Successfully added 'course_outcomes' column.")
-            except Exception as e:
-                print(f"[DB] ❌ Failed to add 'course_outcomes': {e}")
-                
-        # Add 'course_outcome' (singular) if missing (compatibility)
-        if 'course_outcome' not in columns:
-            print("[DB] 🔄 Column 'course_outcome' missing in 'questions'. Patching...")
-            try:
-                with engine.begin() as conn:
-                    conn.execute(text("ALTER TABLE questions ADD COLUMN course_outcome VARCHAR(50)"))
-                print("[DB] ✅ Successfully added 'course_outcome' column.")
-            except Exception as e:
-                print(f"[DB] ❌ Failed to add 'course_outcome': {e}")
-
-    # Add other critical check here if needed
+    _metadata.create_all(bind=engine)
+    applied = applied_migrations(engine)
+    newly_applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        print(f"[DB] Applying migration {version}: {description}")
+        try:
+            migrate(engine)
+        except Exception as e:
+            print(f"[DB] ❌ Migration {version} failed: {e}. Later migrations wait for the next start.")
+            break
+        try:
+            with engine.begin() as conn:
+                conn.execute(schema_migrations.insert().values(
+                    version=version, description=description, applied_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            pass  # recorded by another worker that ran it at the same time
+        newly_applied.append(version)
+    return newly_applied
@@ -0,0 +1,163 @@
+"""
+Builds the "Context for generation" block of a prompt from retrieved chunks or file text.
+
+Prompt tokens dominate local-model latency, so instead of joining everything we:
+1. drop near-duplicate chunks (word 5-gram shingles; a chunk mostly covered by the chunks
+   already kept is skipped) and lines repeated across chunks ("Source: Wikipedia", ...),
+2. rank chunks by retrieval order plus overlap with the query,
+3. pack them into the model's token budget.
+
+Budgets are per model (substring match on the model name, see MODEL_TOKEN_BUDGETS),
+overridable with CONTEXT_TOKEN_BUDGETS='{"phi3:mini": 2000}'; CONTEXT_TOKEN_BUDGET is the
+fallback. Tokens are estimated at ~4 characters each.
+"""
+import os
+import re
+import json
+import threading
+
+# Context tokens per model, leaving room for the instructions and the JSON answer.
+MODEL_TOKEN_BUDGETS = {
+    "phi3:mini": 1500,  # Ollama runs it with a 2k-4k window
+    "llama3": 3000,
+    "mistral": 3000,
+    "gemini": 12000,
+    "gpt-4o": 12000,
+    "gpt-4": 6000,
+    "claude": 12000,
+}
+
+_WORD = re.compile(r"\w+")
+_stats = {"requests": 0, "tokens_in": 0, "tokens_out": 0, "duplicates_removed": 0}
+_stats_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    return (len(text) + 3) // 4
+
+
+def token_budget(model):
+    budgets = dict(MODEL_TOKEN_BUDGETS)
+    overrides = os.getenv("CONTEXT_TOKEN_BUDGETS")
+    if overrides:
+        try:
+            budgets.update(json.loads(overrides))
+        except ValueError:
+            print(f"[CTX] Ignoring invalid CONTEXT_TOKEN_BUDGETS: {overrides}")
+    name = (model or "").lower()
+    # Longest key first so "gpt-4o" wins over "gpt-4".
+    for key in sorted(budgets, key=len, reverse=True):
+        if key.lower() in name:
+            return int(budgets[key])
+    return int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+
+
+def split_text(text, chunk_chars=1000):
+    """Splits raw document text into roughly chunk_chars pieces on paragraph boundaries."""
+    chunks, current = [], ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        while len(paragraph) > chunk_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:chunk_chars])
+            paragraph = paragraph[chunk_chars:]
+        if current and len(current) + len(paragraph) + 2 > chunk_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _shingles(text, size=5):
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return {hash(tuple(words))} if words else set()
+    return {hash(tuple(words[i:i + size])) for i in range(len(words) - size + 1)}
+
+
+def _truncate(text, max_tokens):
+    cut = text[:max_tokens * 4]
+    boundary = max(cut.rfind(". "), cut.rfind("\n"))
+    return cut[:boundary + 1] if boundary > len(cut) // 2 else cut
+
+
+def assemble_context(chunks, budget_tokens, query=None, keep_order=False, dup_threshold=None):
+    """
+    Returns (context_text, report). `chunks` are in retrieval order (best first) unless
+    keep_order is set, in which case the kept chunks are emitted in their original order.
+    """
+    threshold = dup_threshold if dup_threshold is not None else float(os.getenv("CONTEXT_DUP_THRESHOLD", "0.8"))
+    tokens_in = sum(estimate_tokens(chunk) for chunk in chunks)
+
+    # 1. Near-duplicate removal, then drop lines already seen in an earlier chunk.
+    unique, seen_shingles, seen_lines, duplicates = [], set(), set(), 0
+    for position, chunk in enumerate(chunks):
+        shingles = _shingles(chunk)
+        if not shingles:
+            continue
+        if len(shingles & seen_shingles) / len(shingles) >= threshold:
+            duplicates += 1
+            continue
+        lines = []
+        for line in chunk.splitlines():
+            key = " ".join(line.lower().split())
+            if key and key in seen_lines:
+                continue
+            seen_lines.add(key)
+            lines.append(line)
+        seen_shingles |= shingles
+        unique.append((position, "\n".join(lines).strip()))
+
+    # 2. Rank: retrieval order first, nudged by how many query terms the chunk covers.
+    terms = set(_WORD.findall(query.lower())) if query else set()
+    def score(item):
+        position, chunk = item
+        overlap = len(terms & set(_WORD.findall(chunk.lower()))) / len(terms) if terms else 0.0
+        return overlap + 1.0 / (position + 1)
+    ranked = sorted(unique, key=score, reverse=True)
+
+    # 3. Pack into the budget; the first chunk that does not fit is trimmed to the remainder.
+    selected, used = [], 0
+    for position, chunk in ranked:
+        cost = estimate_tokens(chunk) + 1  # + separator
+        if used + cost > budget_tokens:
+            remaining = budget_tokens - used - 1
+            if remaining >= 100:
+                chunk = _truncate(chunk, remaining)
+                selected.append((position, chunk))
+                used += estimate_tokens(chunk) + 1
+            break
+        selected.append((position, chunk))
+        used += cost
+    if keep_order:
+        selected.sort()
+
+    text = "\n\n".join(chunk for _, chunk in selected)
+    report = {
+        "budget": budget_tokens,
+        "chunks_in": len(chunks),
+        "chunks_kept": len(selected),
+        "duplicates_removed": duplicates,
+        "tokens_in": tokens_in,
+        "tokens_out": estimate_tokens(text),
+        "tokens_saved": max(0, tokens_in - estimate_tokens(text))
+    }
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["tokens_in"] += report["tokens_in"]
+        _stats["tokens_out"] += report["tokens_out"]
+        _stats["duplicates_removed"] += duplicates
+    return text, report
+
+
+def stats():
+    with _stats_lock:
+        result = dict(_stats)
+    result["tokens_saved"] = result["tokens_in"] - result["tokens_out"]
+    return result
@@ -0,0 +1,219 @@
+"""
+Single text-extraction path for uploads and knowledge base files.
+
+iter_units() yields a document lazily, one unit at a time: a page for PDF, a paragraph for
+DOCX and for plain text / Markdown, a block of rows for CSV. extract_text() consumes it with
+an optional character (or token) budget: units are written into one buffer, cut to the
+budget, and parsing stops as soon as it is reached. Memory is bounded by max_chars (the
+returned text is held whole), not by one page. It goes through the content-hash extraction
+cache for formats that are expensive to parse. Per-format throughput is kept in
+extraction_stats().
+
+SUPPORTED_EXTENSIONS are the formats accepted for uploads. Knowledge base indexing (startup
+auto-index and the KB watcher) only takes KB_EXTENSIONS, which leaves out Markdown so READMEs
+and notes kept in knowledge_base/subjects are not embedded.
+
+Large PDFs (PDF_PARALLEL_MIN_PAGES pages and up, default 200; smaller ones are parsed
+in-process) are split into page ranges and extracted in a process pool of
+PDF_EXTRACT_WORKERS processes (default: CPU count, max 4; 0 or 1 disables the pool). Every
+range re-opens the PDF, so ranges are large: about two per worker, and never fewer than
+PDF_PAGES_PER_TASK pages (default 64). Pages are still yielded in order, and ranges not yet
+started are cancelled once the caller stops at its budget. Pool processes are spawned, not
+forked: the server is multithreaded, and a forked child can inherit a lock held by another
+thread and deadlock.
+"""
+import io
+import os
+import math
+import time
+import atexit
+import threading
+import multiprocessing
+
+from .extraction_cache import extraction_cache
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt", ".md", ".csv")
+KB_EXTENSIONS = (".pdf", ".docx", ".txt", ".csv")
+# Only formats whose parsing costs real CPU are worth a cache entry.
+CACHED_EXTENSIONS = (".pdf", ".docx")
+CSV_ROWS_PER_UNIT = 200
+
+_stats = {}
+_stats_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _pdf_workers():
+    return int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from concurrent.futures import ProcessPoolExecutor
+            _pool = ProcessPoolExecutor(max_workers=_pdf_workers(), mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def _extract_pdf_range(path, start, stop):
+    """Runs in a pool process: extracts pages [start, stop) of the PDF."""
+    from PyPDF2 import PdfReader
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _iter_pdf(source):
+    from PyPDF2 import PdfReader
+    reader = PdfReader(source)
+    page_count = len(reader.pages)
+    # Pool workers reopen the file, so only uploads that live on disk can fan out.
+    if isinstance(source, str) and _pdf_workers() > 1 and page_count >= int(os.getenv("PDF_PARALLEL_MIN_PAGES", "200")):
+        yield from _iter_pdf_parallel(source, page_count)
+        return
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+
+def _iter_pdf_parallel(path, page_count):
+    step = max(1, int(os.getenv("PDF_PAGES_PER_TASK", "64")), math.ceil(page_count / (2 * _pdf_workers())))
+    pool = _get_pool()
+    futures = [pool.submit(_extract_pdf_range, path, start, min(start + step, page_count))
+               for start in range(0, page_count, step)]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        # Runs when the consumer stops early (budget reached) or fails: drop queued ranges.
+        for future in futures:
+            future.cancel()
+
+
+def _iter_docx(source):
+    from docx import Document as DocxDocument
+    doc = DocxDocument(source)
+    for para in doc.paragraphs:
+        yield para.text + "\n"
+
+
+def _open_text(source, newline=None):
+    if isinstance(source, str):
+        return open(source, "r", encoding="utf-8", errors="replace", newline=newline)
+    return io.TextIOWrapper(source, encoding="utf-8", errors="replace", newline=newline)
+
+
+def _iter_csv(source):
+    with _open_text(source, newline="") as f:
+        rows = []
+        for line in f:
+            rows.append(line)
+            if len(rows) >= CSV_ROWS_PER_UNIT:
+                yield "".join(rows)
+                rows = []
+        if rows:
+            yield "".join(rows)
+
+
+def _iter_plain(source):
+    # Paragraphs end at a blank line; lines keep their newlines so the joined text is the file.
+    with _open_text(source) as f:
+        paragraph = []
+        for line in f:
+            paragraph.append(line)
+            if not line.strip():
+                yield "".join(paragraph)
+                paragraph = []
+        if paragraph:
+            yield "".join(paragraph)
+
+
+def iter_units(source, name=None):
+    """
+    Yields the document's text lazily: pages (PDF), paragraphs (DOCX/TXT/MD), row blocks (CSV).
+    `source` is a path or a binary stream; for streams, `name` supplies the extension.
+    """
+    ext = os.path.splitext(name or source)[1].lower()
+    if ext == ".pdf":
+        return _iter_pdf(source)
+    if ext == ".docx":
+        return _iter_docx(source)
+    if ext == ".csv":
+        return _iter_csv(source)
+    return _iter_plain(source)
+
+
+def _record(ext, units, chars, seconds, cached):
+    with _stats_lock:
+        entry = _stats.setdefault(ext or "other", {"files": 0, "cached": 0, "units": 0, "chars": 0, "seconds": 0.0})
+        entry["files"] += 1
+        if cached:
+            entry["cached"] += 1
+            return
+        entry["units"] += units
+        entry["chars"] += chars
+        entry["seconds"] += seconds
+
+
+def extraction_stats():
+    """Per-format totals and parse throughput (cache hits excluded from throughput)."""
+    with _stats_lock:
+        result = {}
+        for ext, entry in _stats.items():
+            seconds = entry["seconds"]
+            result[ext] = {
+                **entry,
+                "seconds": round(seconds, 3),
+                "units_per_s": round(entry["units"] / seconds, 1) if seconds else None,
+                "chars_per_s": int(entry["chars"] / seconds) if seconds else None
+            }
+        return result
+
+
+def extract_text(source, max_chars=None, max_tokens=None, content_hash=None, name=None, on_unit=None):
+    """
+    Returns (text, page_offsets, complete) for a path or a binary stream (pass `name` for
+    streams). Parsing stops once max_chars (or max_tokens, ~4 characters each) is reached,
+    so at most max_chars characters are ever buffered; `complete` is False when the text was
+    cut. page_offsets holds where each unit starts.
+    `on_unit(units_parsed)` is called after every unit, for progress reporting.
+    """
+    if max_tokens is not None:
+        max_chars = min(max_chars or max_tokens * 4, max_tokens * 4)
+    ext = os.path.splitext(name or source)[1].lower()
+    use_cache = content_hash is not None and ext in CACHED_EXTENSIONS
+
+    if use_cache:
+        cached = extraction_cache.get(content_hash, max_chars)
+        if cached:
+            _record(ext, 0, 0, 0.0, cached=True)
+            text, pages = cached
+            if on_unit:
+                on_unit(len(pages))
+            return text, pages, max_chars is None or len(text) < max_chars
+
+    started = time.perf_counter()
+    buffer, pages, length, complete = io.StringIO(), [], 0, True
+    units = iter_units(source, name)
+    try:
+        for unit in units:
+            pages.append(length)
+            if max_chars is not None and length + len(unit) >= max_chars:
+                unit = unit[:max_chars - length]
+                complete = False  # stop before parsing the next page
+            buffer.write(unit)
+            length += len(unit)
+            if on_unit:
+                on_unit(len(pages))
+            if not complete:
+                break
+    finally:
+        units.close()
+    text = buffer.getvalue()
+    buffer.close()
+
+    _record(ext, len(pages), len(text), time.perf_counter() - started, cached=False)
+    if use_cache:
+        extraction_cache.put(content_hash, text, pages, max_chars, complete=complete)
+    return text, pages, complete
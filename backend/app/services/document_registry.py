@@ -0,0 +1,196 @@
+"""
+Relational record of what is in the vector index.
+
+process_file() registers every indexed file as a Document row (subject, name, SHA-256,
+size, chunk count, embedding model/version) with one DocumentChunk per chunk (vector-store
+id, SHA-1 of the text, length); delete_file() and compaction drop them again. Listing a
+subject's files and finding what to delete are then indexed queries instead of filesystem
+or Chroma scans, and embedding_version tells which documents need re-embedding after the
+model or the chunking changes.
+"""
+import os
+import hashlib
+from datetime import datetime
+
+from sqlalchemy import func, insert, or_
+
+from ..database import SessionLocal
+from ..models import Document, DocumentChunk, Subject, Topic, IngestionJob
+
+
+def _resolve_subject_id(db, subject_key):
+    # Uploads are keyed by subject id, knowledge base folders by (lower-case) subject code.
+    key = str(subject_key)
+    if key.isdigit():
+        return int(key)
+    subject = db.query(Subject.id).filter(func.lower(Subject.code) == key.lower()).first()
+    return subject.id if subject else None
+
+
+def register(subject_key, filename, chunk_ids, chunks, topic_id=None, origin="upload",
+             content_hash=None, size_bytes=None, embedding_model=None, embedding_version=1):
+    """Creates or replaces the registry entry of (subject_key, filename) and its chunk rows."""
+    db = SessionLocal()
+    try:
+        key = str(subject_key)
+        doc = db.query(Document).filter(Document.subject_key == key, Document.filename == filename).first()
+        if doc is None:
+            doc = Document(subject_key=key, filename=filename)
+            db.add(doc)
+        else:
+            db.query(DocumentChunk).filter(DocumentChunk.document_id == doc.id).delete(synchronize_session=False)
+        doc.subject_id = _resolve_subject_id(db, key)
+        doc.topic_id = topic_id
+        doc.origin = origin
+        doc.content = chunks[0][:500] if chunks else ""
+        doc.embedding_id = chunk_ids[0].rsplit("_", 1)[0] if chunk_ids else None
+        doc.content_hash = content_hash
+        doc.size_bytes = size_bytes
+        doc.char_count = sum(len(chunk) for chunk in chunks)
+        doc.chunk_count = len(chunks)
+        doc.embedding_model = embedding_model
+        doc.embedding_version = embedding_version
+        doc.updated_at = datetime.utcnow()
+        db.flush()
+        if chunks:
+            db.execute(insert(DocumentChunk), [
+                {
+                    "document_id": doc.id,
+                    "chunk_index": i,
+                    "embedding_id": chunk_id,
+                    "content_hash": hashlib.sha1(chunk.encode("utf-8")).hexdigest(),
+                    "char_count": len(chunk)
+                }
+                for i, (chunk_id, chunk) in enumerate(zip(chunk_ids, chunks))
+            ])
+        db.commit()
+        return doc.id
+    finally:
+        db.close()
+
+
+def remove(subject_key, filename):
+    """Drops the registry entry of (subject_key, filename). Returns the number of chunk rows removed."""
+    db = SessionLocal()
+    try:
+        doc = db.query(Document).filter(Document.subject_key == str(subject_key), Document.filename == filename).first()
+        if doc is None:
+            return 0
+        removed = db.query(DocumentChunk).filter(DocumentChunk.document_id == doc.id).delete(synchronize_session=False)
+        db.delete(doc)
+        db.commit()
+        return removed
+    finally:
+        db.close()
+
+
+def indexed_version(subject_key, filename):
+    """(content_hash, embedding_version) of the registered file, or None if it is not registered."""
+    db = SessionLocal()
+    try:
+        row = db.query(Document.content_hash, Document.embedding_version).filter(
+            Document.subject_key == str(subject_key), Document.filename == filename
+        ).first()
+        return tuple(row) if row else None
+    finally:
+        db.close()
+
+
+def kb_versions():
+    """{(subject_key, filename): (content_hash, embedding_version, chunk_count)} of knowledge base files."""
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            Document.subject_key, Document.filename, Document.content_hash, Document.embedding_version, Document.chunk_count
+        ).filter(Document.origin == "kb").all()
+        return {(row[0], row[1]): (row[2], row[3], row[4]) for row in rows}
+    finally:
+        db.close()
+
+
+def _subject_filter(db, subject_code):
+    subject = db.query(Subject.id).filter(func.lower(Subject.code) == subject_code.lower()).first()
+    if subject:
+        return or_(Document.subject_key == subject_code, Document.subject_id == subject.id), subject.id
+    return Document.subject_key == subject_code, None
+
+
+def list_files(subject_code, kb_dir=None):
+    """
+    Indexed files of a subject (by code), plus uploads still being ingested and files in its
+    knowledge base folder (kb_dir) that the index does not hold yet, as "not_indexed".
+    """
+    db = SessionLocal()
+    try:
+        condition, subject_id = _subject_filter(db, subject_code)
+        docs = db.query(
+            Document.filename, Document.subject_key, Document.size_bytes, Document.chunk_count,
+            Document.origin, Document.updated_at
+        ).filter(condition).order_by(Document.filename).all()
+        files = [
+            {
+                "id": doc.filename,
+                "name": doc.filename,
+                "size": f"{(doc.size_bytes or 0) / (1024 * 1024):.1f} MB",
+                "chunks": doc.chunk_count,
+                "origin": doc.origin,
+                "indexed_at": doc.updated_at.isoformat() if doc.updated_at else None,
+                "status": "ready"
+            }
+            for doc in docs
+        ]
+        if subject_id is not None:
+            pending = db.query(IngestionJob.id, IngestionJob.filename, IngestionJob.size_bytes, IngestionJob.status).filter(
+                IngestionJob.subject_id == str(subject_id), IngestionJob.status.in_(("queued", "running"))
+            ).all()
+            listed = {f["name"] for f in files}
+            files.extend(
+                {
+                    "id": job.filename,
+                    "name": job.filename,
+                    "size": f"{(job.size_bytes or 0) / (1024 * 1024):.1f} MB",
+                    "job_id": job.id,
+                    "status": "processing"
+                }
+                for job in pending if job.filename not in listed
+            )
+        # Files dropped into the folder before indexing ran, or while RAG is disabled
+        if kb_dir and os.path.isdir(kb_dir):
+            listed = {f["name"] for f in files}
+            for name in sorted(os.listdir(kb_dir)):
+                path = os.path.join(kb_dir, name)
+                if name not in listed and os.path.isfile(path):
+                    files.append({
+                        "id": name,
+                        "name": name,
+                        "size": f"{os.path.getsize(path) / (1024 * 1024):.1f} MB",
+                        "origin": "kb",
+                        "status": "not_indexed"
+                    })
+        return files
+    finally:
+        db.close()
+
+
+def find(subject_code, filename):
+    """Vector-store subject keys under which `filename` is indexed for the subject."""
+    db = SessionLocal()
+    try:
+        condition, _ = _subject_filter(db, subject_code)
+        return [
+            (key, origin) for key, origin in
+            db.query(Document.subject_key, Document.origin).filter(condition, Document.filename == filename)
+        ]
+    finally:
+        db.close()
+
+
+def release_subject(db, subject_id):
+    """Unlinks registry rows from a subject (and its topics) about to be deleted; the FKs would block it."""
+    topic_ids = db.query(Topic.id).filter(Topic.subject_id == subject_id)
+    db.query(Document).filter(Document.topic_id.in_(topic_ids)).update({Document.topic_id: None}, synchronize_session=False)
+    db.query(Document).filter(Document.subject_id == subject_id).update({Document.subject_id: None}, synchronize_session=False)
+
+
+def release_topic(db, topic_id):
+    db.query(Document).filter(Document.topic_id == topic_id).update({Document.topic_id: None}, synchronize_session=False)
@@ -0,0 +1,90 @@
+"""
+Cross-request micro-batching for query embeddings.
+
+Concurrent query_context calls each need one short embedding. Encoding them one by one
+runs dozens of single-row forward passes back to back; the batcher instead collects
+queries for up to RAG_BATCH_WAIT_MS milliseconds (or until RAG_BATCH_MAX_SIZE are queued),
+encodes them in one pass and resolves each caller's future.
+
+Tuning:
+- RAG_BATCH_WAIT_MS (default 5): how long the first query of a batch may wait for company.
+  0 = latency first: encode whatever is already queued, never wait.
+- RAG_BATCH_MAX_SIZE (default 32): flush as soon as this many queries are queued.
+  1 disables batching.
+"""
+import os
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+
+class EmbeddingBatcher:
+    def __init__(self, model, max_wait_ms=None, max_batch_size=None):
+        self.model = model
+        self.max_wait = (float(os.getenv("RAG_BATCH_WAIT_MS", "5")) if max_wait_ms is None else max_wait_ms) / 1000
+        self.max_batch_size = max(1, int(os.getenv("RAG_BATCH_MAX_SIZE", "32")) if max_batch_size is None else max_batch_size)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._largest_batch = 0
+        self._queue_waits = deque(maxlen=1000)
+        self._encode_times = deque(maxlen=1000)
+        worker = threading.Thread(target=self._run, name="rag-embedding-batcher", daemon=True)
+        worker.start()
+
+    def submit(self, text):
+        """Queues one text; the returned future resolves to its embedding (a list of floats)."""
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def encode(self, text):
+        return self.submit(text).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            try:
+                vectors = self.model.encode([text for text, _, _ in batch], convert_to_numpy=True)
+                for (_, future, _), vector in zip(batch, vectors):
+                    future.set_result(vector.tolist())
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._largest_batch = max(self._largest_batch, len(batch))
+                self._queue_waits.extend(started - enqueued for _, _, enqueued in batch)
+                self._encode_times.append(time.perf_counter() - started)
+
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._queue_waits)
+            encode_times = list(self._encode_times)
+            return {
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+                "max_batch_size": self.max_batch_size,
+                "batches": self._batches,
+                "items": self._items,
+                "mean_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "largest_batch": self._largest_batch,
+                "queue_wait_ms_p50": round(waits[len(waits) // 2] * 1000, 2) if waits else 0.0,
+                "queue_wait_ms_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 2) if waits else 0.0,
+                "encode_ms_mean": round(sum(encode_times) / len(encode_times) * 1000, 2) if encode_times else 0.0
+            }
@@ -0,0 +1,104 @@
+"""
+Content-addressed cache of text extracted from uploaded documents.
+
+Teachers upload the same syllabus PDF over and over; parsing it with PyPDF2 each time is
+the slowest part of the request. Entries are keyed by the SHA-256 of the uploaded bytes
+(computed while the upload is received, see upload_service), hold the extracted text plus
+the character offset where each page starts, and are stored gzip-compressed under
+EXTRACTION_CACHE_DIR. Disk usage is capped at EXTRACTION_CACHE_MAX_MB; the least recently
+used entries go first.
+"""
+import os
+import gzip
+import json
+import hashlib
+import threading
+
+
+def hash_file(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or os.getenv("EXTRACTION_CACHE_DIR", "./rag_cache/extracted")
+        self.max_bytes = max_bytes if max_bytes is not None else int(float(os.getenv("EXTRACTION_CACHE_MAX_MB", "512")) * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _path(self, sha256):
+        return os.path.join(self.cache_dir, f"{sha256}.json.gz")
+
+    def _entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json.gz"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def get(self, sha256, max_chars=None):
+        """
+        Returns (text, page_offsets) or None. An entry that was cut at a smaller character cap
+        than `max_chars` counts as a miss, since it cannot stand in for a longer extraction.
+        """
+        path = self._path(sha256)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)  # bump recency for LRU eviction
+        except (OSError, ValueError):
+            self.stats["misses"] += 1
+            return None
+        if not entry["complete"] and (max_chars is None or entry["max_chars"] < max_chars):
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        text, pages = entry["text"], entry["pages"]
+        if max_chars is not None and len(text) > max_chars:
+            text = text[:max_chars]
+            pages = [offset for offset in pages if offset < max_chars]
+        return text, pages
+
+    def put(self, sha256, text, page_offsets, max_chars=None, complete=True):
+        if self.max_bytes <= 0:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(sha256)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        entry = {"text": text, "pages": list(page_offsets), "max_chars": max_chars, "complete": complete}
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=3) as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._total_bytes = None  # recomputed by _evict
+            self._evict()
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        while entries and total > self.max_bytes:
+            _, size, name = entries.pop(0)
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+                self.stats["evictions"] += 1
+            except OSError:
+                pass
+            total -= size
+        self._total_bytes = total
+
+    def info(self):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            return {**self.stats, "disk_bytes": self._total_bytes, "max_bytes": self.max_bytes}
+
+
+extraction_cache = ExtractionCache()
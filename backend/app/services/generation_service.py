@@ -72,6 +72,19 @@ class GenerationService:
             key_str += str(rubric)
         return hashlib.md5(key_str.encode()).hexdigest()
 
+    def _context_budget(self, engine):
+        from .context_assembler import token_budget
+        is_cloud = engine in ["cloud", "openai", "gemini"] or os.getenv("RENDER") == "true"
+        return token_budget(self.cloud_model if is_cloud else self.local_model)
+
+    def _assemble_context(self, chunks, engine, query, keep_order=False):
+        """Deduplicates and ranks context chunks, then packs them into the model's token budget."""
+        from .context_assembler import assemble_context
+        context_text, report = assemble_context(chunks, self._context_budget(engine), query=query, keep_order=keep_order)
+        print(f"[CTX] Kept {report['chunks_kept']}/{report['chunks_in']} chunks "
+              f"({report['duplicates_removed']} near-duplicates), {report['tokens_out']}/{report['budget']} tokens, "
+              f"saved {report['tokens_saved']} tokens.")
+        return context_text
 
     def _generate_questions_core(self, context_text, subject_name, topic_name, blooms_level, count, rubric, engine, custom_prompt=None):
         """
@@ -252,7 +265,7 @@ class GenerationService:
         # No fallback list allowed anymore. If we fail, we raise the error so the user knows.
         raise Exception(f"Failed to generate valid questions after {max_retries} attempts. The AI model may be overloaded or the context is too complex.")
 
-    def generate_questions(self, subject_name, topic_name, blooms_level, count=5, subject_id=None, rubric=None, engine="local", custom_prompt=None):
+    def generate_questions(self, subject_name, topic_name, blooms_level, count=5, subject_id=None, rubric=None, engine="local", custom_prompt=None, context_list=None):
         # Check Cache First for Speed
         cache_key = self._get_cache_key(subject_name, topic_name, blooms_level, rubric)
         cache_file = os.path.join(self.cache_dir, f"{cache_key}.json")
@@ -269,7 +282,10 @@ class GenerationService:
         is_full_prompt = len(topic_name) > 40
         is_cloud_engine = engine in ["cloud", "openai", "gemini"]
         
-        if subject_name.lower() == "general" or is_full_prompt or is_cloud_engine:
+        if context_list is not None:
+            # Context already retrieved by the caller (per-task rubric retrieval)
+            context_text = self._assemble_context(context_list, engine, topic_name) if context_list else f"Topic: {topic_name}"
+        elif subject_name.lower() == "general" or is_full_prompt or is_cloud_engine:
             reason = "Subject: General" if subject_name.lower() == "general" else ("Prompt Length" if is_full_prompt else "Cloud Engine")
             print(f"[GEN] Strategy: Direct Cloud Generation (RAG Bypassed for Accuracy). Reason: {reason}.")
             context_text = f"User Prompt: {topic_name}" 
@@ -279,7 +295,7 @@ class GenerationService:
                 rag_service = get_rag_service()
                 context_list = rag_service.query_context(f"Questions about {topic_name}", subject_id=query_id)
                 if context_list and isinstance(context_list, list):
-                    context_text = chr(10).join(context_list)
+                    context_text = self._assemble_context(context_list, engine, topic_name)
                 else:
                     context_text = f"Topic: {topic_name}"
             except Exception as e:
@@ -296,10 +312,25 @@ class GenerationService:
             
         return result
 
-    def generate_questions_from_text(self, context_text, subject_name, topic_name, count=5, complexity="Balanced", engine="local", custom_prompt=None):
+    def select_file_context(self, file_key, text, queries):
+        """
+        Top-k chunks of an uploaded document per query (see RAGService.select_relevant_chunks).
+        Returns None when embeddings are unavailable; callers then pack the whole text.
+        """
+        try:
+            return get_rag_service().select_relevant_chunks(file_key, text, queries)
+        except Exception as e:
+            print(f"[RAG] Warning: file context selection failed {e}. Packing the document as is.")
+            return None
+
+    def generate_questions_from_text(self, context_text, subject_name, topic_name, count=5, complexity="Balanced", engine="local", custom_prompt=None, context_list=None):
         """
         Generate questions directly from provided text (file content), skipping RAG lookup.
+        `context_list` (chunks already selected from the text) takes precedence over the raw text.
         """
+        from .context_assembler import split_text
+        chunks = context_list if context_list else split_text(context_text)
+        context_text = self._assemble_context(chunks, engine, custom_prompt or topic_name, keep_order=True) or context_text
         return self._generate_questions_core(
             context_text=context_text,
             subject_name=subject_name,
@@ -311,124 +342,85 @@ class GenerationService:
             custom_prompt=custom_prompt
         )
 
-    def generate_from_rubric(self, rubric_id, db, engine="local", context_text=None, custom_prompt=None):
+    def generate_from_rubric(self, rubric_id, db, engine="local", context_text=None, custom_prompt=None, context_key=None):
         """
         Generate exam questions based on rubric constraints using PARALLEL EXECUTION
         Distributes questions across learning outcomes and question types
         Returns dict with generation progress and results
         """
-        from ..models import Rubric, Subject, Topic, Question, RubricQuestionDistribution, RubricLODistribution
-        from ..services.rubric_service import build_generation_prompt, calculate_lo_question_distribution
+        from ..models import Topic, CourseOutcome
+        from ..services.rubric_service import get_rubric_plan
         # Import self to access methods if needed, but we use self.generate_questions logic
         import concurrent.futures
         
-        # Get rubric
-        rubric = db.query(Rubric).filter(Rubric.id == rubric_id).first()
-        if not rubric:
+        # Compiled rubric: distributions, questions per LO and the (type, LO, count) tasks
+        plan = get_rubric_plan(rubric_id, db)
+        if plan is None:
             raise ValueError(f"Rubric {rubric_id} not found")
+        if plan.subject_name is None:
+            raise ValueError(f"Subject of rubric {rubric_id} not found")
         
-        # Get subject and topics
-        subject = db.query(Subject).filter(Subject.id == rubric.subject_id).first()
-        topics = db.query(Topic).filter(Topic.subject_id == rubric.subject_id).limit(5).all()
-        topic_names = [t.name for t in topics]
+        # Get topics (RUBRIC_MAX_TOPICS caps them; 0, the default, uses all of the subject's topics)
+        topic_query = db.query(Topic).filter(Topic.subject_id == plan.subject_id).order_by(Topic.id)
+        max_topics = int(os.getenv("RUBRIC_MAX_TOPICS", "0"))
+        topics = (topic_query.limit(max_topics) if max_topics > 0 else topic_query).all()
+
+        # Outcome descriptions sharpen each task's retrieval query when the outcome is defined
+        lo_codes = [lo for lo, _ in plan.lo_distributions]
+        lo_descriptions = {
+            outcome.code: outcome.description or outcome.label
+            for outcome in db.query(CourseOutcome).filter(CourseOutcome.code.in_(lo_codes)).all()
+            if outcome.description or outcome.label
+        } if lo_codes else {}
         
-        # Get RAG context (Heavy operation, do once)
         # Cloud Dominance: Skip RAG for cloud engines to maximize speed and accuracy
         is_cloud_engine = engine in ["cloud", "openai", "gemini"]
-        context = None
         
-        if not is_cloud_engine:
+        final_tasks = plan.task_list() # List of (question_type, lo, count, marks)
+        
+        # Give each task its own topic, round-robin. Topics are only all covered when there are
+        # at least as many tasks as topics; the rest get none in this run.
+        for i, task in enumerate(final_tasks):
+            topic = topics[i % len(topics)] if topics else None
+            task["topic_id"] = topic.id if topic else None
+            task["topic_name"] = topic.name if topic else plan.subject_name
+            lo_description = lo_descriptions.get(task["learning_outcome"])
+            task["query"] = f"{task['topic_name']}: {lo_description}" if lo_description else task["topic_name"]
+        
+        print(f"[GEN] Prepared {len(final_tasks)} parallel tasks: {final_tasks}")
+
+        # Retrieve every task's own context in one batched call (one embedding pass, one
+        # vector-store query) instead of sharing a single generic context across the exam.
+        task_contexts = [None] * len(final_tasks)
+        if context_text:
+            # Uploaded file: each task gets the parts of the document closest to its topic
+            queries = [f"{task['query']} {custom_prompt}" if custom_prompt else task['query'] for task in final_tasks]
+            task_contexts = self.select_file_context(context_key, context_text, queries) or task_contexts
+        elif is_cloud_engine:
+            print(f"[GEN] Strategy: Direct Cloud Generation (RAG Bypassed for Rubric).")
+        elif final_tasks:
             try:
-                from ..services.rag_service import get_rag_service
                 rag_service = get_rag_service()
-                context = rag_service.query_context(f"General concepts for {subject.name}", subject_id=subject.id)
-                print(f"[GEN] Prepared RAG context for {subject.name}.")
+                queries = [f"Questions about {task['query']}" for task in final_tasks]
+                task_contexts = rag_service.query_contexts(queries, subject_id=plan.subject_id)
+                print(f"[GEN] Prepared RAG context for {len(final_tasks)} tasks ({len(set(queries))} topics).")
             except Exception as e:
                 print(f"[RAG] Warning: Rubric RAG failed {e}. Proceeding without extra context.")
-        else:
-            print(f"[GEN] Strategy: Direct Cloud Generation (RAG Bypassed for Rubric).")
-        
-        # Build base prompt
-        base_prompt = build_generation_prompt(rubric, subject.name, topic_names, db, context=context)
-        
-        # Get distributions
-        question_dists = db.query(RubricQuestionDistribution).filter(
-            RubricQuestionDistribution.rubric_id == rubric_id
-        ).all()
-        
-        lo_question_counts = calculate_lo_question_distribution(rubric_id, db)
-        
-        # Prepare Generation Tasks
-        generation_tasks = []
-        
-        # Logic to split total LO counts into specific (Type, LO, Count) tasks
-        # We need to distribute the 'lo_question_counts' (e.g. LO1: 5 total) across the available types (MCQ, Essay, etc.)
-        
-        # 1. Total questions needed per type
-        type_counts = {qd.question_type: qd.count for qd in question_dists if qd.count > 0}
-        
-        # 2. Total questions needed per LO
-        lo_counts = lo_question_counts.copy() # e.g. {'LO1': 5, 'LO2': 5}
-        
-        # 3. Distribute gracefully
-        # Simple algorithm: Iterate through types, and grab needed counts from available LOs
-        
-        final_tasks = [] # List of (question_type, lo, count)
-        
-        active_los = list(lo_counts.keys())
-        lo_idx = 0
-        
-        for q_type, q_count in type_counts.items():
-            remaining_for_type = q_count
-            
-            while remaining_for_type > 0 and active_los:
-                current_lo = active_los[lo_idx % len(active_los)]
-                available_in_lo = lo_counts[current_lo]
-                
-                if available_in_lo > 0:
-                    # Take up to remaining_for_type, but not more than available_in_lo
-                    # Also try to batch reasonable chunks (e.g. don't do 1 if we can do 3)
-                    take = min(available_in_lo, remaining_for_type)
-                    
-                    final_tasks.append({
-                        "question_type": q_type,
-                        "learning_outcome": current_lo,
-                        "count": take,
-                        "marks": next(q.marks_each for q in question_dists if q.question_type == q_type)
-                    })
-                    
-                    lo_counts[current_lo] -= take
-                    remaining_for_type -= take
-                
-                lo_idx += 1
-                
-                # Check if we exhausted all LOs (safety break)
-                if sum(lo_counts.values()) == 0 and remaining_for_type > 0:
-                    # Just dump remaining into first LO
-                    final_tasks.append({
-                        "question_type": q_type,
-                        "learning_outcome": active_los[0],
-                        "count": remaining_for_type,
-                        "marks": next(q.marks_each for q in question_dists if q.question_type == q_type)
-                    })
-                    break
-        
-        print(f"[GEN] Prepared {len(final_tasks)} parallel tasks: {final_tasks}")
 
         # Execute Parallel Generation
         all_questions = []
         generation_log = {
             "rubric_id": rubric_id,
-            "subject": subject.name,
-            "total_questions": sum(type_counts.values()),
+            "subject": plan.subject_name,
+            "total_questions": sum(plan.type_counts.values()),
             "questions_generated": 0,
             "progress": []
         }
 
         # Helper function for the thread pool
-        def execute_task(task):
+        def execute_task(task, task_context):
             try:
-                print(f"[THREAD] Starting {task['count']} {task['question_type']} for {task['learning_outcome']} using {engine}")
+                print(f"[THREAD] Starting {task['count']} {task['question_type']} for {task['learning_outcome']} ({task['topic_name']}) using {engine}")
                 
                 # Enforce the question type + any custom user prompt
                 task_prompt = f"MUST strictly generate exactly {task['count']} {task['question_type']} questions. "
@@ -439,28 +431,30 @@ class GenerationService:
                     # Using explicitly provided file context
                     return self.generate_questions_from_text(
                         context_text=context_text,
-                        subject_name=subject.name,
-                        topic_name=f"{task['learning_outcome']} - {subject.name}",
+                        subject_name=plan.subject_name,
+                        topic_name=f"{task['topic_name']} - {task['learning_outcome']}",
                         count=task['count'],
                         complexity="Balanced",
                         engine=engine,
-                        custom_prompt=task_prompt
+                        custom_prompt=task_prompt,
+                        context_list=task_context
                     ), task
                 else:
                     # Using RAG or topic-based generation where prompt = topic_name internally
                     # To pass custom_prompt when there's no context_text, we pass the built prompt as topic_name
-                    final_topic = f"{task['learning_outcome']} - {subject.name}"
+                    final_topic = f"{task['topic_name']} - {task['learning_outcome']}"
                     if custom_prompt:
                          final_topic = f"Topic: {final_topic}. {task_prompt}"
 
                     return self.generate_questions(
-                        subject_name=subject.name,
+                        subject_name=plan.subject_name,
                         topic_name=final_topic,
                         blooms_level="Apply", 
                         count=task['count'],
                         rubric=None, 
                         engine=engine,
-                        custom_prompt=custom_prompt
+                        custom_prompt=custom_prompt,
+                        context_list=task_context
                     ), task
             except Exception as e:
                 print(f"[THREAD] Error: {e}")
@@ -470,7 +464,10 @@ class GenerationService:
 
         # Run with ThreadPool
         with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            future_to_task = {executor.submit(execute_task, task): task for task in final_tasks}
+            future_to_task = {
+                executor.submit(execute_task, task, task_context): task
+                for task, task_context in zip(final_tasks, task_contexts)
+            }
             
             for future in concurrent.futures.as_completed(future_to_task):
                 generated_qs, task = future.result()
@@ -479,13 +476,10 @@ class GenerationService:
                 # Better to collect all, then save batch to avoid DB Locking issues (SQLite)
                 
                 for q in generated_qs:
-                    import random
-                    topic = random.choice(topics) if topics else None
-                    
                     # Convert to DB Object (but don't add to session yet to avoid concurrency issues)
                     # We will add them all at once at the end
                     q_obj = {
-                         "topic_id": topic.id if topic else None,
+                         "topic_id": task['topic_id'],
                          "rubric_id": rubric_id,
                          "question_text": q.get('question_text') or q.get('question', ''),
                          "question_type": task['question_type'],
@@ -0,0 +1,145 @@
+"""
+Prebuilt knowledge base index for fast cold starts.
+
+`python train_kb.py --snapshot [path]` embeds every knowledge base file once and writes a
+single compressed artifact (KB_SNAPSHOT_PATH, default knowledge_base/index_snapshot.zip):
+
+- manifest.json: format version, snapshot id, embedding model/version and dimension, and
+  per file its subject, name, SHA-256, size and row range;
+- vectors.npy: float16 embeddings, one row per chunk;
+- chunks.json: chunk ids, texts and metadata, in the same row order.
+
+At startup auto_index_kb() calls restore(): when the embedding model and version match,
+every file whose SHA-256 on disk still equals the manifest's is written straight into the
+vector store (and the document registry) without embedding. Only files added or changed
+since the snapshot was built are embedded.
+
+The snapshot ships with the repository: commit it next to the knowledge base so that fresh
+clones and git-based deploys (e.g. Render) restore instead of re-embedding. Rebuild and
+commit it whenever the knowledge base changes; once it grows past a few tens of MB, track it
+with Git LFS (`git lfs track knowledge_base/index_snapshot.zip`) and enable LFS on the host.
+"""
+import io
+import os
+import json
+import time
+import hashlib
+import zipfile
+from datetime import datetime
+
+FORMAT_VERSION = 1
+
+
+def snapshot_path(service):
+    return os.getenv("KB_SNAPSHOT_PATH") or os.path.join(service.kb_path, "index_snapshot.zip")
+
+
+def build(service, path=None):
+    """Embeds the whole knowledge base and writes the snapshot. Returns the manifest."""
+    import numpy as np
+    from .rag_service import EMBEDDING_MODEL, EMBEDDING_VERSION
+
+    path = path or snapshot_path(service)
+    if not service.wait_until_ready() or service.model is None:
+        raise RuntimeError("RAG service is disabled; cannot embed the knowledge base")
+
+    files, vectors, ids, documents, metadatas = [], [], [], [], []
+    for subject_code, file_name, file_path in service.kb_files():
+        started = time.time()
+        prepared = service._prepare_chunks(file_path, subject_code, origin="kb")
+        if prepared is None:
+            continue
+        chunk_ids, chunks, chunk_metas, content_hash = prepared
+        embeddings = service._embed_chunks(chunks)
+        files.append({
+            "subject": subject_code,
+            "source": file_name,
+            "sha256": content_hash,
+            "size": os.path.getsize(file_path),
+            "start": len(ids),
+            "stop": len(ids) + len(chunks)
+        })
+        vectors.extend(embeddings)
+        ids.extend(chunk_ids)
+        documents.extend(chunks)
+        metadatas.extend(chunk_metas)
+        print(f"  > [RAG] Embedded {subject_code}/{file_name}: {len(chunks)} chunks in {time.time() - started:.1f}s")
+
+    matrix = np.asarray(vectors, dtype=np.float16).reshape(len(ids), -1)
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "snapshot_id": hashlib.sha256("".join(f["sha256"] for f in files).encode("utf-8")).hexdigest()[:16],
+        "created_at": datetime.utcnow().isoformat(),
+        "embedding_model": EMBEDDING_MODEL,
+        "embedding_version": EMBEDDING_VERSION,
+        "dim": int(matrix.shape[1]) if len(ids) else 0,
+        "total_chunks": len(ids),
+        "files": files
+    }
+
+    buffer = io.BytesIO()
+    np.save(buffer, matrix)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("manifest.json", json.dumps(manifest, indent=1))
+        zf.writestr("vectors.npy", buffer.getvalue())
+        zf.writestr("chunks.json", json.dumps({"ids": ids, "documents": documents, "metadatas": metadatas}, ensure_ascii=False))
+    os.replace(tmp_path, path)
+    return manifest
+
+
+def read_manifest(path):
+    with zipfile.ZipFile(path) as zf:
+        return json.loads(zf.read("manifest.json"))
+
+
+def restore(service, path=None, skip=()):
+    """
+    Loads matching files from the snapshot into the vector store. `skip` holds
+    (subject, file) pairs already indexed. Returns {(subject, file): chunks} restored.
+    """
+    from .rag_service import EMBEDDING_MODEL, EMBEDDING_VERSION
+    from .extraction_cache import hash_file
+
+    path = path or snapshot_path(service)
+    if not os.path.isfile(path):
+        return {}
+    manifest = read_manifest(path)
+    expected = (FORMAT_VERSION, EMBEDDING_MODEL, EMBEDDING_VERSION)
+    found = (manifest.get("format_version"), manifest.get("embedding_model"), manifest.get("embedding_version"))
+    if found != expected:
+        print(f"[RAG] Index snapshot {os.path.basename(path)} does not match ({found} != {expected}); ignoring it.")
+        return {}
+
+    on_disk = {(subject, name): file_path for subject, name, file_path in service.kb_files()}
+    wanted = []
+    for entry in manifest["files"]:
+        key = (entry["subject"], entry["source"])
+        file_path = on_disk.get(key)
+        if key in skip or file_path is None:
+            continue
+        if os.path.getsize(file_path) == entry["size"] and hash_file(file_path) == entry["sha256"]:
+            wanted.append((entry, file_path))
+    if not wanted:
+        return {}
+
+    import numpy as np
+    started = time.time()
+    with zipfile.ZipFile(path) as zf:
+        matrix = np.load(io.BytesIO(zf.read("vectors.npy")))
+        chunks = json.loads(zf.read("chunks.json"))
+
+    restored = {}
+    for entry, file_path in wanted:
+        start, stop = entry["start"], entry["stop"]
+        service._store_chunks(
+            file_path, entry["subject"], chunks["ids"][start:stop],
+            matrix[start:stop].astype(np.float32).tolist(),
+            chunks["documents"][start:stop], chunks["metadatas"][start:stop],
+            origin="kb", content_hash=entry["sha256"]
+        )
+        restored[(entry["subject"], entry["source"])] = stop - start
+    print(f"[RAG] ⚡ Restored {len(restored)} file(s), {sum(restored.values())} chunks from index snapshot "
+          f"{manifest['snapshot_id']} in {time.time() - started:.1f}s")
+    return restored
@@ -0,0 +1,139 @@
+"""
+Keeps background indexing (startup auto-index, the KB watcher, ingestion jobs) from
+competing with user requests for CPU.
+
+- load_monitor tracks requests in flight and recent latency. main.py feeds it from an HTTP
+  middleware; the RAG sidecar feeds it from the query calls it serves.
+- indexing_throttle.pause_point() is called by process_file between embedding batches. It
+  waits while the server is busy (more than INDEX_PAUSE_IN_FLIGHT requests in flight, or
+  p95 latency over the last INDEX_LATENCY_WINDOW_SECONDS above INDEX_PAUSE_LATENCY_MS),
+  for at most INDEX_MAX_PAUSE_SECONDS per batch so indexing never starves. It then sleeps
+  enough to keep indexing within INDEX_CPU_BUDGET (fraction of one core, default 0.5).
+  INDEX_THROTTLE=false turns all of this off, e.g. for train_kb.py.
+- cap_torch_threads() limits torch intra-op threads (RAG_TORCH_THREADS, default: all cores
+  but one) and lower_thread_priority() renices the calling indexing thread;
+  lowered_thread_priority() does so for one block only. Threads inherit the niceness of the
+  thread that starts them, so neither may run before get_rag_service() has started the
+  warm-up thread.
+"""
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+
+def lower_thread_priority(niceness=None):
+    """Lowers the calling thread's CPU priority (Linux schedules threads individually)."""
+    niceness = niceness if niceness is not None else int(os.getenv("INDEX_NICE", "10"))
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), niceness)
+    except (AttributeError, OSError):
+        pass  # not available on this platform
+
+
+@contextmanager
+def lowered_thread_priority(niceness=None):
+    """
+    Lowers the calling thread's priority for the duration of the block, then tries to
+    restore it (raising priority again needs CAP_SYS_NICE; without it the thread stays low).
+    """
+    try:
+        previous = os.getpriority(os.PRIO_PROCESS, threading.get_native_id())
+    except (AttributeError, OSError):
+        previous = None
+    lower_thread_priority(niceness)
+    try:
+        yield
+    finally:
+        if previous is not None:
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), previous)
+            except OSError:
+                pass
+
+
+def cap_torch_threads():
+    threads = int(os.getenv("RAG_TORCH_THREADS", str(max(1, (os.cpu_count() or 1) - 1))))
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        print(f"[RAG] Torch limited to {threads} thread(s)")
+    except ImportError:
+        pass
+
+
+class LoadMonitor:
+    def __init__(self, window_seconds=None, max_samples=500):
+        self.window_seconds = window_seconds if window_seconds is not None else float(os.getenv("INDEX_LATENCY_WINDOW_SECONDS", "10"))
+        self._in_flight = 0
+        self._samples = deque(maxlen=max_samples)  # (finished_at, seconds)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self):
+        started = time.time()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            finished = time.time()
+            with self._lock:
+                self._in_flight -= 1
+                self._samples.append((finished, finished - started))
+
+    def snapshot(self):
+        cutoff = time.time() - self.window_seconds
+        with self._lock:
+            in_flight = self._in_flight
+            recent = sorted(seconds for finished, seconds in self._samples if finished >= cutoff)
+        p95 = recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0.0
+        return {"in_flight": in_flight, "recent_requests": len(recent), "p95_ms": round(p95 * 1000, 1)}
+
+
+class IndexingThrottle:
+    def __init__(self, monitor):
+        self.monitor = monitor
+        self.enabled = os.getenv("INDEX_THROTTLE", "true").lower() != "false"
+        self.cpu_budget = min(1.0, max(0.05, float(os.getenv("INDEX_CPU_BUDGET", "0.5"))))
+        self.pause_in_flight = int(os.getenv("INDEX_PAUSE_IN_FLIGHT", "0"))
+        self.pause_latency_ms = float(os.getenv("INDEX_PAUSE_LATENCY_MS", "1000"))
+        self.max_pause = float(os.getenv("INDEX_MAX_PAUSE_SECONDS", "30"))
+        self._stats = {"batches": 0, "work_seconds": 0.0, "budget_sleep_seconds": 0.0, "paused_seconds": 0.0, "pauses": 0}
+        self._lock = threading.Lock()
+
+    def busy(self):
+        load = self.monitor.snapshot()
+        return load["in_flight"] > self.pause_in_flight or load["p95_ms"] > self.pause_latency_ms
+
+    def pause_point(self, work_seconds):
+        """Call between batches of background work that took `work_seconds` of CPU."""
+        if not self.enabled:
+            return
+        paused = 0.0
+        if self.busy():
+            started = time.time()
+            while time.time() - started < self.max_pause and self.busy():
+                time.sleep(0.25)
+            paused = time.time() - started
+        budget_sleep = work_seconds * (1 - self.cpu_budget) / self.cpu_budget
+        if budget_sleep > 0:
+            time.sleep(budget_sleep)
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["work_seconds"] += work_seconds
+            self._stats["budget_sleep_seconds"] += budget_sleep
+            if paused:
+                self._stats["pauses"] += 1
+                self._stats["paused_seconds"] += paused
+
+    def stats(self):
+        with self._lock:
+            result = {key: round(value, 2) if isinstance(value, float) else value for key, value in self._stats.items()}
+        result.update(enabled=self.enabled, cpu_budget=self.cpu_budget, load=self.monitor.snapshot())
+        return result
+
+
+load_monitor = LoadMonitor()
+indexing_throttle = IndexingThrottle(load_monitor)
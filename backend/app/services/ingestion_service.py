@@ -0,0 +1,291 @@
+"""
+Background ingestion jobs for /api/training/upload.
+
+An upload is recorded as an IngestionJob row and answered with its id straight away; a
+worker thread (INGEST_WORKERS, default 1) then parses the file and embeds it in batches of
+RAG_INGEST_BATCH chunks, writing pages parsed, chunks embedded and an ETA back to the row
+at most every INGEST_PROGRESS_INTERVAL seconds. Jobs live in the database, so any worker
+process can answer GET /api/training/jobs/{id}, and jobs left queued (or stuck running for
+INGEST_STALE_SECONDS) when the server stopped are picked up again by resume_pending().
+
+A job only completes when chunks were actually indexed. If the RAG service is not ready
+within INGEST_READY_TIMEOUT seconds (disabled, or warm-up failed) or no text could be
+indexed, the job fails with the reason and keeps its file, so POST
+/api/training/jobs/{id}/retry can run it again. Files of failed jobs are removed
+INGEST_FAILED_RETENTION_HOURS (default 72) after the failure.
+"""
+import os
+import time
+import queue
+import shutil
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from ..database import SessionLocal
+from ..models import IngestionJob
+from .indexing_throttle import lowered_thread_priority
+
+
+def _count_pages(path):
+    """Page count for PDFs (cheap: reads the page tree only), None for other formats."""
+    if not path.lower().endswith(".pdf"):
+        return None
+    try:
+        from PyPDF2 import PdfReader
+        return len(PdfReader(path).pages)
+    except Exception:
+        return None
+
+
+def job_status(job):
+    return {
+        "job_id": job.id,
+        "filename": job.filename,
+        "subject_id": job.subject_id,
+        "topic_id": job.topic_id,
+        "status": job.status,
+        "stage": job.stage,
+        "pages_parsed": job.pages_parsed or 0,
+        "pages_total": job.pages_total,
+        "chunks_embedded": job.chunks_embedded or 0,
+        "chunks_total": job.chunks_total,
+        "eta_seconds": job.eta_seconds,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+
+
+class _ProgressWriter:
+    """progress(stage, done, total) callback for process_file; throttles writes to the job row."""
+    def __init__(self, job_id, pages_total):
+        self.job_id = job_id
+        self.pages_total = pages_total
+        self.interval = float(os.getenv("INGEST_PROGRESS_INTERVAL", "1.0"))
+        self.started = time.time()
+        self.stage = None
+        self.stage_started = self.started
+        self.last_write = 0.0
+
+    def __call__(self, stage, done, total):
+        now = time.time()
+        if stage != self.stage:
+            self.stage, self.stage_started = stage, now
+        fields = {"stage": stage}
+        if stage == "parsing":
+            fields["pages_parsed"] = done
+            total = self.pages_total
+        else:
+            fields["chunks_embedded"] = done
+            fields["chunks_total"] = total
+        # ETA covers the current stage; embedding usually dominates for large documents.
+        elapsed = now - self.stage_started
+        if total and done and elapsed > 0:
+            fields["eta_seconds"] = int(elapsed / done * max(0, total - done))
+        if now - self.last_write >= self.interval or (total and done >= total):
+            self.last_write = now
+            _update(self.job_id, **fields)
+
+
+def _update(job_id, **fields):
+    db = SessionLocal()
+    try:
+        fields["updated_at"] = datetime.utcnow()
+        db.execute(update(IngestionJob).where(IngestionJob.id == job_id).values(**fields))
+        db.commit()
+    finally:
+        db.close()
+
+
+class IngestionQueue:
+    def __init__(self, workers=None):
+        self.workers = workers if workers is not None else int(os.getenv("INGEST_WORKERS", "1"))
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _ensure_workers(self):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < max(1, self.workers):
+                thread = threading.Thread(target=self._worker, name=f"ingest-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, file_path, subject_id, topic_id=None, content_hash=None, size=None):
+        """Records a queued job for a file on disk and returns its id."""
+        db = SessionLocal()
+        try:
+            job = IngestionJob(
+                subject_id=str(subject_id), topic_id=topic_id, filename=os.path.basename(file_path),
+                file_path=os.path.abspath(file_path), content_hash=content_hash, size_bytes=size,
+                status="queued", pages_parsed=0, chunks_embedded=0
+            )
+            db.add(job)
+            db.commit()
+            job_id = job.id
+        finally:
+            db.close()
+        self._ensure_workers()
+        self._queue.put(job_id)
+        print(f"[INGEST] Queued job {job_id}: {os.path.basename(file_path)} for subject {subject_id}")
+        return job_id
+
+    def get(self, job_id):
+        db = SessionLocal()
+        try:
+            job = db.get(IngestionJob, job_id)
+            return job_status(job) if job else None
+        finally:
+            db.close()
+
+    def recent(self, limit=20):
+        db = SessionLocal()
+        try:
+            jobs = db.query(IngestionJob).order_by(IngestionJob.id.desc()).limit(limit).all()
+            return [job_status(job) for job in jobs]
+        finally:
+            db.close()
+
+    def resume_pending(self):
+        """Re-queues jobs that were queued, or running without a heartbeat, when the server stopped."""
+        stale_before = datetime.utcnow() - timedelta(seconds=float(os.getenv("INGEST_STALE_SECONDS", "300")))
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.status == "running", IngestionJob.updated_at < stale_before)
+                .values(status="queued")
+            )
+            db.commit()
+            job_ids = [job_id for (job_id,) in db.query(IngestionJob.id).filter(IngestionJob.status == "queued").order_by(IngestionJob.id)]
+        finally:
+            db.close()
+        self._purge_failed()
+        if job_ids:
+            print(f"[INGEST] Resuming {len(job_ids)} pending job(s)")
+            self._ensure_workers()
+            for job_id in job_ids:
+                self._queue.put(job_id)
+        return len(job_ids)
+
+    def _purge_failed(self):
+        """Removes the kept files of jobs that failed long ago and were never retried."""
+        cutoff = datetime.utcnow() - timedelta(hours=float(os.getenv("INGEST_FAILED_RETENTION_HOURS", "72")))
+        db = SessionLocal()
+        try:
+            paths = [path for (path,) in db.query(IngestionJob.file_path).filter(
+                IngestionJob.status == "failed", IngestionJob.finished_at < cutoff
+            )]
+        finally:
+            db.close()
+        for path in paths:
+            if path and os.path.isfile(path):
+                shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    def retry(self, job_id):
+        """
+        Re-queues a failed job whose file is still on disk. Returns its status, None if the
+        job does not exist, or raises ValueError when it cannot be retried.
+        """
+        db = SessionLocal()
+        try:
+            job = db.get(IngestionJob, job_id)
+            if job is None:
+                return None
+            if job.status != "failed":
+                raise ValueError(f"Job {job_id} is {job.status}; only failed jobs can be retried")
+            if not os.path.isfile(job.file_path):
+                raise ValueError(f"The file of job {job_id} is no longer on disk; upload it again")
+            requeued = db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == job_id, IngestionJob.status == "failed")
+                .values(status="queued", stage=None, error=None, pages_parsed=0, chunks_embedded=0,
+                        chunks_total=None, eta_seconds=None, started_at=None, finished_at=None,
+                        updated_at=datetime.utcnow())
+            ).rowcount
+            db.commit()
+            if not requeued:
+                raise ValueError(f"Job {job_id} was retried already")
+        finally:
+            db.close()
+        self._ensure_workers()
+        self._queue.put(job_id)
+        print(f"[INGEST] Retrying job {job_id}")
+        return self.get(job_id)
+
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run(job_id)
+            except Exception as e:
+                print(f"[INGEST] ❌ Job {job_id} crashed: {e}")
+                _update(job_id, status="failed", error=str(e)[:1000], finished_at=datetime.utcnow())
+            finally:
+                self._queue.task_done()
+
+    def _claim(self, job_id):
+        # Conditional update so that only one worker (or process) runs a given job.
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            claimed = db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == job_id, IngestionJob.status == "queued")
+                .values(status="running", started_at=now, updated_at=now)
+            ).rowcount
+            db.commit()
+            return db.get(IngestionJob, job_id) if claimed else None
+        finally:
+            db.close()
+
+    def _run(self, job_id):
+        job = self._claim(job_id)
+        if job is None:
+            return
+        from .rag_service import get_rag_service
+        from .training_service import training_service
+
+        if not os.path.isfile(job.file_path):
+            _update(job_id, status="failed", error="Uploaded file is no longer on disk", finished_at=datetime.utcnow())
+            return
+        pages_total = _count_pages(job.file_path)
+        _update(job_id, stage="parsing", pages_total=pages_total)
+        # Queued jobs wait for warm-up (longer than process_file's own timeout), but not forever.
+        service = get_rag_service()
+        if not service.wait_until_ready(timeout=float(os.getenv("INGEST_READY_TIMEOUT", "600"))) or not service.is_ready:
+            self._fail(job_id, "RAG service is not available (disabled, failed to load or still warming up); "
+                               "retry the job once it is ready")
+            return
+
+        started = time.time()
+        # Reniced only here, after get_rag_service() above, so no RAG thread inherits it
+        with lowered_thread_priority():
+            result = training_service.ingest_document(
+                job.file_path, job.subject_id, job.topic_id, content_hash=job.content_hash,
+                progress=_ProgressWriter(job_id, pages_total)
+            )
+        if result["status"] != "success":
+            self._fail(job_id, result["message"])
+            return
+        chunks = result["chunks_processed"]
+        if not chunks:
+            self._fail(job_id, "No text could be extracted and indexed from the file (0 chunks)")
+            return
+        _update(job_id, status="complete", chunks_total=chunks, chunks_embedded=chunks,
+                eta_seconds=0, error=None, finished_at=datetime.utcnow())
+        print(f"[INGEST] ✅ Job {job_id}: {chunks} chunks in {time.time() - started:.1f}s")
+        # The job owns the spooled upload (its private directory under UPLOAD_DIR).
+        shutil.rmtree(os.path.dirname(job.file_path), ignore_errors=True)
+
+    def _fail(self, job_id, error):
+        # The file is kept so the job can be retried.
+        _update(job_id, status="failed", error=error[:1000], finished_at=datetime.utcnow())
+        print(f"[INGEST] ❌ Job {job_id} failed: {error}")
+
+
+ingestion_queue = IngestionQueue()
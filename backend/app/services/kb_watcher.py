@@ -0,0 +1,189 @@
+"""
+Keeps the index in step with knowledge_base/subjects while the server runs.
+
+Enabled with KB_WATCH=true. Changes are picked up through watchdog (inotify / FSEvents /
+ReadDirectoryChangesW) when it is installed, otherwise by polling file sizes and mtimes
+every KB_WATCH_POLL_SECONDS (default 5). Events are debounced per file for
+KB_WATCH_DEBOUNCE_SECONDS (default 2) so an editor's save or a slow copy is indexed once,
+then a single low-priority worker thread re-indexes added or modified files and drops
+deleted ones. Files whose content hash and embedding version match the document registry
+are skipped, so touching a file does not re-embed it.
+"""
+import os
+import time
+import threading
+
+from .document_extractor import KB_EXTENSIONS
+from .indexing_throttle import lower_thread_priority
+
+
+class KnowledgeBaseWatcher:
+    def __init__(self, service, subjects_path, debounce=None, poll_interval=None):
+        self.service = service
+        self.subjects_path = os.path.abspath(subjects_path)
+        self.debounce = debounce if debounce is not None else float(os.getenv("KB_WATCH_DEBOUNCE_SECONDS", "2"))
+        self.poll_interval = poll_interval if poll_interval is not None else float(os.getenv("KB_WATCH_POLL_SECONDS", "5"))
+        self.mode = None
+        self.stats = {"events": 0, "indexed": 0, "removed": 0, "skipped": 0, "errors": 0}
+        self._pending = {}  # (subject_code, file_name) -> time of the last event
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._observer = None
+
+    def _key(self, path):
+        # Only files directly inside subjects/<code>/ are indexed (same rule as auto_index_kb).
+        rel = os.path.relpath(os.path.abspath(path), self.subjects_path)
+        parts = rel.split(os.sep)
+        if len(parts) != 2 or parts[0].startswith("."):
+            return None
+        file_name = parts[1]
+        if file_name.startswith((".", "~")) or not file_name.lower().endswith(KB_EXTENSIONS):
+            return None
+        return parts[0], file_name
+
+    def notify(self, path):
+        key = self._key(path)
+        if key is None:
+            return
+        with self._cond:
+            self._pending[key] = time.time()
+            self.stats["events"] += 1
+            self._cond.notify()
+
+    def start(self):
+        os.makedirs(self.subjects_path, exist_ok=True)
+        try:
+            self._start_watchdog()
+            self.mode = "watchdog"
+        except ImportError:
+            threading.Thread(target=self._poll, name="kb-watch-poll", daemon=True).start()
+            self.mode = "polling"
+        threading.Thread(target=self._worker, name="kb-watch-index", daemon=True).start()
+        print(f"[RAG] 👀 Watching {self.subjects_path} for changes ({self.mode})")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _start_watchdog(self):
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory or event.event_type not in ("created", "modified", "deleted", "moved", "closed"):
+                    return
+                watcher.notify(event.src_path)
+                if getattr(event, "dest_path", None):
+                    watcher.notify(event.dest_path)
+
+        self._observer = Observer()
+        self._observer.schedule(Handler(), self.subjects_path, recursive=True)
+        self._observer.daemon = True
+        self._observer.start()
+
+    def _snapshot(self):
+        snapshot = {}
+        for subject_code in os.listdir(self.subjects_path):
+            subj_dir = os.path.join(self.subjects_path, subject_code)
+            if not os.path.isdir(subj_dir):
+                continue
+            for file_name in os.listdir(subj_dir):
+                path = os.path.join(subj_dir, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if os.path.isfile(path):
+                    snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def _poll(self):
+        previous = self._snapshot()
+        while not self._stop.wait(self.poll_interval):
+            try:
+                current = self._snapshot()
+            except OSError as e:
+                print(f"[RAG] KB poll failed: {e}")
+                continue
+            for path in current.keys() | previous.keys():
+                if current.get(path) != previous.get(path):
+                    self.notify(path)
+            previous = current
+
+    def _next_ready(self):
+        """Blocks until some file has been quiet for the debounce period; returns its key."""
+        with self._cond:
+            while not self._stop.is_set():
+                now = time.time()
+                ready = [key for key, last in self._pending.items() if now - last >= self.debounce]
+                if ready:
+                    key = min(ready, key=self._pending.get)
+                    del self._pending[key]
+                    return key
+                wait = min((self.debounce - (now - last) for last in self._pending.values()), default=None)
+                self._cond.wait(wait)
+        return None
+
+    def _worker(self):
+        lower_thread_priority()
+        while True:
+            key = self._next_ready()
+            if key is None:
+                return
+            try:
+                self._apply(*key)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"[RAG] ❌ Incremental indexing of {key[1]} failed: {e}")
+
+    def _apply(self, subject_code, file_name):
+        path = os.path.join(self.subjects_path, subject_code, file_name)
+        if not os.path.isfile(path):
+            removed = self.service.delete_file(subject_code, file_name)
+            self.stats["removed"] += 1
+            print(f"[RAG] KB file removed: {subject_code}/{file_name} ({removed} chunks dropped)")
+            return
+
+        from .extraction_cache import hash_file
+        from .rag_service import EMBEDDING_VERSION
+        from . import document_registry
+        content_hash = hash_file(path)
+        try:
+            indexed = document_registry.indexed_version(subject_code, file_name)
+        except Exception:
+            indexed = None  # registry unavailable: re-index rather than miss a change
+        if indexed == (content_hash, EMBEDDING_VERSION):
+            self.stats["skipped"] += 1
+            return
+        started = time.time()
+        count = self.service.process_file(path, subject_id=subject_code, origin="kb", content_hash=content_hash)
+        self.stats["indexed"] += 1
+        print(f"[RAG] KB file indexed: {subject_code}/{file_name} ({count} chunks, {time.time() - started:.1f}s)")
+
+    def info(self):
+        with self._cond:
+            pending = len(self._pending)
+        return {"mode": self.mode, "pending": pending, **self.stats}
+
+
+_watcher = None
+
+
+def start_kb_watcher(service):
+    """Starts the watcher when KB_WATCH=true. Call after the initial auto_index_kb pass."""
+    global _watcher
+    if os.getenv("KB_WATCH", "false").lower() != "true" or _watcher is not None:
+        return _watcher
+    _watcher = KnowledgeBaseWatcher(service, os.path.join(service.kb_path, "subjects")).start()
+    return _watcher
+
+
+def watcher_info():
+    return _watcher.info() if _watcher else None
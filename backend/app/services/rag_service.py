@@ -1,59 +1,179 @@
 import os
+import time
+import threading
+
+from .lru_cache import LRUCache
 
 # NOTE: sentence_transformers and chromadb are imported lazily inside the class
 # to prevent blocking network downloads at module load time.
 
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# Recorded per document in the registry; bump when the model or the chunking changes so
+# documents embedded the old way can be found and re-indexed.
+EMBEDDING_VERSION = 1
+
 class RAGService:
     def __init__(self):
         self.model = None
-        self.chroma_client = None
-        self.collection = None
+        self.batcher = None
+        self.store = None
         self._enabled = False
+
+        # Query embeddings are keyed by the raw query string. Retrieval results are keyed by
+        # (query, subject, topic, k, index version); the version is bumped whenever a subject's
+        # documents change, so stale entries simply stop being reachable.
+        self.embedding_cache = LRUCache(int(os.getenv("RAG_EMBED_CACHE_SIZE", "512")))
+        self.result_cache = LRUCache(int(os.getenv("RAG_RESULT_CACHE_SIZE", "256")))
+        # Chunk embeddings of ad-hoc uploads (/from-file, rubric uploads), keyed by file hash.
+        self.file_cache = LRUCache(int(os.getenv("RAG_FILE_CACHE_SIZE", "8")))
+        self._index_versions = {}
+        self._version_lock = threading.Lock()
+        # Go up 4 levels from backend/app/services/rag_service.py to reach root
+        self.kb_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), "knowledge_base")
+        from .wikipedia_service import WikipediaService
+        self.wikipedia = WikipediaService(self.kb_path)
+
+        # Readiness is published per component so /ready can report warm-up progress while
+        # generation keeps running in degraded mode (no local retrieval).
+        self.status = {
+            "embedding_model": {"state": "pending"},
+            "vector_store": {"state": "pending"},
+            "indexing": {"state": "idle"}
+        }
+        self._ready_event = threading.Event()
+
+    @property
+    def is_ready(self):
+        return self._ready_event.is_set() and self._enabled
+
+    def wait_until_ready(self, timeout=None):
+        """Blocks until warm-up has finished (successfully or not). Returns is_ready."""
+        self._ready_event.wait(timeout)
+        return self.is_ready
+
+    def _set_status(self, component, state, **extra):
+        self.status[component] = {"state": state, **extra}
+
+    def warm_up(self):
+        """Loads the embedding model and opens the vector store. Runs once, off the request path."""
+        try:
+            self._load_components()
+        finally:
+            self._ready_event.set()
+
+    def _load_components(self):
+        import time
         # Step 0: Check if we are on Render (Free tier memory limits)
-        if os.getenv("RENDER") == "true":
+        # Chroma plus its bundled ONNX model does not fit; the memory-mapped numpy store does.
+        backend = os.getenv("VECTOR_STORE", "chroma").lower()
+        if os.getenv("RENDER") == "true" and backend != "numpy":
             print("[RAG] Detected Render environment. Disabling RAG for stability (Free Tier).")
+            print("[RAG] Set VECTOR_STORE=numpy to run the low-memory backend instead.")
+            self._set_status("embedding_model", "disabled")
+            self._set_status("vector_store", "disabled")
             return
 
         # Step 1: Load embedding model (crash-proof, lazy import)
+        started = time.time()
+        self._set_status("embedding_model", "loading")
         try:
             from sentence_transformers import SentenceTransformer
-            model_name = "all-MiniLM-L6-v2"
+            model_name = EMBEDDING_MODEL
             local_model_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "local_models", model_name)
             
             if os.path.exists(local_model_path):
                 print(f"Loading local model from {local_model_path}")
                 self.model = SentenceTransformer(local_model_path)
+                from .indexing_throttle import cap_torch_threads
+                cap_torch_threads()
+                from .embedding_batcher import EmbeddingBatcher
+                self.batcher = EmbeddingBatcher(self.model)
             else:
                 print(f"[RAG] Local model not found. Skipping RAG (no network download).")
                 print("[RAG] RAG features will be disabled. Core API is unaffected.")
+                self._set_status("embedding_model", "disabled", error="local model not found")
+                self._set_status("vector_store", "disabled")
                 return  # Don't try to download from HuggingFace
             print("[RAG] ✅ Embedding model loaded.")
+            self._set_status("embedding_model", "ready", seconds=round(time.time() - started, 2))
         except Exception as e:
             print(f"[RAG] ⚠️ Embedding model failed to load: {e}")
             print("[RAG] RAG features will be disabled. Core API is unaffected.")
-            return  # Exit __init__ early — service stays disabled
+            self._set_status("embedding_model", "failed", error=str(e))
+            self._set_status("vector_store", "disabled")
+            return  # Exit early — service stays disabled
         
-        # Step 2: Initialize ChromaDB (crash-proof, lazy import)
-        db_dir = "./chroma_db"
+        # Step 2: Initialize the vector store (crash-proof, lazy import)
+        started = time.time()
+        self._set_status("vector_store", "loading", backend=backend)
         try:
-            import chromadb
-            from chromadb.config import Settings
-            self.chroma_client = chromadb.Client(Settings(persist_directory=db_dir, is_persistent=True))
-            self.collection = self.chroma_client.get_or_create_collection("exam_content")
-            print(f"[RAG] ✅ ChromaDB initialized successfully at {db_dir}")
+            from .vector_store import create_vector_store
+            self.store = create_vector_store(backend)
+            print(f"[RAG] ✅ Vector store '{self.store.name}' initialized successfully.")
             self._enabled = True
+            self._set_status("vector_store", "ready", backend=backend, seconds=round(time.time() - started, 2))
         except Exception as e:
-            print(f"[RAG] ❌ ChromaDB Initialization Failed: {e}")
-            print(f"[RAG] If this persists, please delete the '{db_dir}' folder manually.")
-            self.chroma_client = None
-            self.collection = None
+            print(f"[RAG] ❌ Vector store ({backend}) Initialization Failed: {e}")
+            if backend == "chroma":
+                print("[RAG] If this persists, please delete the './chroma_db' folder manually.")
+            self.store = None
+            self._set_status("vector_store", "failed", backend=backend, error=str(e))
 
-        # Go up 4 levels from backend/app/services/rag_service.py to reach root
-        self.kb_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), "knowledge_base")
+    def readiness(self):
+        return {
+            "ready": self.is_ready,
+            "mode": "full" if self.is_ready else ("warming_up" if not self._ready_event.is_set() else "degraded"),
+            "components": self.status
+        }
+
+    def kb_files(self):
+        """(subject_code, file_name, path) of every indexable file under knowledge_base/subjects."""
+        from .document_extractor import KB_EXTENSIONS
+        subjects_path = os.path.join(self.kb_path, "subjects")
+        kb_files = []
+        for subject_code in sorted(os.listdir(subjects_path)):
+            subj_dir = os.path.join(subjects_path, subject_code)
+            if not os.path.isdir(subj_dir): continue
+            
+            for file_name in sorted(os.listdir(subj_dir)):
+                if file_name.lower().endswith(KB_EXTENSIONS):
+                    kb_files.append((subject_code, file_name, os.path.join(subj_dir, file_name)))
+        return kb_files
+
+    def _unchanged_kb_files(self):
+        """
+        {(subject_code, file_name): chunks} of KB files already in the index exactly as they
+        are on disk: the registry has the same SHA-256 and embedding version, and the store
+        still holds all of their chunks (the database can outlive a wiped index on a fresh
+        container).
+        """
+        from .extraction_cache import hash_file
+        try:
+            from . import document_registry
+            registered = document_registry.kb_versions()
+        except Exception as e:
+            print(f"[RAG] ⚠️ Document registry unavailable, re-indexing everything: {e}")
+            return {}
+        stored = {}
+        for _, meta in self.store.get({"origin": "kb"}):
+            key = (meta.get("subject_id"), meta.get("source"))
+            stored[key] = stored.get(key, 0) + 1
+        unchanged = {}
+        for subject_code, file_name, file_path in self.kb_files():
+            entry = registered.get((subject_code, file_name))
+            if not entry or entry[1] != EMBEDDING_VERSION or stored.get((subject_code, file_name)) != entry[2]:
+                continue
+            if entry[0] == hash_file(file_path):
+                unchanged[(subject_code, file_name)] = entry[2]
+        return unchanged
 
     def auto_index_kb(self):
-        """Indexes everything in the knowledge_base folder."""
-        if not self._enabled or not self.collection:
+        """
+        Indexes the knowledge_base folder. Files restored from a prebuilt snapshot (see
+        index_snapshot.py) or already indexed unchanged are skipped; the rest are embedded.
+        """
+        self.wait_until_ready()
+        if not self._enabled or not self.store:
             print("[RAG] ⚠️ Skipping auto-indexing: RAG service is disabled or not initialized.")
             return 0
         subjects_path = os.path.join(self.kb_path, "subjects")
@@ -63,122 +183,348 @@ class RAGService:
         
         count = 0
         print(f"[RAG] Starting auto-indexing from: {subjects_path}")
-        for subject_code in os.listdir(subjects_path):
-            subj_dir = os.path.join(subjects_path, subject_code)
-            if not os.path.isdir(subj_dir): continue
-            
-            for file_name in os.listdir(subj_dir):
-                if file_name.lower().endswith(('.txt', '.pdf', '.docx', '.csv')):
-                    file_path = os.path.join(subj_dir, file_name)
-                    print(f"  > [RAG] Indexing {file_name} for {subject_code}...")
-                    try:
-                        count += self.process_file(file_path, subject_id=subject_code)
-                    except Exception as e:
-                        print(f"  > [ERROR] Failed to index {file_name}: {e}")
+        self._set_status("indexing", "restoring")
+        from . import index_snapshot
+        up_to_date = self._unchanged_kb_files()
+        try:
+            restored = index_snapshot.restore(self, skip=up_to_date)
+        except Exception as e:
+            print(f"[RAG] ⚠️ Index snapshot restore failed, embedding instead: {e}")
+            restored = {}
+        up_to_date.update(restored)
+        count += sum(up_to_date.values())
+        kb_files = [entry for entry in self.kb_files() if (entry[0], entry[1]) not in up_to_date]
+        if up_to_date:
+            print(f"[RAG] {len(up_to_date)} file(s) already indexed ({len(restored)} from snapshot), {len(kb_files)} to embed.")
+
+        self._set_status("indexing", "running", files_done=0, files_total=len(kb_files), chunks=count)
+        for done, (subject_code, file_name, file_path) in enumerate(kb_files, start=1):
+            print(f"  > [RAG] Indexing {file_name} for {subject_code}...")
+            try:
+                count += self.process_file(file_path, subject_id=subject_code, origin="kb")
+            except Exception as e:
+                print(f"  > [ERROR] Failed to index {file_name}: {e}")
+            self._set_status("indexing", "running", files_done=done, files_total=len(kb_files), chunks=count)
         
+        self._set_status("indexing", "complete", files_done=len(kb_files), files_total=len(kb_files),
+                         chunks=count, restored_files=len(restored), unchanged_files=len(up_to_date) - len(restored))
         print(f"[RAG] Auto-indexing complete. indexed {count} chunks.")
         return count
 
-    def process_file(self, file_path, subject_id, topic_id=None):
-        _, ext = os.path.splitext(file_path)
-        text = ""
+    def get_index_version(self, subject_id):
+        return self._index_versions.get(str(subject_id), 0)
+
+    def _bump_index_version(self, subject_id):
+        with self._version_lock:
+            key = str(subject_id)
+            self._index_versions[key] = self._index_versions.get(key, 0) + 1
+
+    def _embed(self, texts):
+        return self.model.encode(texts, convert_to_numpy=True).tolist()
+
+    def _embed_queries(self, queries):
+        embeddings = [self.embedding_cache.get(query) for query in queries]
+        missing = [query for query, embedding in zip(queries, embeddings) if embedding is None]
+        if len(missing) == 1 and self.batcher:
+            # Single queries go through the batcher so concurrent requests share a forward pass.
+            fresh = [self.batcher.encode(missing[0])]
+        elif missing:
+            fresh = self._embed(missing)
+        computed = dict(zip(missing, fresh)) if missing else {}
+        for query, embedding in computed.items():
+            self.embedding_cache.put(query, embedding)
+        return [embedding if embedding is not None else computed[query] for query, embedding in zip(queries, embeddings)]
+
+    def cache_stats(self):
+        from .extraction_cache import extraction_cache
+        from .kb_watcher import watcher_info
+        from .indexing_throttle import indexing_throttle
+        return {
+            "query_embeddings": self.embedding_cache.stats(),
+            "retrieval_results": self.result_cache.stats(),
+            "uploaded_files": self.file_cache.stats(),
+            "query_batching": self.batcher.stats() if self.batcher else None,
+            "index_versions": dict(self._index_versions),
+            "wikipedia": dict(self.wikipedia.stats),
+            "extracted_text": extraction_cache.info(),
+            "kb_watcher": watcher_info(),
+            "indexing_throttle": indexing_throttle.stats()
+        }
+
+    def process_file(self, file_path, subject_id, topic_id=None, origin="upload", content_hash=None, progress=None):
+        """
+        Indexes a file, replacing any chunks previously indexed for the same (subject, file),
+        and records it in the document registry. Returns the number of chunks written.
+        `content_hash` (SHA-256 of the file, if the caller already has it) keys the
+        extracted-text cache. `progress(stage, done, total)` is called as pages are parsed
+        ("parsing") and chunk batches embedded ("embedding").
+        """
+        if not self.wait_until_ready(timeout=float(os.getenv("RAG_READY_TIMEOUT", "120"))):
+            print(f"[RAG] ⚠️ Skipping {file_path}: RAG service is disabled or still warming up.")
+            return 0
+        prepared = self._prepare_chunks(file_path, subject_id, topic_id, origin, content_hash, progress)
+        if prepared is None:
+            return 0
+        ids, chunks, metadatas, content_hash = prepared
+        # Indexing always runs in the background, so it yields to requests between batches.
+        embeddings = self._embed_chunks(chunks, progress, throttle=True)
+        self._store_chunks(file_path, subject_id, ids, embeddings, chunks, metadatas,
+                           topic_id=topic_id, origin=origin, content_hash=content_hash)
+        return len(chunks)
+
+    def _prepare_chunks(self, file_path, subject_id, topic_id=None, origin="upload", content_hash=None, progress=None):
+        """Extracts and chunks a file. Returns (ids, chunks, metadatas, content_hash), or None."""
+        from .extraction_cache import hash_file
+        from .document_extractor import extract_text
         try:
-            if ext.lower() == '.pdf':
-                from PyPDF2 import PdfReader
-                reader = PdfReader(file_path)
-                for page in reader.pages:
-                    text_page = page.extract_text()
-                    if text_page: text += text_page
-            elif ext.lower() == '.docx':
-                from docx import Document as DocxDocument
-                doc = DocxDocument(file_path)
-                for para in doc.paragraphs:
-                    text += para.text + "\n"
-            elif ext.lower() == '.csv':
-                import csv
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    text = f.read()
-            else:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    text = f.read()
+            on_unit = (lambda units: progress("parsing", units, None)) if progress else None
+            content_hash = content_hash or hash_file(file_path)
+            text, _, _ = extract_text(file_path, content_hash=content_hash, on_unit=on_unit)
         except Exception as e:
             print(f"[RAG] Error reading {file_path}: {e}")
-            return 0
+            return None
         
         if not text.strip():
-            return 0
+            return None
 
         # Simple chunking
+        file_name = os.path.basename(file_path)
         chunks = [text[i:i+1000] for i in range(0, len(text), 1000)]
-        ids = [f"s{subject_id}_t{topic_id or 'none'}_{file_path.split(os.sep)[-1]}_{i}" for i in range(len(chunks))]
-        metadatas = [{"subject_id": str(subject_id), "topic_id": str(topic_id or 0)} for _ in chunks]
-        
-        self.collection.add(
+        ids = [f"s{subject_id}_t{topic_id or 'none'}_{file_name}_{i}" for i in range(len(chunks))]
+        metadatas = [
+            {"subject_id": str(subject_id), "topic_id": str(topic_id or 0), "source": file_name, "origin": origin}
+            for _ in chunks
+        ]
+        return ids, chunks, metadatas, content_hash
+
+    def _embed_chunks(self, chunks, progress=None, throttle=False):
+        from .indexing_throttle import indexing_throttle
+        batch_size = int(os.getenv("RAG_INGEST_BATCH", "64"))
+        embeddings = []
+        for start in range(0, len(chunks), batch_size):
+            batch_started = time.perf_counter()
+            embeddings.extend(self._embed(chunks[start:start + batch_size]))
+            if progress:
+                progress("embedding", len(embeddings), len(chunks))
+            if throttle:
+                indexing_throttle.pause_point(time.perf_counter() - batch_started)
+        return embeddings
+
+    def _store_chunks(self, file_path, subject_id, ids, embeddings, chunks, metadatas, **details):
+        # Embeddings are computed outside any store lock, then the file's chunks are swapped in
+        # one step. replace() also drops leftovers of the previous version (a shorter re-upload
+        # would otherwise leave its old tail chunks behind), without a window where the file
+        # has no chunks at all.
+        file_name = os.path.basename(file_path)
+        self.store.replace(
+            {"subject_id": str(subject_id), "source": file_name},
             ids=ids,
+            embeddings=embeddings,
             documents=chunks,
             metadatas=metadatas
         )
-        return len(chunks)
+        self._bump_index_version(subject_id)
+        self._register(subject_id, file_name, ids, chunks, size_bytes=os.path.getsize(file_path), **details)
 
-    def fetch_wikipedia_context(self, query):
-        """Fetches a summary from Wikipedia as a fallback context."""
-        import requests
-        print(f"[RAG] 🌐 Fetching Wikipedia context for: {query}")
+    def _register(self, subject_id, file_name, ids, chunks, **details):
+        # The registry is bookkeeping: a database hiccup must not fail indexing itself.
         try:
-            # Use Wikipedia API to get the summary
-            url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{query.replace(' ', '_')}"
-            response = requests.get(url, timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                extract = data.get('extract', '')
-                if extract:
-                    print(f"[RAG] ✅ Found Wikipedia summary for {query}")
-                    return [f"Source: Wikipedia\nContent: {extract}"]
+            from . import document_registry
+            document_registry.register(subject_id, file_name, ids, chunks, embedding_model=EMBEDDING_MODEL,
+                                       embedding_version=EMBEDDING_VERSION, **details)
         except Exception as e:
-            print(f"[RAG] ❌ Wikipedia fetch failed: {e}")
-        
+            print(f"[RAG] ⚠️ Document registry update failed for {file_name}: {e}")
+
+    def _unregister(self, subject_id, file_name):
+        try:
+            from . import document_registry
+            document_registry.remove(subject_id, file_name)
+        except Exception as e:
+            print(f"[RAG] ⚠️ Document registry update failed for {file_name}: {e}")
+
+    def delete_file(self, subject_id, file_name):
+        """Removes every chunk indexed for (subject, file). Returns the number of chunks removed."""
+        self.wait_until_ready(timeout=float(os.getenv("RAG_READY_TIMEOUT", "120")))
+        if not self._enabled or not self.store:
+            return 0
+        removed = self.store.delete({"subject_id": str(subject_id), "source": file_name})
+        self._unregister(subject_id, file_name)
+        if removed:
+            self._bump_index_version(subject_id)
+            print(f"[RAG] 🗑️ Removed {removed} chunks of {file_name} for {subject_id}")
+        return removed
+
+    def index_stats(self):
+        """Returns chunk counts per subject and the on-disk size of the index."""
+        stats = {"subjects": {}, "total_chunks": 0, "disk_bytes": 0}
+        if not self._enabled or not self.store:
+            return stats
+        for _, meta in self.store.get():
+            subject = meta.get("subject_id", "unknown")
+            stats["subjects"][subject] = stats["subjects"].get(subject, 0) + 1
+        stats["total_chunks"] = sum(stats["subjects"].values())
+        stats["disk_bytes"] = self.store.disk_bytes()
+        stats["backend"] = self.store.name
+        return stats
+
+    def compact_index(self):
+        """
+        Drops knowledge_base chunks whose source file no longer exists, then lets the
+        vector store reclaim the freed space.
+        """
+        self.wait_until_ready(timeout=float(os.getenv("RAG_READY_TIMEOUT", "120")))
+        if not self._enabled or not self.store:
+            print("[RAG] ⚠️ Skipping compaction: RAG service is disabled or not initialized.")
+            return self.index_stats()
+
+        subjects_path = os.path.join(self.kb_path, "subjects")
+        orphans = set()
+        for _, meta in self.store.get({"origin": "kb"}):
+            source_path = os.path.join(subjects_path, meta.get("subject_id", ""), meta.get("source", ""))
+            if not os.path.isfile(source_path):
+                orphans.add((meta.get("subject_id"), meta.get("source")))
+        removed = 0
+        for subject, source in orphans:
+            removed += self.store.delete({"subject_id": subject, "source": source})
+            self._unregister(subject, source)
+            self._bump_index_version(subject)
+        print(f"[RAG] 🧹 Removed {removed} orphaned chunks.")
+
+        self.store.compact()
+
+        stats = self.index_stats()
+        stats["removed_chunks"] = removed
+        return stats
+
+    def select_relevant_chunks(self, file_key, text, queries, top_k=None):
+        """
+        Picks the chunks of an uploaded document most relevant to each query, so prompts cover
+        the whole document instead of its first pages. The document is chunked and embedded
+        once per file_key (the file's SHA-256); later requests only embed the queries. A None
+        query gets chunks spread evenly over the document. Returns one list per query, in
+        document order, or None when embeddings are unavailable. With text=None only an
+        already embedded file_key can be served; otherwise LookupError is raised (the
+        sidecar client uses this to avoid resending the document).
+        """
+        if not self.is_ready or self.model is None:
+            return None
+        import time
+        import hashlib
+        import numpy as np
+        from .context_assembler import split_text
+        top_k = top_k or int(os.getenv("FILE_CONTEXT_TOP_K", "8"))
+        file_key = file_key or hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+        entry = self.file_cache.get(file_key)
+        if entry is None and text is None:
+            raise LookupError(f"Uploaded file {file_key} is not cached")
+        if entry is None:
+            started = time.time()
+            chunks = split_text(text)
+            matrix = np.asarray(self._embed(chunks), dtype=np.float32) if chunks else None
+            entry = (chunks, matrix)
+            self.file_cache.put(file_key, entry)
+            print(f"[RAG] 📄 Embedded {len(chunks)} chunks of uploaded file in {time.time() - started:.1f}s")
+        chunks, matrix = entry
+        if not chunks:
+            return [[] for _ in queries]
+
+        searched = [query for query in queries if query]
+        scores = dict(zip(searched, np.asarray(self._embed_queries(searched), dtype=np.float32) @ matrix.T)) if searched else {}
+        results = []
+        for query in queries:
+            if query:
+                picked = np.argsort(-scores[query])[:top_k]
+            else:
+                picked = np.linspace(0, len(chunks) - 1, min(top_k, len(chunks))).astype(int)
+            results.append([chunks[i] for i in sorted(set(picked.tolist()))])
+        return results
+
+    def fetch_wikipedia_context(self, query):
+        """Fetches a summary from Wikipedia as a fallback context (cached, time-budgeted)."""
+        extract = self.wikipedia.lookup(query)
+        if extract:
+            return [f"Source: Wikipedia\nContent: {extract}"]
         return []
 
     def query_context(self, query, subject_id, topic_id=None, n_results=5):
+        return self.query_contexts([query], subject_id, topic_id=topic_id, n_results=n_results)[0]
+
+    def query_contexts(self, queries, subject_id, topic_id=None, n_results=5):
+        """
+        Retrieves context for several queries against one subject with one embedding pass and
+        one vector-store call. Returns a list of documents per query, in the same order.
+        """
         # Handle both integer and string IDs (like 'cs301') by converting to string
         subject_id_str = str(subject_id)
-        filter_dict = {"subject_id": subject_id_str}
         
-        col = self.collection
-        if col is None:
-            print("[RAG] ⚠️ Local collection is None. Skipping local query.")
-            return self.fetch_wikipedia_context(query)
-            
-        try:
-            results = col.query(
-                query_texts=[query],
-                n_results=n_results,
-                where=filter_dict
-            )
-            if results and 'documents' in results and len(results['documents']) > 0 and len(results['documents'][0]) > 0:
-                print(f"[RAG] 📚 Found {len(results['documents'][0])} local chunks for {query}")
-                return results['documents'][0]
-        except Exception as e:
-            print(f"[RAG] Internal Query Failure: {e}")
+        if not self.is_ready:
+            # Degraded mode: never block a generation request on model load.
+            print(f"[RAG] ⏳ Embeddings {self.readiness()['mode'].replace('_', ' ')}. Skipping local retrieval.")
+            return [self.fetch_wikipedia_context(query.replace("Questions about ", "")) for query in queries]
+
+        if self.store is None:
+            print("[RAG] ⚠️ Local vector store is None. Skipping local query.")
+            return [self.fetch_wikipedia_context(query) for query in queries]
+
+        version = self.get_index_version(subject_id_str)
+        results = [None] * len(queries)
+        pending = {}  # query -> positions still needing retrieval
+        for i, query in enumerate(queries):
+            cached = self.result_cache.get((query, subject_id_str, str(topic_id or 0), n_results, version))
+            if cached is not None:
+                print(f"[RAG] ⚡ Cache hit for {query}")
+                results[i] = list(cached)
+            else:
+                pending.setdefault(query, []).append(i)
+
+        if pending:
+            try:
+                misses = list(pending)
+                found = self.store.query(subject_id_str, self._embed_queries(misses), n_results=n_results)
+                for query, documents in zip(misses, found):
+                    if not documents:
+                        continue
+                    print(f"[RAG] 📚 Found {len(documents)} local chunks for {query}")
+                    self.result_cache.put((query, subject_id_str, str(topic_id or 0), n_results, version), list(documents))
+                    for i in pending[query]:
+                        results[i] = list(documents)
+            except Exception as e:
+                print(f"[RAG] Internal Query Failure: {e}")
             
         # Wikipedia Fallback
-        wiki_context = self.fetch_wikipedia_context(query.replace("Questions about ", ""))
-        if wiki_context:
-            return wiki_context
-            
-        return []
+        for i, query in enumerate(queries):
+            if results[i] is None:
+                results[i] = self.fetch_wikipedia_context(query.replace("Questions about ", ""))
+        return results
 
 # rag_service = RAGService()
 # Global instance (initialized with lock)
 ra_service_instance = None
-import threading
 rag_lock = threading.Lock()
 
 def get_rag_service():
+    """
+    Returns the singleton immediately. The first call starts warm-up (model load, vector
+    store open) in a background thread; use `wait_until_ready()` where blocking is acceptable.
+    With RAG_SIDECAR_ADDRESS set, the singleton is a client of the shared sidecar process.
+    """
     global ra_service_instance
     if ra_service_instance is None:
         with rag_lock:
             if ra_service_instance is None:
                 print("[RAG] Initializing RAG Service (Singleton)...")
-                ra_service_instance = RAGService()
+                service = None
+                if os.getenv("RAG_SIDECAR_ADDRESS"):
+                    from .rag_sidecar import RemoteRAGService
+                    try:
+                        service = RemoteRAGService(os.environ["RAG_SIDECAR_ADDRESS"])
+                    except (RuntimeError, ValueError) as e:
+                        print(f"[RAG] ❌ Not using the sidecar: {e}. Falling back to in-process RAG.")
+                if service is None:
+                    service = RAGService()
+                warm_up_thread = threading.Thread(target=service.warm_up, name="rag-warm-up")
+                warm_up_thread.daemon = True
+                warm_up_thread.start()
+                ra_service_instance = service
     return ra_service_instance
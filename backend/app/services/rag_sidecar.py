@@ -0,0 +1,252 @@
+"""
+Shared RAG sidecar for multi-worker deployments.
+
+Under gunicorn every worker imports its own RAGService, so the embedding model and the
+vector store are loaded once per worker. With RAG_SIDECAR_ADDRESS set, a single sidecar
+process owns the model, the index and the caches, and get_rag_service() in each worker
+returns a thin RemoteRAGService that forwards calls over a local socket. Query embeddings
+from concurrent requests across all workers meet in the sidecar's EmbeddingBatcher.
+
+Configuration:
+- RAG_SIDECAR_ADDRESS: a Unix socket path (e.g. /tmp/exam_oracle_rag.sock) or a loopback
+  host:port (e.g. 127.0.0.1:8765, for platforms without Unix sockets). Other hosts are
+  refused. Unset = in-process RAG.
+- RAG_SIDECAR_AUTHKEY: shared secret for the connection handshake. Required: messages are
+  pickled, so only authenticated peers may send them. gunicorn.conf.py generates a random
+  key at launch when none is set and passes it to the sidecar and the workers.
+
+gunicorn.conf.py starts the sidecar automatically; to run it by hand (with the same
+RAG_SIDECAR_ADDRESS and RAG_SIDECAR_AUTHKEY as the workers):
+    python -m backend.app.services.rag_sidecar
+"""
+import os
+import time
+import socket
+import ipaddress
+import threading
+
+from .rag_service import RAGService
+from .indexing_throttle import load_monitor, lower_thread_priority
+
+# Only these RAGService methods are reachable over the socket.
+REMOTE_METHODS = {
+    "readiness", "query_context", "query_contexts", "select_relevant_chunks", "process_file",
+    "delete_file", "index_stats", "compact_index", "cache_stats", "get_index_version",
+    "fetch_wikipedia_context"
+}
+
+# Calls made on behalf of user requests; their load pauses background indexing here.
+TRACKED_METHODS = {"query_context", "query_contexts", "select_relevant_chunks", "fetch_wikipedia_context"}
+
+
+def _is_loopback(host):
+    try:
+        return all(ipaddress.ip_address(info[4][0]).is_loopback for info in socket.getaddrinfo(host, None))
+    except (OSError, ValueError):
+        return False
+
+
+def _parse_address(value):
+    if ":" in value and not value.startswith("/"):
+        host, port = value.rsplit(":", 1)
+        host = host.strip("[]")
+        if not _is_loopback(host):
+            raise ValueError(f"RAG_SIDECAR_ADDRESS must be a Unix socket or a loopback host, not {host}")
+        return (host, int(port))
+    return value
+
+
+def _authkey():
+    key = os.getenv("RAG_SIDECAR_AUTHKEY", "")
+    if not key:
+        raise RuntimeError("RAG_SIDECAR_AUTHKEY is not set; the RAG sidecar requires a shared secret")
+    return key.encode("utf-8")
+
+
+def _handle(conn, service):
+    try:
+        while True:
+            try:
+                method, args, kwargs = conn.recv()
+            except EOFError:
+                return
+            if method not in REMOTE_METHODS:
+                conn.send(("error", f"Unknown RAG method: {method}"))
+                continue
+            try:
+                if method in TRACKED_METHODS:
+                    with load_monitor.track():
+                        result = getattr(service, method)(*args, **kwargs)
+                else:
+                    result = getattr(service, method)(*args, **kwargs)
+                conn.send(("ok", result))
+            except Exception as e:
+                conn.send(("error", str(e)))
+    finally:
+        conn.close()
+
+
+def serve(address=None):
+    """Runs the sidecar: loads RAG once, indexes the knowledge base and serves workers forever."""
+    from multiprocessing.connection import Listener
+
+    address = _parse_address(address or os.environ["RAG_SIDECAR_ADDRESS"])
+    authkey = _authkey()
+    if isinstance(address, str) and os.path.exists(address):
+        os.remove(address)  # stale socket from a previous run
+
+    service = RAGService()
+    listener = Listener(address, authkey=authkey)
+    if isinstance(address, str):
+        os.chmod(address, 0o600)  # only this user's processes may connect
+    print(f"[RAG] 🛰️ Sidecar listening on {address}")
+
+    def start():
+        service.warm_up()
+        lower_thread_priority()
+        service.auto_index_kb()
+        if service.is_ready:
+            from .kb_watcher import start_kb_watcher
+            start_kb_watcher(service)
+
+    # Accept connections during warm-up so workers see "warming_up" rather than connection errors.
+    threading.Thread(target=start, name="rag-warm-up", daemon=True).start()
+    while True:
+        try:
+            conn = listener.accept()
+        except Exception as e:
+            print(f"[RAG] Sidecar rejected a connection: {e}")
+            continue
+        threading.Thread(target=_handle, args=(conn, service), daemon=True).start()
+
+
+class RemoteRAGService:
+    """
+    Worker-side stand-in for RAGService that forwards the serving calls to the sidecar. The
+    model, the Wikipedia service and kb_files() are not proxied: train_kb.py builds snapshots
+    with a local RAGService instead.
+    """
+    def __init__(self, address):
+        self.address = _parse_address(address)
+        self._authkey = _authkey()
+        self._local = threading.local()
+        self._remote_status = {"ready": False, "mode": "warming_up", "components": {}}
+        self._ready_event = threading.Event()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            from multiprocessing.connection import Client
+            conn = Client(self.address, authkey=self._authkey)
+            self._local.conn = conn
+        return conn
+
+    def _call(self, method, *args, **kwargs):
+        # One connection per thread; reconnect once if the sidecar was restarted.
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send((method, args, kwargs))
+                status, result = conn.recv()
+                break
+            except (EOFError, OSError):
+                self._local.conn = None
+                if attempt:
+                    raise
+        if status == "error":
+            raise RuntimeError(result)
+        return result
+
+    @property
+    def is_ready(self):
+        return self._ready_event.is_set() and self._remote_status.get("ready", False)
+
+    def wait_until_ready(self, timeout=None):
+        self._ready_event.wait(timeout)
+        return self.is_ready
+
+    def warm_up(self):
+        """Waits for the sidecar to finish loading; the worker itself loads nothing."""
+        deadline = time.time() + float(os.getenv("RAG_READY_TIMEOUT", "120"))
+        try:
+            while time.time() < deadline:
+                try:
+                    self._remote_status = self._call("readiness")
+                    if self._remote_status["mode"] != "warming_up":
+                        break
+                except (EOFError, OSError):
+                    pass  # sidecar not listening yet
+                time.sleep(0.5)
+            print(f"[RAG] Using sidecar at {self.address} ({self._remote_status['mode']})")
+        finally:
+            self._ready_event.set()
+
+    def readiness(self):
+        if self._ready_event.is_set():
+            try:
+                self._remote_status = self._call("readiness")
+            except Exception as e:
+                self._remote_status = {"ready": False, "mode": "degraded", "components": {"sidecar": {"state": "failed", "error": str(e)}}}
+        status = dict(self._remote_status)
+        status["sidecar"] = str(self.address)
+        return status
+
+    def auto_index_kb(self):
+        # The sidecar indexes the knowledge base once for all workers.
+        return 0
+
+    def query_context(self, query, subject_id, topic_id=None, n_results=5):
+        try:
+            return self._call("query_context", query, subject_id, topic_id=topic_id, n_results=n_results)
+        except Exception as e:
+            print(f"[RAG] Sidecar query failed: {e}")
+            return []
+
+    def query_contexts(self, queries, subject_id, topic_id=None, n_results=5):
+        try:
+            return self._call("query_contexts", list(queries), subject_id, topic_id=topic_id, n_results=n_results)
+        except Exception as e:
+            print(f"[RAG] Sidecar query failed: {e}")
+            return [[] for _ in queries]
+
+    def select_relevant_chunks(self, file_key, text, queries, top_k=None):
+        # The sidecar keeps embedded files by key: try without the (possibly megabytes of) text first.
+        if file_key:
+            try:
+                return self._call("select_relevant_chunks", file_key, None, list(queries), top_k=top_k)
+            except RuntimeError:
+                pass  # not cached there (yet, or evicted)
+        return self._call("select_relevant_chunks", file_key, text, list(queries), top_k=top_k)
+
+    def process_file(self, file_path, subject_id, topic_id=None, origin="upload", content_hash=None, progress=None):
+        # Paths are resolved here because the sidecar may run from a different directory.
+        # Callbacks cannot cross the connection, so progress is only reported once, at the end.
+        count = self._call("process_file", os.path.abspath(file_path), subject_id, topic_id=topic_id,
+                           origin=origin, content_hash=content_hash)
+        if progress:
+            progress("embedding", count, count)
+        return count
+
+    def delete_file(self, subject_id, file_name):
+        return self._call("delete_file", subject_id, file_name)
+
+    def index_stats(self):
+        return self._call("index_stats")
+
+    def compact_index(self):
+        return self._call("compact_index")
+
+    def cache_stats(self):
+        return self._call("cache_stats")
+
+    def get_index_version(self, subject_id):
+        return self._call("get_index_version", subject_id)
+
+    def fetch_wikipedia_context(self, query):
+        return self._call("fetch_wikipedia_context", query)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    serve()
@@ -1,9 +1,14 @@
 """
 Rubric service - Business logic for rubric operations
 """
-from typing import List, Dict
-from sqlalchemy.orm import Session
-from ..models import Rubric, RubricQuestionDistribution, RubricLODistribution
+import os
+from typing import List
+from sqlalchemy.orm import Session, joinedload, selectinload
+from ..models import Rubric, RubricQuestionDistribution, RubricLODistribution, Subject
+from .lru_cache import LRUCache
+
+# Compiled rubric plans by rubric id, each stored with the version it was compiled from.
+_plan_cache = LRUCache(max_size=int(os.getenv("RUBRIC_PLAN_CACHE_SIZE", "128")))
 
 def validate_rubric(rubric_data: dict) -> str | None:
     """
@@ -38,86 +43,148 @@ def validate_rubric(rubric_data: dict) -> str | None:
     
     return None
 
-def build_generation_prompt(rubric: Rubric, subject_name: str, topic_names: List[str], db: Session, context: List[str] = None) -> str:
+def rubric_query(db: Session):
     """
-    Builds the main prompt for AI generation based on rubric
+    Rubric query with the subject joined and both distributions loaded in one extra
+    query each, however many rubrics it returns.
     """
-    # Get question distributions
-    question_dists = db.query(RubricQuestionDistribution).filter(
-        RubricQuestionDistribution.rubric_id == rubric.id
-    ).all()
+    return db.query(Rubric).options(
+        joinedload(Rubric.subject),
+        selectinload(Rubric.question_distributions),
+        selectinload(Rubric.lo_distributions)
+    )
+
+def allocate_lo_questions(total_questions: int, lo_distributions) -> dict[str, int]:
+    """
+    Splits total_questions across (learning_outcome, percentage) pairs
+    Returns dict like {"LO1": 5, "LO2": 10, ...}
+    """
+    lo_question_counts = {}
+    remaining = total_questions
     
-    # Get LO distributions
-    lo_dists = db.query(RubricLODistribution).filter(
-        RubricLODistribution.rubric_id == rubric.id
-    ).all()
+    # Sort by percentage descending to handle rounding
+    sorted_los = sorted(lo_distributions, key=lambda x: x[1], reverse=True)
     
-    context_str = "\n".join(context) if context else "Use general academic knowledge for the specified subject."
+    for i, (learning_outcome, percentage) in enumerate(sorted_los):
+        if i == len(sorted_los) - 1:
+            # Last LO gets remaining questions to ensure total matches
+            lo_question_counts[learning_outcome] = remaining
+        else:
+            count = round(total_questions * (percentage / 100))
+            lo_question_counts[learning_outcome] = count
+            remaining -= count
     
-    # Build prompt
-    prompt = f"""
-Role: Senior Academic Expert & Exam Creator.
-Task: Create professional-grade exam questions based on the provided RUBRIC and STUDY CONTEXT.
+    return lo_question_counts
 
-STUDY CONTEXT (Use this to ground the questions):
----
-{context_str}
----
+def plan_generation_tasks(type_counts: dict, marks_by_type: dict, lo_question_counts: dict) -> List[dict]:
+    """
+    Splits the per-LO question counts across the question types
+    Returns a list of {"question_type", "learning_outcome", "count", "marks"} tasks
+    """
+    lo_counts = lo_question_counts.copy() # e.g. {'LO1': 5, 'LO2': 5}
+    
+    # Simple algorithm: Iterate through types, and grab needed counts from available LOs
+    final_tasks = []
+    
+    active_los = list(lo_counts.keys())
+    lo_idx = 0
+    
+    for q_type, q_count in type_counts.items():
+        remaining_for_type = q_count
+        
+        while remaining_for_type > 0 and active_los:
+            current_lo = active_los[lo_idx % len(active_los)]
+            available_in_lo = lo_counts[current_lo]
+            
+            if available_in_lo > 0:
+                # Take up to remaining_for_type, but not more than available_in_lo
+                take = min(available_in_lo, remaining_for_type)
+                
+                final_tasks.append({
+                    "question_type": q_type,
+                    "learning_outcome": current_lo,
+                    "count": take,
+                    "marks": marks_by_type[q_type]
+                })
+                
+                lo_counts[current_lo] -= take
+                remaining_for_type -= take
+            
+            lo_idx += 1
+            
+            # Check if we exhausted all LOs (safety break)
+            if sum(lo_counts.values()) == 0 and remaining_for_type > 0:
+                # Just dump remaining into first LO
+                final_tasks.append({
+                    "question_type": q_type,
+                    "learning_outcome": active_los[0],
+                    "count": remaining_for_type,
+                    "marks": marks_by_type[q_type]
+                })
+                break
+    
+    return final_tasks
 
-**Exam Metadata:**
-- Subject: {subject_name}
-- Topics: {', '.join(topic_names)}
-- Exam Type: {rubric.exam_type}
-- Duration: {rubric.duration_minutes} minutes
-- Total Marks: {rubric.total_marks}
+class RubricPlan:
+    """
+    Read-only snapshot of a rubric compiled for generation: its settings, both
+    distributions, the questions per LO and the (type, LO, count) generation tasks.
+    Compiled once per rubric version and shared by every generation run of it.
+    """
+    def __init__(self, rubric: Rubric):
+        self.rubric_id = rubric.id
+        self.version = (rubric.updated_at, rubric.subject.name if rubric.subject else None)
+        self.name = rubric.name
+        self.subject_id = rubric.subject_id
+        self.subject_name = self.version[1]
+        self.exam_type = rubric.exam_type
+        self.duration_minutes = rubric.duration_minutes
+        self.total_marks = rubric.total_marks
+        self.ai_instructions = rubric.ai_instructions
+        self.question_distributions = tuple(
+            (qd.question_type, qd.count, qd.marks_each) for qd in rubric.question_distributions
+        )
+        self.lo_distributions = tuple(
+            (lo.learning_outcome, lo.percentage) for lo in rubric.lo_distributions
+        )
+        self.type_counts = {q_type: count for q_type, count, _ in self.question_distributions if count > 0}
+        self.total_questions = sum(count for _, count, _ in self.question_distributions)
+        self.lo_question_counts = allocate_lo_questions(self.total_questions, self.lo_distributions)
+        # First distribution of a type wins, as with the old next(...) lookup
+        marks_by_type = {}
+        for q_type, _, marks_each in self.question_distributions:
+            marks_by_type.setdefault(q_type, marks_each)
+        self.tasks = tuple(plan_generation_tasks(self.type_counts, marks_by_type, self.lo_question_counts))
 
-**Question Distribution:**
-"""
-    
-    for qd in question_dists:
-        if qd.count > 0:
-            prompt += f"- {qd.question_type}: {qd.count} questions, {qd.marks_each} marks each\n"
-    
-    prompt += "\n**Learning Outcome Distribution:**\n"
-    for lo in lo_dists:
-        if lo.percentage > 0:
-            prompt += f"- {lo.learning_outcome}: {lo.percentage}% of questions\n"
-    
-    if rubric.ai_instructions:
-        prompt += f"\n**Additional Instructions:**\n{rubric.ai_instructions}\n"
-    
-    prompt += """
-**Output Format:**
-Generate questions in the following JSON format:
-{
-  "questions": [
-    {
-      "question_text": "Your question here",
-      "type": "MCQ",
-      "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
-      "correct_answer": "B) option2",
-      "explanation": "Why this is correct",
-      "learning_outcome": "LO1",
-      "bloom_level": "Apply",
-      "marks": 1
-    }
-  ]
-}
+    def task_list(self) -> List[dict]:
+        """Fresh copies of the generation tasks, safe for the caller to annotate."""
+        return [dict(task) for task in self.tasks]
 
-**Important Rules:**
-1. Distribute questions across learning outcomes according to the percentages
-2. For MCQ: Provide 4 options (A-D) with one correct answer
-3. For Short: Provide question text and expected key points in explanation
-4. For Essay: Provide broad question and evaluation criteria in explanation
-5. For Case Study: Provide a scenario followed by related sub-questions and comprehensive answers
-6. Bloom levels: Remember, Understand, Apply, Analyze, Evaluate, Create
-7. Match question difficulty to exam type ({rubric.exam_type})
-8. Ensure questions cover all specified topics proportionally
+def get_rubric_plan(rubric_id: int, db: Session) -> RubricPlan | None:
+    """
+    Returns the compiled plan of a rubric, or None if it does not exist. A cache hit
+    costs one query (the rubric's updated_at and subject name, to detect edits made
+    by other workers); a miss loads the rubric with rubric_query().
+    """
+    row = db.query(Rubric.updated_at, Subject.name).outerjoin(
+        Subject, Subject.id == Rubric.subject_id
+    ).filter(Rubric.id == rubric_id).first()
+    if row is None:
+        forget_rubric_plan(rubric_id)
+        return None
+    cached = _plan_cache.get(rubric_id)
+    if cached is not None and cached.version == tuple(row):
+        return cached
+    rubric = rubric_query(db).filter(Rubric.id == rubric_id).first()
+    if rubric is None:
+        return None
+    plan = RubricPlan(rubric)
+    _plan_cache.put(rubric_id, plan)
+    return plan
 
-Generate exactly the requested number of questions for each type.
-"""
-    
-    return prompt
+def forget_rubric_plan(rubric_id: int):
+    """Drops the cached plan of a rubric that was edited or deleted."""
+    _plan_cache.discard(rubric_id)
 
 def duplicate_rubric_logic(original: Rubric, db: Session) -> Rubric:
     """
@@ -166,38 +233,3 @@ def duplicate_rubric_logic(original: Rubric, db: Session) -> Rubric:
     db.refresh(new_rubric)
     
     return new_rubric
-
-def calculate_lo_question_distribution(rubric_id: int, db: Session) -> dict[str, int]:
-    """
-    Calculate how many questions should be assigned to each LO based on percentages
-    Returns dict like {"LO1": 5, "LO2": 10, ...}
-    """
-    # Get total question count
-    question_dists = db.query(RubricQuestionDistribution).filter(
-        RubricQuestionDistribution.rubric_id == rubric_id
-    ).all()
-    
-    total_questions = sum(qd.count for qd in question_dists)
-    
-    # Get LO distributions
-    lo_dists = db.query(RubricLODistribution).filter(
-        RubricLODistribution.rubric_id == rubric_id
-    ).all()
-    
-    # Calculate questions per LO
-    lo_question_counts = {}
-    remaining = total_questions
-    
-    # Sort by percentage descending to handle rounding
-    sorted_los = sorted(lo_dists, key=lambda x: x.percentage, reverse=True)
-    
-    for i, lo in enumerate(sorted_los):
-        if i == len(sorted_los) - 1:
-            # Last LO gets remaining questions to ensure total matches
-            lo_question_counts[lo.learning_outcome] = remaining
-        else:
-            count = round(total_questions * (lo.percentage / 100))
-            lo_question_counts[lo.learning_outcome] = count
-            remaining -= count
-    
-    return lo_question_counts
@@ -1,5 +1,3 @@
-import os
-import shutil
 from ..services.rag_service import get_rag_service
 
 class TrainingService:
@@ -10,22 +8,23 @@ class TrainingService:
         # 2. (Optional) Fine-tuning a LoRA adapter if GPU is available (Placeholder)
         pass
 
-    async def train_on_document(self, file_path, subject_id, topic_id=None):
+    def ingest_document(self, file_path, subject_id, topic_id=None, content_hash=None, progress=None):
+        """Blocking ingestion; runs in an ingestion worker (see ingestion_service)."""
         try:
             # Step 1: Ingest into RAG (Immediate Benefit)
             print(f"Training: Ingesting {file_path} into Knowledge Base...")
             rag_service = get_rag_service()
-            chunks = rag_service.process_file(file_path, subject_id, topic_id)
-            
+            chunk_count = rag_service.process_file(file_path, subject_id, topic_id, content_hash=content_hash, progress=progress)
+
             # Step 2: Fine-Tuning (Simulated/Placeholder for now)
             # Real implementation would trigger a background job:
             # `python backend/train_lora.py --data {file_path}`
-            print(f"Training: Fine-tuning model on {len(chunks)} new data points...")
-            
+            print(f"Training: Fine-tuning model on {chunk_count} new data points...")
+
             return {
-                "status": "success", 
+                "status": "success",
                 "message": "Document processed and added to model memory.",
-                "chunks_processed": len(chunks)
+                "chunks_processed": chunk_count
             }
         except Exception as e:
             print(f"Training failed: {e}")
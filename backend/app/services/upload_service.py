@@ -0,0 +1,173 @@
+"""
+Receives uploaded files without blocking the event loop or colliding on disk.
+
+Starlette parses (and spools) the whole multipart body before a handler sees its
+UploadFile, so oversized uploads are stopped earlier, by UploadSizeLimitMiddleware: a
+multipart request whose Content-Length exceeds MAX_FILE_SIZE (plus a small allowance for
+the other form fields) gets a 413 before any of the body is read, and one without a
+Content-Length (chunked) is cut off with a 413 as soon as the bytes received cross it.
+
+receive_upload() then streams the UploadFile in chunks into a SpooledUpload, hashing
+(SHA-256) and counting bytes on the way; it enforces the limit per file. Uploads up to
+UPLOAD_MEMORY_LIMIT stay in memory; bigger ones roll over to a private directory under
+UPLOAD_DIR, keeping the original file name so downstream code (chunk ids, metadata) sees
+the same name as before.
+"""
+import io
+import os
+import shutil
+import hashlib
+import tempfile
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+CHUNK_SIZE = 1024 * 1024
+# Room for the multipart boundaries and the non-file form fields
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def max_file_size():
+    return int(os.getenv("MAX_FILE_SIZE", str(50 * 1024 * 1024)))
+
+
+class SpooledUpload:
+    def __init__(self, filename, memory_limit=None):
+        self.filename = os.path.basename(filename or "upload") or "upload"
+        self.memory_limit = memory_limit if memory_limit is not None else int(os.getenv("UPLOAD_MEMORY_LIMIT", str(1024 * 1024)))
+        self.sha256 = None
+        self.size = 0
+        self.path = None
+        self._buffer = io.BytesIO()
+        self._file = None
+
+    @property
+    def in_memory(self):
+        return self.path is None
+
+    def write(self, data):
+        if self.in_memory and self._buffer.tell() + len(data) > self.memory_limit:
+            self._rollover()
+        (self._buffer if self.in_memory else self._file).write(data)
+
+    def _rollover(self):
+        upload_dir = os.getenv("UPLOAD_DIR", "./uploads")
+        os.makedirs(upload_dir, exist_ok=True)
+        self.path = os.path.join(tempfile.mkdtemp(dir=upload_dir), self.filename)
+        self._file = open(self.path, "wb")
+        self._file.write(self._buffer.getvalue())
+        self._buffer = io.BytesIO()
+
+    def finish(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def ensure_path(self):
+        """Returns a path on disk, writing the in-memory bytes out first if needed."""
+        if self.in_memory:
+            self._rollover()
+        self.finish()
+        return self.path
+
+    def detach(self):
+        """Hands the file on disk over to the caller (a background job); close() leaves it alone."""
+        path = self.ensure_path()
+        self.path = None
+        return path
+
+    def source(self):
+        """A path when on disk, otherwise a fresh in-memory stream; either works with extract_text."""
+        return self.path if not self.in_memory else io.BytesIO(self._buffer.getvalue())
+
+    def close(self):
+        self.finish()
+        if self.path:
+            shutil.rmtree(os.path.dirname(self.path), ignore_errors=True)
+            self.path = None
+        self._buffer = io.BytesIO()
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class UploadSizeLimitMiddleware:
+    """ASGI middleware: 413 for multipart bodies over MAX_FILE_SIZE, before they are parsed."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope.get("headers") or [])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            return await self.app(scope, receive, send)
+
+        limit = max_file_size() + MULTIPART_OVERHEAD
+        declared = headers.get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            return await self._reject(scope, receive, send, int(declared))
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if exceeded:
+                return  # the app's (error) response is replaced by the 413 below
+            started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not started:
+            await self._reject(scope, receive, send, None)
+
+    async def _reject(self, scope, receive, send, size):
+        detail = f"File too large ({size} bytes, limit {max_file_size()})" if size else f"File too large (limit {max_file_size()} bytes)"
+        await JSONResponse({"detail": detail}, status_code=413, headers={"Connection": "close"})(scope, receive, send)
+
+
+async def receive_upload(file, max_size=None):
+    """Streams an UploadFile into a SpooledUpload. Raises HTTPException(413) when too large."""
+    limit = max_size if max_size is not None else max_file_size()
+    if file.size is not None and file.size > limit:
+        raise HTTPException(status_code=413, detail=f"File too large ({file.size} bytes, limit {limit})")
+
+    upload = SpooledUpload(file.filename)
+    digest = hashlib.sha256()
+    try:
+        while True:
+            block = await file.read(CHUNK_SIZE)
+            if not block:
+                break
+            upload.size += len(block)
+            if upload.size > limit:
+                raise HTTPException(status_code=413, detail=f"File too large (limit {limit} bytes)")
+            digest.update(block)
+            if upload.in_memory and upload.size <= upload.memory_limit:
+                upload.write(block)
+            else:
+                await run_in_threadpool(upload.write, block)
+        upload.finish()
+    except BaseException:
+        upload.close()
+        raise
+    upload.sha256 = digest.hexdigest()
+    return upload
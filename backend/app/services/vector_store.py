@@ -0,0 +1,654 @@
+"""
+Vector store backends used by RAGService.
+
+Both backends take precomputed embeddings (RAGService owns the embedding model) and
+filter on flat equality dicts such as {"subject_id": "cs301", "source": "notes.pdf"}.
+
+- ChromaVectorStore: persistent ChromaDB, one collection (shard) per subject.
+- NumpyVectorStore: memory-mapped float16 (or int8-quantized) segments per subject with
+  metadata in SQLite. Meant for low-memory hosts such as the Render free tier.
+"""
+import os
+import json
+import sqlite3
+import threading
+
+
+class VectorStore:
+    """Interface every backend implements."""
+    name = "base"
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        raise NotImplementedError
+
+    def delete(self, where):
+        """Deletes every chunk matching `where`. Returns the number removed."""
+        raise NotImplementedError
+
+    def replace(self, where, ids, embeddings, documents, metadatas):
+        """
+        Swaps the chunks matching `where` for a new set: the new chunks are written first and
+        only then are leftovers of the old set removed, so readers never see an empty gap.
+        Returns the number of stale chunks removed.
+        """
+        keep = set(ids)
+        stale = [chunk_id for chunk_id, _ in self.get(where) if chunk_id not in keep]
+        self.upsert(ids, embeddings, documents, metadatas)
+        return self._delete_ids(stale)
+
+    def _delete_ids(self, ids):
+        raise NotImplementedError
+
+    def get(self, where=None):
+        """Returns a list of (id, metadata) tuples matching `where`."""
+        raise NotImplementedError
+
+    def query(self, subject_id, embeddings, n_results=5, where=None):
+        """Returns one list of documents per query embedding, best match first."""
+        raise NotImplementedError
+
+    def disk_bytes(self):
+        raise NotImplementedError
+
+    def compact(self):
+        raise NotImplementedError
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            total += os.path.getsize(os.path.join(root, f))
+    return total
+
+
+def _chroma_where(where):
+    if not where:
+        return None
+    clauses = [{key: value} for key, value in where.items()]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class ChromaVectorStore(VectorStore):
+    """
+    Every query is scoped to one subject, so each subject gets its own collection and HNSW
+    graph. Shards are opened on first use, which keeps query latency tied to the subject's
+    size rather than the whole knowledge base.
+
+    HNSW parameters default to RAG_HNSW_M / RAG_HNSW_EF_CONSTRUCTION / RAG_HNSW_EF_SEARCH and
+    can be overridden per subject with RAG_HNSW_SHARD_PARAMS, e.g.
+    '{"cs301": {"M": 32, "ef_search": 64}}'.
+    """
+    name = "chroma"
+    LEGACY_COLLECTION = "exam_content"
+    SHARD_PREFIX = "exam_content_"
+
+    def __init__(self, db_dir="./chroma_db"):
+        import chromadb
+        from chromadb.config import Settings
+        self.db_dir = db_dir
+        self.client = chromadb.Client(Settings(persist_directory=db_dir, is_persistent=True))
+        self.hnsw_defaults = {
+            "M": int(os.getenv("RAG_HNSW_M", "16")),
+            "ef_construction": int(os.getenv("RAG_HNSW_EF_CONSTRUCTION", "100")),
+            "ef_search": int(os.getenv("RAG_HNSW_EF_SEARCH", "50")),
+        }
+        self.shard_params = json.loads(os.getenv("RAG_HNSW_SHARD_PARAMS", "{}") or "{}")
+        self.write_batch = int(os.getenv("CHROMA_WRITE_BATCH", "256"))
+        self._shards = {}
+        self._shard_lock = threading.Lock()
+        self._write_locks = {}
+        self._migrate_legacy_collection()
+
+    def _write_lock(self, subject_id):
+        with self._shard_lock:
+            return self._write_locks.setdefault(str(subject_id), threading.Lock())
+
+    def _shard_name(self, subject_id):
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in str(subject_id))
+        return f"{self.SHARD_PREFIX}{safe}"
+
+    def _hnsw_metadata(self, subject_id):
+        params = dict(self.hnsw_defaults)
+        params.update(self.shard_params.get(str(subject_id), {}))
+        return {
+            "hnsw:M": params["M"],
+            "hnsw:construction_ef": params["ef_construction"],
+            "hnsw:search_ef": params["ef_search"],
+        }
+
+    def _collection_names(self):
+        # list_collections() returns names in chroma>=0.6 and Collection objects before that.
+        return [c if isinstance(c, str) else c.name for c in self.client.list_collections()]
+
+    def _shard(self, subject_id, create=False):
+        """Returns the subject's collection, opening it on first use. None if it doesn't exist."""
+        key = str(subject_id)
+        shard = self._shards.get(key)
+        if shard is not None:
+            return shard
+        with self._shard_lock:
+            shard = self._shards.get(key)
+            if shard is not None:
+                return shard
+            name = self._shard_name(key)
+            if create:
+                shard = self.client.get_or_create_collection(
+                    name, metadata=self._hnsw_metadata(key), embedding_function=None
+                )
+            elif name in self._collection_names():
+                shard = self.client.get_collection(name, embedding_function=None)
+            else:
+                return None
+            self._shards[key] = shard
+            return shard
+
+    def _all_shards(self):
+        for name in self._collection_names():
+            if name.startswith(self.SHARD_PREFIX):
+                yield self.client.get_collection(name, embedding_function=None)
+
+    def _migrate_legacy_collection(self, batch_size=1000):
+        """Moves chunks from the old single `exam_content` collection into per-subject shards."""
+        if self.LEGACY_COLLECTION not in self._collection_names():
+            return
+        legacy = self.client.get_collection(self.LEGACY_COLLECTION, embedding_function=None)
+        total = legacy.count()
+        print(f"[RAG] 🔄 Migrating {total} chunks from '{self.LEGACY_COLLECTION}' into per-subject shards...")
+        for offset in range(0, total, batch_size):
+            batch = legacy.get(limit=batch_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+            by_subject = {}
+            for i, meta in enumerate(batch["metadatas"]):
+                by_subject.setdefault(str((meta or {}).get("subject_id", "unknown")), []).append(i)
+            for subject_id, idx in by_subject.items():
+                self._shard(subject_id, create=True).upsert(
+                    ids=[batch["ids"][i] for i in idx],
+                    embeddings=[batch["embeddings"][i] for i in idx],
+                    documents=[batch["documents"][i] for i in idx],
+                    metadatas=[batch["metadatas"][i] for i in idx]
+                )
+        self.client.delete_collection(self.LEGACY_COLLECTION)
+        print("[RAG] ✅ Legacy collection migrated.")
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        by_subject = {}
+        for i, meta in enumerate(metadatas):
+            by_subject.setdefault(str(meta["subject_id"]), []).append(i)
+        for subject_id, idx in by_subject.items():
+            shard = self._shard(subject_id, create=True)
+            # Writers to a shard are serialized; small batches let Chroma interleave queries between them.
+            with self._write_lock(subject_id):
+                for start in range(0, len(idx), self.write_batch):
+                    batch = idx[start:start + self.write_batch]
+                    shard.upsert(
+                        ids=[ids[i] for i in batch],
+                        embeddings=[embeddings[i] for i in batch],
+                        documents=[documents[i] for i in batch],
+                        metadatas=[metadatas[i] for i in batch]
+                    )
+
+    def _delete_ids(self, ids):
+        if not ids:
+            return 0
+        for shard in self._all_shards():
+            shard.delete(ids=ids)
+        return len(ids)
+
+    def replace(self, where, ids, embeddings, documents, metadatas):
+        shard = self._shard(where["subject_id"]) if where and "subject_id" in where else None
+        if shard is None:
+            return super().replace(where, ids, embeddings, documents, metadatas)
+        keep = set(ids)
+        stale = [chunk_id for chunk_id, _ in self.get(where) if chunk_id not in keep]
+        self.upsert(ids, embeddings, documents, metadatas)
+        if stale:
+            with self._write_lock(where["subject_id"]):
+                shard.delete(ids=stale)
+        return len(stale)
+
+    def _target_shards(self, where):
+        if where and "subject_id" in where:
+            shard = self._shard(where["subject_id"])
+            return [shard] if shard is not None else []
+        return list(self._all_shards())
+
+    def delete(self, where):
+        removed = 0
+        for shard in self._target_shards(where):
+            existing = shard.get(where=_chroma_where(where), include=[])
+            if existing and existing.get("ids"):
+                shard.delete(ids=existing["ids"])
+                removed += len(existing["ids"])
+        return removed
+
+    def get(self, where=None):
+        pairs = []
+        for shard in self._target_shards(where):
+            result = shard.get(where=_chroma_where(where), include=["metadatas"])
+            pairs.extend(zip(result.get("ids") or [], [m or {} for m in result.get("metadatas") or []]))
+        return pairs
+
+    def query(self, subject_id, embeddings, n_results=5, where=None):
+        shard = self._shard(subject_id)
+        if shard is None:
+            return [[] for _ in embeddings]
+        results = shard.query(
+            query_embeddings=embeddings,
+            n_results=n_results,
+            where=_chroma_where(where)
+        )
+        return (results or {}).get("documents") or [[] for _ in embeddings]
+
+    def disk_bytes(self):
+        return _dir_size(self.db_dir)
+
+    def compact(self):
+        sqlite_path = os.path.join(self.db_dir, "chroma.sqlite3")
+        if os.path.exists(sqlite_path):
+            try:
+                conn = sqlite3.connect(sqlite_path)
+                conn.execute("VACUUM")
+                conn.close()
+            except Exception as e:
+                print(f"[RAG] ⚠️ VACUUM skipped: {e}")
+
+
+class _Segment:
+    """One immutable matrix file plus the row -> chunk id mapping and live mask at publish time."""
+    __slots__ = ("seq", "matrix", "scales", "partitions", "ids", "live")
+
+    def __init__(self, seq, matrix, scales, partitions, ids, live):
+        self.seq = seq
+        self.matrix = matrix
+        self.scales = scales
+        self.partitions = partitions
+        self.ids = ids
+        self.live = live
+
+    def with_live(self, live):
+        return _Segment(self.seq, self.matrix, self.scales, self.partitions, self.ids, live)
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Each subject is a list of immutable segments (`<subject>.<seq>.vec`) opened with np.memmap,
+    so only the pages touched by a search are resident. Metadata and tombstones live in SQLite.
+
+    Writers are serialized and never touch a published segment: an ingest writes a new
+    staging segment, records it in SQLite, then publishes a new snapshot (a tuple of
+    segments) by swapping a single dict entry. Readers grab the current snapshot and search
+    it without taking any lock, so queries stay consistent and unblocked during re-indexing.
+
+    Segments are merged once there are more than VECTOR_STORE_MAX_SEGMENTS of them, and on
+    compact(). Large merged segments also get a coarse partition index (`.ivf.npz`) so
+    queries only scan the closest partitions.
+    """
+    name = "numpy"
+    BLOCK_ROWS = 8192
+
+    def __init__(self, root_dir="./vector_store", dtype=None):
+        import numpy as np
+        self.np = np
+        self.root_dir = root_dir
+        self.dtype = (dtype or os.getenv("VECTOR_STORE_DTYPE", "float16")).lower()
+        if self.dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported vector dtype: {self.dtype}")
+        self.partition_min_rows = int(os.getenv("VECTOR_STORE_PARTITION_MIN_ROWS", "20000"))
+        # 0 means "a quarter of the partitions", which keeps recall high on clustered text embeddings.
+        self.nprobe = int(os.getenv("VECTOR_STORE_NPROBE", "0"))
+        self.max_segments = int(os.getenv("VECTOR_STORE_MAX_SEGMENTS", "16"))
+        os.makedirs(root_dir, exist_ok=True)
+
+        self._db_path = os.path.join(root_dir, "meta.sqlite3")
+        self._write_lock = threading.RLock()
+        self._snapshots = {}
+        self._retired_files = []
+        self._local = threading.local()
+        self._conn = sqlite3.connect(self._db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id TEXT PRIMARY KEY,
+                subject_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                row INTEGER NOT NULL,
+                document TEXT,
+                metadata TEXT,
+                deleted INTEGER DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS ix_chunks_subject_seq ON chunks (subject_id, seq);
+            CREATE TABLE IF NOT EXISTS segments (
+                subject_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                rows INTEGER NOT NULL,
+                dim INTEGER NOT NULL,
+                dtype TEXT NOT NULL,
+                PRIMARY KEY (subject_id, seq)
+            );
+        """)
+        self._conn.commit()
+
+    # --- files -------------------------------------------------------------------------
+
+    def _path(self, subject_id, seq, suffix):
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in str(subject_id))
+        return os.path.join(self.root_dir, f"{safe}.{seq}{suffix}")
+
+    def _reader(self):
+        """Per-thread read connection; WAL gives each statement a consistent view while a writer commits."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._db_path, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def _open_segment(self, subject_id, seq, rows, dim, dtype):
+        np = self.np
+        matrix = np.memmap(self._path(subject_id, seq, ".vec"), dtype=dtype, mode="r", shape=(rows, dim))
+        scales = None
+        if dtype == "int8":
+            scales = np.memmap(self._path(subject_id, seq, ".scale"), dtype="float32", mode="r", shape=(rows,))
+        partitions = None
+        ivf_path = self._path(subject_id, seq, ".ivf.npz")
+        if os.path.exists(ivf_path):
+            data = np.load(ivf_path)
+            partitions = (data["centroids"], data["assign"])
+        ids = np.full(rows, "", dtype=object)
+        live = np.zeros(rows, dtype=bool)
+        for row, chunk_id, deleted in self._conn.execute(
+            "SELECT row, id, deleted FROM chunks WHERE subject_id = ? AND seq = ?", (str(subject_id), seq)
+        ):
+            ids[row] = chunk_id
+            live[row] = not deleted
+        return _Segment(seq, matrix, scales, partitions, ids, live)
+
+    def _snapshot(self, subject_id):
+        """Returns the published segments for a subject, loading them on first use."""
+        key = str(subject_id)
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None:
+            return snapshot
+        with self._write_lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is None:
+                snapshot = tuple(
+                    self._open_segment(key, seq, rows, dim, dtype)
+                    for seq, rows, dim, dtype in self._conn.execute(
+                        "SELECT seq, rows, dim, dtype FROM segments WHERE subject_id = ? AND rows > 0 ORDER BY seq", (key,)
+                    ).fetchall()
+                )
+                self._snapshots[key] = snapshot
+            return snapshot
+
+    def _publish(self, subject_id, segments):
+        self._snapshots[str(subject_id)] = tuple(segments)
+
+    def _encode_rows(self, vectors):
+        np = self.np
+        if self.dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            quantized = np.clip(np.round(vectors / scales[:, None]), -127, 127).astype(np.int8)
+            return quantized, scales.astype(np.float32)
+        return vectors.astype(np.float16), None
+
+    def _write_segment(self, subject_id, seq, rows, scales):
+        with open(self._path(subject_id, seq, ".vec"), "wb") as f:
+            f.write(rows.tobytes())
+        if scales is not None:
+            with open(self._path(subject_id, seq, ".scale"), "wb") as f:
+                f.write(scales.tobytes())
+
+    def _retire(self, paths):
+        """Removes files of merged segments; ones still mapped by a reader (Windows) are retried later."""
+        pending = self._retired_files + list(paths)
+        self._retired_files = []
+        for path in pending:
+            if not os.path.exists(path):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                self._retired_files.append(path)
+
+    # --- writes ------------------------------------------------------------------------
+
+    def upsert(self, ids, embeddings, documents, metadatas, retire_ids=()):
+        np = self.np
+        by_subject = {}
+        for i, meta in enumerate(metadatas):
+            by_subject.setdefault(str(meta["subject_id"]), []).append(i)
+
+        for subject_id, idx in by_subject.items():
+            # Encoding happens before taking the writer lock; only the file write and swap are serialized.
+            vectors = np.asarray([embeddings[i] for i in idx], dtype=np.float32)
+            rows, scales = self._encode_rows(vectors)
+            chunk_ids = np.array([ids[i] for i in idx], dtype=object)
+
+            with self._write_lock:
+                current = self._snapshot(subject_id)
+                dim = vectors.shape[1]
+                info = self._conn.execute(
+                    "SELECT MAX(seq), MAX(dim), MAX(dtype) FROM segments WHERE subject_id = ?", (subject_id,)
+                ).fetchone()
+                if info[1] is not None and info[1] != dim:
+                    raise ValueError(f"Embedding dim {dim} does not match stored dim {info[1]} for {subject_id}")
+                if info[2] is not None and info[2] != self.dtype:
+                    raise ValueError(f"Subject {subject_id} is stored as {info[2]}; rebuild it to switch to {self.dtype}")
+                seq = (info[0] or 0) + 1
+
+                self._write_segment(subject_id, seq, rows, scales)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO chunks (id, subject_id, seq, row, document, metadata, deleted) VALUES (?, ?, ?, ?, ?, ?, 0)",
+                    [
+                        (ids[i], subject_id, seq, n, documents[i], json.dumps(metadatas[i]))
+                        for n, i in enumerate(idx)
+                    ]
+                )
+                self._conn.execute(
+                    "INSERT INTO segments (subject_id, seq, rows, dim, dtype) VALUES (?, ?, ?, ?, ?)",
+                    (subject_id, seq, len(idx), dim, self.dtype)
+                )
+                if retire_ids:
+                    self._conn.executemany("UPDATE chunks SET deleted = 1 WHERE id = ?", [(c,) for c in retire_ids])
+                self._conn.commit()
+
+                staged = self._open_segment(subject_id, seq, len(idx), dim, self.dtype)
+                # Re-upserted ids now live in the staged segment; hide their old rows (and any
+                # retired ids) in the same publish so readers switch versions in one step.
+                hidden = np.concatenate([chunk_ids, np.array(list(retire_ids), dtype=object)])
+                segments = [seg.with_live(seg.live & ~np.isin(seg.ids, hidden)) for seg in current]
+                self._publish(subject_id, segments + [staged])
+
+                if len(segments) + 1 > self.max_segments:
+                    self._merge_subject(subject_id)
+
+    def replace(self, where, ids, embeddings, documents, metadatas):
+        with self._write_lock:
+            keep = set(ids)
+            stale = [chunk_id for chunk_id, _ in self.get(where) if chunk_id not in keep]
+            self.upsert(ids, embeddings, documents, metadatas, retire_ids=stale)
+            return len(stale)
+
+    def delete(self, where):
+        np = self.np
+        with self._write_lock:
+            matched = {}
+            for chunk_id, meta in self.get(where):
+                matched.setdefault(str(meta.get("subject_id")), []).append(chunk_id)
+            removed = 0
+            for subject_id, chunk_ids in matched.items():
+                self._conn.executemany("UPDATE chunks SET deleted = 1 WHERE id = ?", [(c,) for c in chunk_ids])
+                self._conn.commit()
+                gone = np.array(chunk_ids, dtype=object)
+                self._publish(subject_id, [seg.with_live(seg.live & ~np.isin(seg.ids, gone)) for seg in self._snapshot(subject_id)])
+                removed += len(chunk_ids)
+            return removed
+
+    # --- reads -------------------------------------------------------------------------
+
+    def get(self, where=None):
+        where = dict(where or {})
+        sql = "SELECT id, metadata FROM chunks WHERE deleted = 0"
+        params = []
+        if "subject_id" in where:
+            sql += " AND subject_id = ?"
+            params.append(str(where.pop("subject_id")))
+        pairs = [(chunk_id, json.loads(meta)) for chunk_id, meta in self._reader().execute(sql, params).fetchall()]
+        if where:
+            pairs = [(c, m) for c, m in pairs if all(m.get(k) == v for k, v in where.items())]
+        return pairs
+
+    def _scores(self, segment, q, rows_subset=None):
+        np = self.np
+        matrix, scales = segment.matrix, segment.scales
+        if rows_subset is not None:
+            scores = np.asarray(matrix[rows_subset], dtype=np.float32) @ q
+            return scores * scales[rows_subset] if scales is not None else scores
+        scores = np.empty(matrix.shape[0], dtype=np.float32)
+        for start in range(0, matrix.shape[0], self.BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + self.BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + len(block)] = block @ q
+        return scores * scales if scales is not None else scores
+
+    def _top_in_segment(self, segment, q, live, k):
+        np = self.np
+        if segment.partitions is not None:
+            centroids, assign = segment.partitions
+            probes = np.argsort(-(centroids @ q))[:self.nprobe or max(1, len(centroids) // 4)]
+            candidates = np.flatnonzero(np.isin(assign, probes) & live)
+            scores = self._scores(segment, q, candidates)
+        else:
+            candidates = np.flatnonzero(live)
+            scores = self._scores(segment, q)[candidates]
+        if len(candidates) == 0:
+            return [], []
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return scores[top].tolist(), segment.ids[candidates[top]].tolist()
+
+    def query(self, subject_id, embeddings, n_results=5, where=None):
+        np = self.np
+        snapshot = self._snapshot(subject_id)
+        if not snapshot:
+            return [[] for _ in embeddings]
+
+        allowed = None
+        if where:
+            filters = {"subject_id": str(subject_id)}
+            filters.update(where)
+            allowed = np.array([chunk_id for chunk_id, _ in self.get(filters)], dtype=object)
+        lives = [seg.live if allowed is None else seg.live & np.isin(seg.ids, allowed) for seg in snapshot]
+
+        results = []
+        for emb in embeddings:
+            q = np.asarray(emb, dtype=np.float32)
+            scored = []
+            for segment, live in zip(snapshot, lives):
+                scores, chunk_ids = self._top_in_segment(segment, q, live, n_results)
+                scored.extend(zip(scores, chunk_ids))
+            scored.sort(key=lambda pair: -pair[0])
+            results.append(self._documents([chunk_id for _, chunk_id in scored[:n_results]]))
+        return results
+
+    def _documents(self, chunk_ids):
+        if not chunk_ids:
+            return []
+        placeholders = ",".join("?" for _ in chunk_ids)
+        rows = self._reader().execute(
+            f"SELECT id, document FROM chunks WHERE id IN ({placeholders})", chunk_ids
+        ).fetchall()
+        by_id = dict(rows)
+        return [by_id[c] for c in chunk_ids if c in by_id]
+
+    def disk_bytes(self):
+        return _dir_size(self.root_dir)
+
+    # --- maintenance -------------------------------------------------------------------
+
+    def _build_partitions(self, matrix, iterations=5):
+        """Coarse k-means over the rows so queries can probe a few partitions instead of all."""
+        np = self.np
+        rows = matrix.shape[0]
+        nlist = max(1, int(np.sqrt(rows)))
+        rng = np.random.default_rng(0)
+        data = np.asarray(matrix, dtype=np.float32)
+        centroids = data[rng.choice(rows, nlist, replace=False)]
+        for _ in range(iterations):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = data[assign == c]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+        assign = np.argmax(data @ centroids.T, axis=1).astype(np.int32)
+        return centroids, assign
+
+    def _merge_subject(self, subject_id):
+        """Merges a subject's live rows into one new segment and publishes it. Caller holds the writer lock."""
+        np = self.np
+        snapshot = self._snapshot(subject_id)
+        info = self._conn.execute(
+            "SELECT MAX(seq), MAX(dim), MAX(dtype) FROM segments WHERE subject_id = ?", (subject_id,)
+        ).fetchone()
+        if info[0] is None:
+            return
+        seq, dim, dtype = info[0] + 1, info[1], info[2]
+
+        parts, scale_parts, moves = [], [], []
+        for segment in snapshot:
+            rows = np.flatnonzero(segment.live)
+            if len(rows) == 0:
+                continue
+            parts.append(np.asarray(segment.matrix[rows]))
+            if segment.scales is not None:
+                scale_parts.append(np.asarray(segment.scales[rows]))
+            moves.extend(segment.ids[rows].tolist())
+        merged = np.concatenate(parts) if parts else np.empty((0, dim), dtype=dtype)
+        scales = np.concatenate(scale_parts) if scale_parts else (np.empty(0, dtype=np.float32) if dtype == "int8" else None)
+        self._write_segment(subject_id, seq, merged, scales)
+
+        if len(moves) >= self.partition_min_rows and len(moves) > 0:
+            centroids, assign = self._build_partitions(merged)
+            np.savez(self._path(subject_id, seq, ".ivf.npz"), centroids=centroids, assign=assign)
+            print(f"[RAG] Built {len(centroids)} partitions for {subject_id} ({len(moves)} rows, dim {dim}).")
+
+        old_seqs = [r[0] for r in self._conn.execute("SELECT seq FROM segments WHERE subject_id = ?", (subject_id,))]
+        self._conn.execute("DELETE FROM chunks WHERE subject_id = ? AND deleted = 1", (subject_id,))
+        self._conn.executemany(
+            "UPDATE chunks SET seq = ?, row = ? WHERE id = ?",
+            [(seq, row, chunk_id) for row, chunk_id in enumerate(moves)]
+        )
+        self._conn.execute("DELETE FROM segments WHERE subject_id = ?", (subject_id,))
+        self._conn.execute(
+            "INSERT INTO segments (subject_id, seq, rows, dim, dtype) VALUES (?, ?, ?, ?, ?)",
+            (subject_id, seq, len(moves), dim, dtype)
+        )
+        self._conn.commit()
+
+        self._publish(subject_id, [self._open_segment(subject_id, seq, len(moves), dim, dtype)] if moves else [])
+        self._retire(
+            self._path(subject_id, old, suffix)
+            for old in old_seqs for suffix in (".vec", ".scale", ".ivf.npz")
+        )
+
+    def compact(self):
+        """Merges every subject into a single segment without tombstoned rows."""
+        with self._write_lock:
+            subjects = [r[0] for r in self._conn.execute("SELECT DISTINCT subject_id FROM segments").fetchall()]
+            for subject_id in subjects:
+                self._merge_subject(subject_id)
+            try:
+                self._conn.execute("VACUUM")
+            except sqlite3.OperationalError as e:
+                print(f"[RAG] ⚠️ VACUUM skipped: {e}")
+
+
+def create_vector_store(backend=None):
+    """Builds the backend selected by VECTOR_STORE (chroma or numpy)."""
+    backend = (backend or os.getenv("VECTOR_STORE", "chroma")).lower()
+    if backend == "numpy":
+        return NumpyVectorStore(os.getenv("VECTOR_STORE_DIR", "./vector_store"))
+    if backend == "chroma":
+        return ChromaVectorStore(os.getenv("CHROMA_DB_DIR", "./chroma_db"))
+    raise ValueError(f"Unknown VECTOR_STORE backend: {backend}")
@@ -0,0 +1,155 @@
+"""
+Wikipedia summary fallback for RAG misses.
+
+Lookups go cache -> offline snapshot -> network. Hits and misses are both cached in SQLite
+(with separate TTLs) so a repeated miss never goes back to the network, network calls are
+capped by a time budget, and after a network failure the service stays offline for a
+cooldown instead of paying the timeout on every request.
+
+Modes (WIKI_FALLBACK_MODE):
+- online  (default): cache, then snapshot, then the Wikipedia REST API.
+- offline: cache and snapshot only; never touches the network.
+- off:     fallback disabled.
+
+The snapshot is knowledge_base/wikipedia/summaries.jsonl, one {"title", "extract"} object
+per line. `python train_kb.py --fetch-wiki` builds it from the subjects and topics in the DB.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+
+
+def _normalize(title):
+    return " ".join(title.lower().replace("_", " ").split())
+
+
+class WikipediaService:
+    API_URL = "https://en.wikipedia.org/api/rest_v1/page/summary/{}"
+
+    def __init__(self, kb_path):
+        self.mode = os.getenv("WIKI_FALLBACK_MODE", "online").lower()
+        self.time_budget = float(os.getenv("WIKI_FALLBACK_TIMEOUT", "1.5"))
+        self.positive_ttl = int(os.getenv("WIKI_CACHE_TTL", str(7 * 24 * 3600)))
+        self.negative_ttl = int(os.getenv("WIKI_NEGATIVE_TTL", str(24 * 3600)))
+        self.offline_cooldown = int(os.getenv("WIKI_OFFLINE_COOLDOWN", "300"))
+        self.snapshot_path = os.path.join(kb_path, "wikipedia", "summaries.jsonl")
+        cache_path = os.getenv("WIKI_CACHE_PATH", "./rag_cache/wikipedia.sqlite3")
+
+        self._snapshot = None
+        self._offline_until = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS wiki_cache (title TEXT PRIMARY KEY, extract TEXT, fetched_at REAL)"
+        )
+        self._conn.commit()
+        self.stats = {"cache_hits": 0, "negative_hits": 0, "snapshot_hits": 0, "fetches": 0, "fetch_failures": 0}
+
+    def _load_snapshot(self):
+        if self._snapshot is None:
+            snapshot = {}
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        entry = json.loads(line)
+                        if entry.get("extract"):
+                            snapshot[_normalize(entry["title"])] = entry["extract"]
+                print(f"[WIKI] Loaded {len(snapshot)} offline summaries from {self.snapshot_path}")
+            self._snapshot = snapshot
+        return self._snapshot
+
+    def _cached(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT extract, fetched_at FROM wiki_cache WHERE title = ?", (key,)).fetchone()
+        if not row:
+            return None
+        extract, fetched_at = row
+        ttl = self.positive_ttl if extract else self.negative_ttl
+        if time.time() - fetched_at > ttl:
+            return None
+        return extract or ""
+
+    def _store(self, key, extract):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO wiki_cache (title, extract, fetched_at) VALUES (?, ?, ?)",
+                (key, extract, time.time())
+            )
+            self._conn.commit()
+
+    def fetch_summary(self, title, timeout=None):
+        """Fetches a summary from the REST API. Returns the extract, '' if none, None on network failure."""
+        import requests
+        try:
+            response = requests.get(self.API_URL.format(title.replace(" ", "_")), timeout=timeout or self.time_budget)
+        except Exception as e:
+            print(f"[RAG] ❌ Wikipedia fetch failed: {e}")
+            return None
+        if response.status_code == 200:
+            return response.json().get("extract", "")
+        if response.status_code == 404:
+            return ""
+        return None
+
+    def lookup(self, title):
+        """Returns a summary for `title`, or '' when none is available."""
+        if self.mode == "off" or not title.strip():
+            return ""
+        key = _normalize(title)
+
+        cached = self._cached(key)
+        if cached is not None:
+            self.stats["cache_hits" if cached else "negative_hits"] += 1
+            return cached
+
+        extract = self._load_snapshot().get(key)
+        if extract:
+            self.stats["snapshot_hits"] += 1
+            return extract
+
+        if self.mode == "offline" or time.time() < self._offline_until:
+            return ""
+
+        print(f"[RAG] 🌐 Fetching Wikipedia context for: {title}")
+        self.stats["fetches"] += 1
+        extract = self.fetch_summary(title)
+        if extract is None:
+            # Network is down or slow: stop trying for a while rather than paying the budget per request.
+            self.stats["fetch_failures"] += 1
+            self._offline_until = time.time() + self.offline_cooldown
+            return ""
+        self._store(key, extract)
+        if extract:
+            print(f"[RAG] ✅ Found Wikipedia summary for {title}")
+        return extract
+
+    def build_snapshot(self, titles, timeout=10):
+        """Fetches summaries for `titles` and merges them into the offline snapshot file."""
+        entries = {}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        entries[_normalize(entry["title"])] = entry
+        fetched = 0
+        for title in titles:
+            key = _normalize(title)
+            if key in entries:
+                continue
+            extract = self.fetch_summary(title, timeout=timeout)
+            if extract:
+                entries[key] = {"title": title, "extract": extract}
+                fetched += 1
+        os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+        with open(self.snapshot_path, "w", encoding="utf-8") as f:
+            for entry in entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._snapshot = None
+        return fetched, len(entries)
@@ -0,0 +1,100 @@
+"""
+Measures query latency while a large ingest runs against the same subject.
+
+Pre-loads a subject with synthetic 384-d vectors, records query latency on its own, then
+again while another thread ingests 1,000 chunks (10 files x 100 chunks, the same
+replace() path RAGService.process_file uses). Acceptance: p95 during ingest stays close
+to the idle p95.
+
+Usage:
+    python benchmark_concurrent_ingest.py [--backend numpy|chroma] [--base 5000] [--ingest 1000]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+
+def unit_vectors(rng, n, dim=384):
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    return sorted(values)[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def run_queries(store, rng, stop, latencies):
+    while not stop.is_set():
+        q = unit_vectors(rng, 1)[0].tolist()
+        start = time.perf_counter()
+        store.query("bench", [q], n_results=5)
+        latencies.append(time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", default="numpy", choices=["numpy", "chroma"])
+    parser.add_argument("--base", type=int, default=5000)
+    parser.add_argument("--ingest", type=int, default=1000)
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--idle-seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    from app.services.vector_store import NumpyVectorStore, ChromaVectorStore
+    workdir = tempfile.mkdtemp(prefix="ingest_bench_")
+    rng = np.random.default_rng(0)
+    try:
+        store = NumpyVectorStore(workdir) if args.backend == "numpy" else ChromaVectorStore(workdir)
+        base = unit_vectors(rng, args.base)
+        store.upsert(
+            [f"base_{i}" for i in range(args.base)],
+            base.tolist(),
+            [f"base doc {i}" for i in range(args.base)],
+            [{"subject_id": "bench", "source": f"base_{i // 100}.txt"} for i in range(args.base)]
+        )
+
+        idle, busy = [], []
+        stop = threading.Event()
+        reader = threading.Thread(target=run_queries, args=(store, np.random.default_rng(1), stop, idle))
+        reader.start()
+        time.sleep(args.idle_seconds)
+        stop.set()
+        reader.join()
+
+        stop = threading.Event()
+        reader = threading.Thread(target=run_queries, args=(store, np.random.default_rng(2), stop, busy))
+        reader.start()
+        per_file = args.ingest // args.files
+        start = time.perf_counter()
+        for f in range(args.files):
+            vectors = unit_vectors(rng, per_file)
+            store.replace(
+                {"subject_id": "bench", "source": f"ingest_{f}.txt"},
+                ids=[f"ingest_{f}_{i}" for i in range(per_file)],
+                embeddings=vectors.tolist(),
+                documents=[f"ingest doc {f}/{i}" for i in range(per_file)],
+                metadatas=[{"subject_id": "bench", "source": f"ingest_{f}.txt"} for _ in range(per_file)]
+            )
+        ingest_seconds = time.perf_counter() - start
+        stop.set()
+        reader.join()
+
+        print(f"backend={args.backend} base={args.base} ingested={per_file * args.files} in {ingest_seconds:.2f}s")
+        print(f"idle        n={len(idle):>5}  p50={percentile(idle, 0.5):.2f}ms  p95={percentile(idle, 0.95):.2f}ms")
+        print(f"during load n={len(busy):>5}  p50={percentile(busy, 0.5):.2f}ms  p95={percentile(busy, 0.95):.2f}ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Measures query-embedding throughput and latency with and without micro-batching.
+
+Fires --concurrency threads that each embed --per-thread distinct queries through
+EmbeddingBatcher, once with batching disabled (max batch size 1) and once per --wait-ms
+setting, and prints throughput, p50/p95 latency and the batcher's own metrics.
+
+Usage:
+    python benchmark_query_batching.py [--concurrency 32] [--per-thread 20] [--wait-ms 0 2 5 10]
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, p):
+    return sorted(values)[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def run(batcher, concurrency, per_thread):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(n):
+        local = []
+        for i in range(per_thread):
+            start = time.perf_counter()
+            batcher.encode(f"Questions about topic {n}-{i} and its applications")
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies) / (time.perf_counter() - started), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--per-thread", type=int, default=20)
+    parser.add_argument("--wait-ms", type=float, nargs="+", default=[0, 2, 5, 10])
+    args = parser.parse_args()
+
+    from app.services.rag_service import RAGService
+    from app.services.embedding_batcher import EmbeddingBatcher
+    rag = RAGService()
+    rag.warm_up()
+    if rag.model is None:
+        sys.exit("Embedding model unavailable (expected in backend/local_models)")
+
+    settings = [("unbatched", EmbeddingBatcher(rag.model, max_wait_ms=0, max_batch_size=1))]
+    settings += [(f"wait={w:g}ms", EmbeddingBatcher(rag.model, max_wait_ms=w)) for w in args.wait_ms]
+    for label, batcher in settings:
+        throughput, latencies = run(batcher, args.concurrency, args.per_thread)
+        stats = batcher.stats()
+        print(f"{label:<12} {throughput:7.1f} q/s  p50={percentile(latencies, 0.5):.1f}ms  "
+              f"p95={percentile(latencies, 0.95):.1f}ms  mean_batch={stats['mean_batch_size']}  "
+              f"queue_wait_p95={stats['queue_wait_ms_p95']}ms")
+
+
+if __name__ == "__main__":
+    main()
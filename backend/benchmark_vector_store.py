@@ -0,0 +1,108 @@
+"""
+Compares the vector store backends on recall and latency.
+
+Embeds the knowledge_base chunks once (or uses random unit vectors with --synthetic),
+loads them into Chroma and into the numpy store (float16, int8, and partitioned), then
+reports recall@k against exact float32 search plus p50/p95 query latency.
+
+Usage:
+    python benchmark_vector_store.py [--synthetic 50000] [--queries 200] [--k 5]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+
+def load_corpus(args):
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(args.synthetic, 384)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return [f"doc {i}" for i in range(args.synthetic)], vectors
+
+    from app.services.rag_service import RAGService
+    rag = RAGService()
+    rag.warm_up()
+    if rag.model is None:
+        sys.exit("Embedding model unavailable; rerun with --synthetic N")
+    subjects_path = os.path.join(rag.kb_path, "subjects")
+    chunks = []
+    for subject in sorted(os.listdir(subjects_path)):
+        for name in sorted(os.listdir(os.path.join(subjects_path, subject))):
+            with open(os.path.join(subjects_path, subject, name), encoding="utf-8", errors="ignore") as f:
+                text = f.read()
+            chunks.extend(text[i:i + 1000] for i in range(0, len(text), 1000))
+    print(f"Embedding {len(chunks)} chunks...")
+    vectors = np.asarray(rag.model.encode(chunks, batch_size=64), dtype=np.float32)
+    return chunks, vectors
+
+
+def percentile(values, p):
+    return sorted(values)[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def bench(name, store, queries, truth, k):
+    latencies, hits = [], 0
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        docs = store.query("bench", [q.tolist()], n_results=k)[0]
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(docs) & expected)
+    recall = hits / (len(queries) * k)
+    print(f"{name:<22} recall@{k}={recall:.3f}  p50={percentile(latencies, 0.5):.2f}ms  "
+          f"p95={percentile(latencies, 0.95):.2f}ms  disk={store.disk_bytes() / 1e6:.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--synthetic", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    documents, vectors = load_corpus(args)
+    documents = [f"{i}:{d}" for i, d in enumerate(documents)]  # keep documents unique for recall
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)
+    queries = vectors[picks] + rng.normal(scale=0.05, size=(len(picks), vectors.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.k]
+    truth = [set(documents[i] for i in row) for row in exact]
+
+    ids = [f"bench_{i}" for i in range(len(documents))]
+    metadatas = [{"subject_id": "bench", "source": "bench"} for _ in documents]
+    from app.services.vector_store import NumpyVectorStore, ChromaVectorStore
+
+    workdir = tempfile.mkdtemp(prefix="vs_bench_")
+    try:
+        for dtype in ("float16", "int8"):
+            store = NumpyVectorStore(os.path.join(workdir, dtype), dtype=dtype)
+            for start in range(0, len(ids), 5000):
+                end = start + 5000
+                store.upsert(ids[start:end], vectors[start:end], documents[start:end], metadatas[start:end])
+            bench(f"numpy-{dtype}", store, queries, truth, args.k)
+            store.partition_min_rows = 0
+            store.compact()
+            bench(f"numpy-{dtype}-ivf", store, queries, truth, args.k)
+
+        try:
+            store = ChromaVectorStore(os.path.join(workdir, "chroma"))
+            for start in range(0, len(ids), 5000):
+                end = start + 5000
+                store.upsert(ids[start:end], vectors[start:end].tolist(), documents[start:end], metadatas[start:end])
+            bench("chroma", store, queries, truth, args.k)
+        except ImportError:
+            print("chroma                 skipped (chromadb not installed)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Compares resident memory of N API workers with in-process RAG vs the shared sidecar.
+
+Each simulated worker is a separate process that gets the RAG singleton, waits until it
+is ready and runs one query, then reports its RSS. In sidecar mode the sidecar's own RSS
+is added to the total.
+
+Usage:
+    python benchmark_worker_memory.py [--workers 4] [--address /tmp/exam_oracle_rag_bench.sock]
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+WORKER_SCRIPT = """
+import sys, time
+sys.path.insert(0, {backend!r})
+from app.services.rag_service import get_rag_service
+rag = get_rag_service()
+rag.wait_until_ready(timeout=300)
+rag.query_context("Questions about sorting algorithms", subject_id="cs301")
+print("READY", rag.readiness()["mode"], flush=True)
+time.sleep(3600)
+"""
+
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / 1024 / 1024
+    return 0.0
+
+
+def run_workers(count, env):
+    workers = [
+        subprocess.Popen([sys.executable, "-c", WORKER_SCRIPT.format(backend=BACKEND_DIR)],
+                         env=env, stdout=subprocess.PIPE, text=True)
+        for _ in range(count)
+    ]
+    modes = []
+    for worker in workers:
+        while True:
+            line = worker.stdout.readline()
+            if not line or line.startswith("READY"):
+                modes.append(line.split()[1] if line else "exited")
+                break
+    sizes = [rss_mb(worker.pid) for worker in workers]
+    for worker in workers:
+        worker.kill()
+    return sizes, modes
+
+
+def report(label, sizes, modes, extra=0.0):
+    print(f"{label:<10} mode={','.join(sorted(set(modes)))}  per-worker={sum(sizes) / len(sizes):.0f}MB  "
+          f"total={sum(sizes) + extra:.0f}MB" + (f" (sidecar {extra:.0f}MB)" if extra else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--address", default="/tmp/exam_oracle_rag_bench.sock")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.pop("RAG_SIDECAR_ADDRESS", None)
+    sizes, modes = run_workers(args.workers, env)
+    report("in-process", sizes, modes)
+
+    env["RAG_SIDECAR_ADDRESS"] = args.address
+    sidecar = subprocess.Popen([sys.executable, "-m", "app.services.rag_sidecar"], cwd=BACKEND_DIR, env=env)
+    try:
+        time.sleep(1)
+        sizes, modes = run_workers(args.workers, env)
+        report("sidecar", sizes, modes, extra=rss_mb(sidecar.pid))
+    finally:
+        sidecar.terminate()
+        sidecar.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import requests
 import sys
 import os
+import time
 
 API_URL = "http://localhost:8000/api/training/upload"
 
@@ -26,9 +27,19 @@ def train_model():
             response = requests.post(API_URL, files=files, data=data)
             
         if response.status_code == 200:
-            result = response.json()
+            job = response.json()
+            print(f"[INFO] Queued as job {job['job_id']}. Waiting for ingestion...")
+            status_url = API_URL.replace("/upload", f"/jobs/{job['job_id']}")
+            while job.get("status") not in ("complete", "failed"):
+                time.sleep(2)
+                job = requests.get(status_url).json()
+                print(f"  {job['stage'] or 'queued'}: {job['pages_parsed']} pages, "
+                      f"{job['chunks_embedded']}/{job['chunks_total'] or '?'} chunks, ETA {job['eta_seconds']}s")
+            if job["status"] == "failed":
+                print(f"\n[ERROR] Training failed: {job['error']}")
+                return
             print("\n[SUCCESS] Training Completed!")
-            print(f"Stats: {result}")
+            print(f"Stats: {job}")
             print("\nThe model now 'knows' this document and can generate questions from it.")
         else:
             print(f"\n[ERROR] Training failed: {response.text}")
@@ -0,0 +1,192 @@
+"""
+Index and migration check for the hot Question filters.
+
+Creates the schema, strips the indexes and columns the migrations add (so it looks like
+a database from before them), runs ensure_schema_sync() twice, then checks that:
+- every migration is recorded and a second run applies nothing;
+- every index declared in models.py exists (the models and the migrations agree);
+- EXPLAIN of each hot query uses one of its expected indexes.
+
+Usage:
+    python verify_indexes.py [--url postgresql://.../scratch_db] [--rows 5000]
+Defaults to a throwaway SQLite file. A --url database must be empty; the script creates
+its tables there and leaves them. Exits with status 1 on a failure.
+"""
+import os
+import sys
+import shutil
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("USE_MYSQL", "false")
+
+# Dropped before migrating; (table, index)
+LEGACY_INDEXES = [
+    ("questions", "ix_questions_status_lo_bloom"),
+    ("questions", "ix_questions_lo_bloom"),
+    ("questions", "ix_questions_created_at"),
+    ("questions", "ix_questions_topic_status"),
+    ("questions", "ix_questions_rubric_lo"),
+    ("topics", "ix_topics_subject_id"),
+    ("documents", "ix_documents_subject_key"),
+]
+# (table, column), dropped after their indexes
+LEGACY_COLUMNS = [("questions", "course_outcome"), ("documents", "subject_key"), ("documents", "updated_at")]
+
+
+def hot_queries():
+    """(label, statement, indexes any of which the plan should use)"""
+    from sqlalchemy import select, func, literal_column
+    from app.models import Question, Topic
+
+    week_start = literal_column("'2026-01-05 00:00:00'")
+    week_end = literal_column("'2026-01-12 00:00:00'")
+    day = func.date(Question.created_at)
+    return [
+        ("vetting queue", select(Question.id, Question.question_text).where(Question.status == "draft"),
+         {"ix_questions_status_lo_bloom"}),
+        ("dashboard breakdown",
+         select(Question.status, Question.learning_outcome, Question.bloom_level, func.count(Question.id))
+         .group_by(Question.status, Question.learning_outcome, Question.bloom_level),
+         {"ix_questions_status_lo_bloom"}),
+        ("weekly activity",
+         select(day, func.count(Question.id)).where(Question.created_at >= week_start, Question.created_at < week_end)
+         .group_by(day),
+         {"ix_questions_created_at"}),
+        ("LO / Bloom coverage",
+         select(func.count(Question.id)).where(Question.learning_outcome == "LO2", Question.bloom_level == "Apply"),
+         {"ix_questions_lo_bloom", "ix_questions_status_lo_bloom"}),
+        ("topic question counts",
+         select(Question.topic_id, func.count(Question.id)).where(Question.topic_id.in_([1, 2, 3]))
+         .group_by(Question.topic_id),
+         {"ix_questions_topic_status"}),
+        ("subject topics", select(Topic.id, Topic.name).where(Topic.subject_id == 2), {"ix_topics_subject_id"}),
+        ("rubric questions by LO",
+         select(Question.id).where(Question.rubric_id == 3, Question.learning_outcome == "LO1"),
+         {"ix_questions_rubric_lo"}),
+    ]
+
+
+def make_legacy(engine):
+    from sqlalchemy import text, inspect
+    from app.models import Base
+    if inspect(engine).get_table_names():
+        sys.exit(f"{engine.url.render_as_string(hide_password=True)} is not empty; point --url at a scratch database.")
+    Base.metadata.create_all(bind=engine)
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        for table, index in LEGACY_INDEXES:
+            conn.execute(text(f"DROP INDEX {index} ON {table}" if dialect == "mysql" else f"DROP INDEX {index}"))
+        for table, column in LEGACY_COLUMNS:
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+
+
+def seed(engine, rows):
+    from sqlalchemy import insert
+    from app.models import Subject, Topic, Question, Rubric
+    random.seed(7)
+    started = datetime(2025, 6, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Subject), [{"code": f"S{i}", "name": f"Subject {i}"} for i in range(1, 21)])
+        conn.execute(insert(Topic), [{"subject_id": i % 20 + 1, "name": f"Topic {i}"} for i in range(1, 201)])
+        conn.execute(insert(Rubric), [{"name": f"Rubric {i}", "subject_id": i % 20 + 1} for i in range(1, 51)])
+        conn.execute(insert(Question), [
+            {
+                "topic_id": random.randint(1, 200),
+                "rubric_id": random.choice([None, random.randint(1, 50)]),
+                "question_text": "Q" * 200,
+                "status": random.choice(["draft", "approved", "approved", "rejected"]),
+                "learning_outcome": f"LO{random.randint(1, 5)}",
+                "bloom_level": random.choice(["Remember", "Understand", "Apply", "Analyze", "Evaluate", "Create"]),
+                "created_at": started + timedelta(minutes=random.randint(0, 60 * 24 * 365))
+            }
+            for _ in range(rows)
+        ])
+    from sqlalchemy import text
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("ANALYZE"))
+        elif engine.dialect.name == "mysql":
+            conn.execute(text("ANALYZE TABLE questions, topics"))
+        else:
+            conn.execute(text("ANALYZE"))
+
+
+def explain(engine, statement):
+    """The query plan as one lower-case string."""
+    from sqlalchemy import text
+    sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    dialect = engine.dialect.name
+    with engine.connect() as conn:
+        if dialect == "postgresql":
+            # Tiny tables can make a sequential scan cheapest; ask whether an index is usable
+            conn.execute(text("SET enable_seqscan = off"))
+            rows = conn.execute(text(f"EXPLAIN {sql}")).all()
+            return " ".join(row[0] for row in rows).lower()
+        if dialect == "mysql":
+            rows = conn.execute(text(f"EXPLAIN {sql}")).mappings().all()
+            return " ".join(f"{row.get('key')} {row.get('possible_keys')}" for row in rows).lower()
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        return " ".join(str(row[-1]) for row in rows).lower()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="empty scratch database (default: temporary SQLite file)")
+    parser.add_argument("--rows", type=int, default=5000, help="questions to seed before EXPLAIN")
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine, inspect
+    from app.models import Base
+    from app.schema_sync import ensure_schema_sync, applied_migrations, MIGRATIONS
+
+    workdir = None
+    if args.url:
+        url = args.url
+    else:
+        workdir = tempfile.mkdtemp(prefix="verify_indexes_")
+        url = f"sqlite:///{os.path.join(workdir, 'legacy.db')}"
+    engine = create_engine(url)
+    failures = []
+    try:
+        make_legacy(engine)
+        first = ensure_schema_sync(engine)
+        second = ensure_schema_sync(engine)
+        versions = [version for version, _, _ in MIGRATIONS]
+        print(f"migrations applied: {first}, on re-run: {second}")
+        if first != versions or second or applied_migrations(engine) != set(versions):
+            failures.append("migrations not applied exactly once")
+
+        inspector = inspect(engine)
+        for table in Base.metadata.sorted_tables:
+            declared = {index.name for index in table.indexes}
+            missing = declared - {index["name"] for index in inspector.get_indexes(table.name)}
+            if missing:
+                failures.append(f"{table.name}: declared indexes missing after migration: {sorted(missing)}")
+            declared_columns = {column.name for column in table.columns}
+            missing = declared_columns - {column["name"] for column in inspector.get_columns(table.name)}
+            if missing:
+                failures.append(f"{table.name}: columns missing after migration: {sorted(missing)}")
+
+        seed(engine, args.rows)
+        for label, statement, expected in hot_queries():
+            plan = explain(engine, statement)
+            used = sorted(name for name in expected if name in plan)
+            if not used:
+                failures.append(f"{label}: none of {sorted(expected)} used")
+            print(f"{label:<24} {'ok (' + ', '.join(used) + ')' if used else 'FAIL'}  | {plan[:110]}")
+    finally:
+        engine.dispose()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
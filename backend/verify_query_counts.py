@@ -0,0 +1,146 @@
+"""
+Query-count regression check for the listing endpoints.
+
+Builds two throwaway SQLite databases with the same subjects and topics but a small and a
+large question bank (and 1 vs. 10 rubrics per subject), calls each endpoint against both
+through FastAPI's TestClient, and counts the SQL statements it runs. An endpoint fails when
+its count grows with the data or exceeds its budget. The compiled rubric plan used by
+generation is checked the same way, cold and cached.
+
+Usage:
+    python verify_query_counts.py [--small 2] [--large 200]
+Exits with status 1 on a regression.
+"""
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("USE_MYSQL", "false")
+
+# (path, max statements)
+CHECKS = [
+    ("/api/subjects/", 1),
+    ("/api/subjects/1", 1),
+    ("/api/subjects/1/topics", 1),
+    ("/api/rubrics/", 3),
+    ("/api/rubrics/1", 3),
+    ("/api/dashboard/stats", 4),
+    ("/api/dashboard/reports", 1),
+]
+# (label, max statements) for get_rubric_plan(): first call, then from the plan cache
+PLAN_CHECKS = [("rubric plan (cold)", 4), ("rubric plan (cached)", 1)]
+
+
+def seed(engine, questions_per_topic, subjects=4, topics_per_subject=5):
+    from sqlalchemy.orm import sessionmaker
+    from app.models import Base, Subject, Topic, Question, Rubric, RubricQuestionDistribution, RubricLODistribution, UserStats
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        db.add(UserStats(user_id=1, username="verify", xp=0, level=1))
+        now = datetime.utcnow()
+        for s in range(subjects):
+            subject = Subject(code=f"S{s}", name=f"Subject {s}", color="#fff", gradient="", introduction="")
+            db.add(subject)
+            db.flush()
+            for t in range(topics_per_subject):
+                topic = Topic(subject_id=subject.id, name=f"Topic {s}.{t}")
+                db.add(topic)
+                db.flush()
+                db.bulk_save_objects([
+                    Question(
+                        topic_id=topic.id, question_text="Q" * 2000, question_type="MCQ", options=["a", "b", "c", "d"],
+                        correct_answer="a", marks=5, bloom_level="Apply", learning_outcome=f"LO{q % 5 + 1}",
+                        status=("draft", "approved", "rejected")[q % 3], created_at=now - timedelta(days=q % 10)
+                    )
+                    for q in range(questions_per_topic)
+                ])
+            for r in range(max(1, questions_per_topic // 20)):
+                rubric = Rubric(name=f"Rubric {s}.{r}", subject_id=subject.id, exam_type="Final", duration_minutes=90, total_marks=50)
+                db.add(rubric)
+                db.flush()
+                db.add_all([RubricQuestionDistribution(rubric_id=rubric.id, question_type=qt, count=5, marks_each=m)
+                            for qt, m in (("MCQ", 1), ("Short", 3), ("Essay", 10))])
+                db.add_all([RubricLODistribution(rubric_id=rubric.id, learning_outcome=lo, percentage=pct)
+                            for lo, pct in (("LO1", 40), ("LO2", 35), ("LO3", 25))])
+        db.commit()
+    finally:
+        db.close()
+
+
+def measure(questions_per_topic, workdir):
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import sessionmaker
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.database import get_db
+    from app.services.rubric_service import get_rubric_plan, forget_rubric_plan
+
+    engine = create_engine(f"sqlite:///{os.path.join(workdir, f'q{questions_per_topic}.db')}")
+    seed(engine, questions_per_topic)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+    app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(app)
+    results = {}
+    try:
+        for path, _ in CHECKS:
+            statements.clear()
+            response = client.get(path)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {path} returned {response.status_code}: {response.text[:200]}")
+            results[path] = (len(statements), len(response.content))
+        db = Session()
+        try:
+            forget_rubric_plan(1)
+            for label, _ in PLAN_CHECKS:
+                statements.clear()
+                plan = get_rubric_plan(1, db)
+                results[label] = (len(statements), len(plan.tasks))
+        finally:
+            db.close()
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--small", type=int, default=2, help="questions per topic in the small bank")
+    parser.add_argument("--large", type=int, default=200, help="questions per topic in the large bank")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="query_counts_")
+    try:
+        small = measure(args.small, workdir)
+        large = measure(args.large, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    failed = False
+    print(f"{'endpoint':<36} {'queries':>14} {'bytes (plan: tasks)':>22}  result")
+    for path, budget in CHECKS + PLAN_CHECKS:
+        (q_small, b_small), (q_large, b_large) = small[path], large[path]
+        ok = q_small == q_large and q_large <= budget
+        failed |= not ok
+        print(f"{path:<36} {q_small:>6} -> {q_large:<6} {b_small:>10} -> {b_large:<10}  "
+              f"{'ok' if ok else f'FAIL (budget {budget})'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Gunicorn settings (picked up automatically when gunicorn runs from the repo root).
+
+When RAG_SIDECAR_ADDRESS is set, the shared RAG sidecar is started before the workers are
+forked and stopped with the master, so the embedding model and index are loaded once
+instead of once per worker. Without RAG_SIDECAR_AUTHKEY a random key is generated here;
+the sidecar and the forked workers inherit it through the environment. See
+backend/app/services/rag_sidecar.py.
+"""
+import os
+import sys
+import secrets
+import subprocess
+
+from dotenv import load_dotenv
+
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend", ".env"))
+
+_sidecar = None
+
+
+def on_starting(server):
+    global _sidecar
+    if not os.getenv("RAG_SIDECAR_ADDRESS"):
+        return
+    server.log.info("Starting RAG sidecar on %s", os.environ["RAG_SIDECAR_ADDRESS"])
+    if not os.getenv("RAG_SIDECAR_AUTHKEY"):
+        os.environ["RAG_SIDECAR_AUTHKEY"] = secrets.token_hex(32)
+    # RAG_SIDECAR_NICE > 0 runs the sidecar (embedding, indexing) below the workers' priority
+    niceness = int(os.getenv("RAG_SIDECAR_NICE", "0"))
+    _sidecar = subprocess.Popen(
+        [sys.executable, "-m", "backend.app.services.rag_sidecar"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        preexec_fn=(lambda: os.nice(niceness)) if niceness and hasattr(os, "nice") else None
+    )
+
+
+def on_exit(server):
+    if _sidecar is not None and _sidecar.poll() is None:
+        _sidecar.terminate()
+        try:
+            _sidecar.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            _sidecar.kill()
@@ -335,7 +335,16 @@ export function SubjectDetail() {
     try {
       for (let i = 0; i < files.length; i++) {
         setIndexProgress(20 + (i / files.length) * 70);
-        await trainingService.uploadDocument(id!, files[i]);
+        // Uploads are indexed in the background; poll the job until it finishes
+        const { job_id } = await trainingService.uploadDocument(id!, files[i]);
+        let job = await trainingService.getJob(job_id);
+        while (job.status === 'queued' || job.status === 'running') {
+          await new Promise(resolve => setTimeout(resolve, 2000));
+          job = await trainingService.getJob(job_id);
+        }
+        if (job.status === 'failed') {
+          throw new Error(job.error || `Indexing ${files[i].name} failed`);
+        }
       }
       setIndexProgress(100);
       toast.success("Textbook(s) indexed successfully!");
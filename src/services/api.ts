@@ -506,6 +506,10 @@ export const trainingService = {
         });
         return response.data;
     },
+    getJob: async (jobId: number) => {
+        const response = await api.get(`/training/jobs/${jobId}`);
+        return response.data;
+    },
     listFiles: async (subjectCode: string) => {
         const response = await api.get(`/training/files/${subjectCode}`);
         return response.data;
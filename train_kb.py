@@ -4,15 +4,36 @@ import sys
 # Add backend to path
 sys.path.append(os.path.join(os.getcwd(), 'backend'))
 
-from app.services.rag_service import rag_service
+# Offline indexing has no requests to yield to: run at full speed
+os.environ.setdefault("INDEX_THROTTLE", "false")
+
+from app.services.rag_service import get_rag_service
+
+def local_rag_service(warm_up=True):
+    """
+    The in-process RAGService, even when RAG_SIDECAR_ADDRESS is set: snapshot and Wikipedia
+    builds need the embedding model and local files, which the sidecar client does not proxy.
+    """
+    if not os.getenv("RAG_SIDECAR_ADDRESS"):
+        return get_rag_service()
+    from app.services.rag_service import RAGService
+    print("[INFO] RAG_SIDECAR_ADDRESS is set; this command runs against a local RAG service instead of the sidecar.")
+    service = RAGService()
+    if warm_up:
+        service.warm_up()
+    return service
 
 def train_knowledge_base():
     print("============================================================")
     print("🎓 AI Exam Oracle - Knowledge Base Training")
     print("============================================================")
+    if os.getenv("RAG_SIDECAR_ADDRESS"):
+        print("[INFO] RAG_SIDECAR_ADDRESS is set: the sidecar indexes the knowledge base itself at startup.")
+        print("[HINT] Unset it to index here, with the sidecar stopped.")
+        return
     print("[INFO] Scanning knowledge_base folder...")
     
-    count = rag_service.auto_index_kb()
+    count = get_rag_service().auto_index_kb()
     
     if count > 0:
         print(f"[SUCCESS] Indexed {count} chunks of knowledge.")
@@ -21,5 +42,50 @@ def train_knowledge_base():
         print("[WARNING] No knowledge files found to index.")
         print("[HINT] Add .txt, .pdf, or .docx files to 'knowledge_base/subjects/[subject_code]/'")
 
+def compact_knowledge_base():
+    print("============================================================")
+    print("🧹 AI Exam Oracle - Index Compaction")
+    print("============================================================")
+    stats = get_rag_service().compact_index()
+    print(f"[INFO] Removed {stats.get('removed_chunks', 0)} orphaned chunks.")
+    for subject, chunks in sorted(stats["subjects"].items()):
+        print(f"  > {subject}: {chunks} chunks")
+    print(f"[INFO] Total: {stats['total_chunks']} chunks, {stats['disk_bytes'] / (1024 * 1024):.1f} MB on disk.")
+
+def fetch_wikipedia_snapshot():
+    print("============================================================")
+    print("🌐 AI Exam Oracle - Offline Wikipedia Snapshot")
+    print("============================================================")
+    from app.database import SessionLocal
+    from app.models import Subject, Topic
+    db = SessionLocal()
+    try:
+        titles = [s.name for s in db.query(Subject).all()] + [t.name for t in db.query(Topic).all()]
+    finally:
+        db.close()
+    wikipedia = local_rag_service(warm_up=False).wikipedia
+    fetched, total = wikipedia.build_snapshot(titles)
+    print(f"[INFO] Fetched {fetched} new summaries. Snapshot holds {total} entries at {wikipedia.snapshot_path}.")
+
+def build_index_snapshot():
+    print("============================================================")
+    print("📦 AI Exam Oracle - Prebuilt Index Snapshot")
+    print("============================================================")
+    from app.services import index_snapshot
+    args = sys.argv[sys.argv.index("--snapshot") + 1:]
+    path = args[0] if args and not args[0].startswith("--") else None
+    service = local_rag_service()
+    manifest = index_snapshot.build(service, path)
+    path = path or index_snapshot.snapshot_path(service)
+    print(f"[INFO] Snapshot {manifest['snapshot_id']}: {len(manifest['files'])} files, {manifest['total_chunks']} chunks.")
+    print(f"[INFO] Written to {path} ({os.path.getsize(path) / (1024 * 1024):.1f} MB). Servers restore it at startup.")
+
 if __name__ == "__main__":
-    train_knowledge_base()
+    if "--compact" in sys.argv:
+        compact_knowledge_base()
+    elif "--snapshot" in sys.argv:
+        build_index_snapshot()
+    elif "--fetch-wiki" in sys.argv:
+        fetch_wikipedia_snapshot()
+    else:
+        train_knowledge_base()